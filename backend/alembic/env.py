@@ -32,6 +32,13 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata # AQUI: Diga ao Alembic qual MetaData usar para detectar mudanças
 
 
+def include_name(name, type_, parent_names):
+    """Keep autogenerate away from the FTS5 virtual table and its shadow tables."""
+    if type_ == "table":
+        return not name.startswith(app.db.models.SEARCH_TABLE)
+    return True
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -69,7 +76,8 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
-            compare_type=True # Adicionar para autogenerate ser mais preciso com tipos
+            compare_type=True, # Adicionar para autogenerate ser mais preciso com tipos
+            include_name=include_name,
         )
 
         with context.begin_transaction():
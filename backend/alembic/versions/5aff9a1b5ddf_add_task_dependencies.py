@@ -0,0 +1,38 @@
+"""Add the task dependency graph
+
+Revision ID: 5aff9a1b5ddf
+Revises: 72a5ca57777c
+Create Date: 2026-10-18 18:56:17.299987
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5aff9a1b5ddf'
+down_revision: Union[str, Sequence[str], None] = '72a5ca57777c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_dependencies',
+    sa.Column('blocker_id', sqlalchemy_utils.types.uuid.UUIDType(binary=False), nullable=False),
+    sa.Column('blocked_id', sqlalchemy_utils.types.uuid.UUIDType(binary=False), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['blocked_id'], ['tasks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['blocker_id'], ['tasks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('blocker_id', 'blocked_id')
+    )
+    op.create_index('ix_task_dependencies_blocked_id_blocker_id', 'task_dependencies', ['blocked_id', 'blocker_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_dependencies_blocked_id_blocker_id', table_name='task_dependencies')
+    op.drop_table('task_dependencies')
@@ -0,0 +1,40 @@
+"""Add task due dates, priorities and the overdue status
+
+Revision ID: 72a5ca57777c
+Revises: 8bdb89268bc0
+Create Date: 2026-10-18 18:52:30.985824
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '72a5ca57777c'
+down_revision: Union[str, Sequence[str], None] = '8bdb89268bc0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name == "postgresql":
+        # SQLite stores the status enum as plain text; Postgres needs the new label on its enum type
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE taskstatusenum ADD VALUE IF NOT EXISTS 'OVERDUE'")
+    op.add_column('tasks', sa.Column('due_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('tasks', sa.Column('priority', sa.Integer(), server_default='2', nullable=False))
+    op.create_index('ix_tasks_owner_id_status_due_at_priority', 'tasks', ['owner_id', 'status', 'due_at', 'priority'], unique=False, sqlite_where=sa.text('due_at IS NOT NULL'), postgresql_where=sa.text('due_at IS NOT NULL'))
+    op.create_index('ix_tasks_status_due_at_priority', 'tasks', ['status', 'due_at', 'priority'], unique=False, sqlite_where=sa.text('due_at IS NOT NULL'), postgresql_where=sa.text('due_at IS NOT NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Postgres cannot drop an enum label; it is left in place, unused
+    op.execute("UPDATE tasks SET status = 'PENDING' WHERE status = 'OVERDUE'")
+    op.drop_index('ix_tasks_status_due_at_priority', table_name='tasks', sqlite_where=sa.text('due_at IS NOT NULL'), postgresql_where=sa.text('due_at IS NOT NULL'))
+    op.drop_index('ix_tasks_owner_id_status_due_at_priority', table_name='tasks', sqlite_where=sa.text('due_at IS NOT NULL'), postgresql_where=sa.text('due_at IS NOT NULL'))
+    op.drop_column('tasks', 'priority')
+    op.drop_column('tasks', 'due_at')
@@ -0,0 +1,28 @@
+"""Add (created_at, id) index for keyset pagination
+
+Revision ID: 8f4c2a1d7e10
+Revises: 3d92b2bad0ad
+Create Date: 2026-10-18 09:12:04.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f4c2a1d7e10'
+down_revision: Union[str, Sequence[str], None] = '3d92b2bad0ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_tasks_created_at_id', 'tasks', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_created_at_id', table_name='tasks')
@@ -0,0 +1,74 @@
+"""Store task timestamps in a single format on SQLite
+
+Revision ID: a6c3e9f1b274
+Revises: 4d9da0789ce2
+Create Date: 2026-10-18 21:04:51.302117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c3e9f1b274'
+down_revision: Union[str, Sequence[str], None] = '4d9da0789ce2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# SQLite keeps datetimes as text and keyset pagination compares them as strings. Rows created
+# through the CURRENT_TIMESTAMP server default hold 'YYYY-MM-DD HH:MM:SS' while SQLAlchemy writes
+# 'YYYY-MM-DD HH:MM:SS.ffffff', so a page boundary on a legacy row skipped the rows of the same
+# second. Existing values are rewritten into the longer format and the default now produces it.
+# Postgres stores native timestamps and is left untouched.
+SQLITE_CURRENT_TIMESTAMP = "(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"
+
+# Rebuilding the table drops its triggers and renumbers its rowids (see e1a7c93d5f08), and the
+# partial indexes are recreated explicitly so their WHERE clauses survive.
+SQLITE_SEARCH_TRIGGERS = (
+    """CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END""",
+    """CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+    END""",
+    """CREATE TRIGGER tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END""",
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+)
+
+PARTIAL_INDEXES = (
+    ('ix_tasks_owner_id_status_due_at_priority', ['owner_id', 'status', 'due_at', 'priority']),
+    ('ix_tasks_status_due_at_priority', ['status', 'due_at', 'priority']),
+)
+
+
+def _set_created_at_default(server_default: str) -> None:
+    for name, _ in PARTIAL_INDEXES:
+        op.drop_index(name, table_name='tasks', sqlite_where=sa.text('due_at IS NOT NULL'))
+    with op.batch_alter_table('tasks', recreate='always') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), server_default=sa.text(server_default))
+    for statement in SQLITE_SEARCH_TRIGGERS:
+        op.execute(statement)
+    for name, columns in PARTIAL_INDEXES:
+        op.create_index(name, 'tasks', columns, unique=False, sqlite_where=sa.text('due_at IS NOT NULL'))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name != "sqlite":
+        return
+    for column in ('created_at', 'updated_at'):
+        op.execute(f"UPDATE tasks SET {column} = {column} || '.000000' WHERE length({column}) = 19")
+    _set_created_at_default(SQLITE_CURRENT_TIMESTAMP)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The rewritten values are valid in either format and are left as they are
+    if op.get_context().dialect.name == "sqlite":
+        _set_created_at_default('(CURRENT_TIMESTAMP)')
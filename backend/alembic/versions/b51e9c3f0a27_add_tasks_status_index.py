@@ -0,0 +1,28 @@
+"""Add index on tasks.status
+
+Revision ID: b51e9c3f0a27
+Revises: 8f4c2a1d7e10
+Create Date: 2026-10-18 11:40:27.503981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b51e9c3f0a27'
+down_revision: Union[str, Sequence[str], None] = '8f4c2a1d7e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_tasks_status'), 'tasks', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tasks_status'), table_name='tasks')
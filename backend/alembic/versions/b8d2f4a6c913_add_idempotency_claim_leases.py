@@ -0,0 +1,32 @@
+"""Add claim owner tokens and leases to idempotency keys
+
+Revision ID: b8d2f4a6c913
+Revises: a6c3e9f1b274
+Create Date: 2026-10-18 22:17:40.551306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d2f4a6c913'
+down_revision: Union[str, Sequence[str], None] = 'a6c3e9f1b274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('idempotency_keys', sa.Column('claim_token', sa.String(length=32), nullable=True))
+    op.add_column('idempotency_keys', sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True))
+    # Unfinished claims belong to requests of processes that the upgrade restarted: their lease is over
+    op.execute("UPDATE idempotency_keys SET locked_until = created_at WHERE status_code IS NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('idempotency_keys', 'locked_until')
+    op.drop_column('idempotency_keys', 'claim_token')
@@ -0,0 +1,52 @@
+"""Add topological dependency ranks to tasks
+
+Revision ID: c4e7a2d9b180
+Revises: b8d2f4a6c913
+Create Date: 2026-10-18 23:02:13.874920
+
+"""
+from collections import defaultdict, deque
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a2d9b180'
+down_revision: Union[str, Sequence[str], None] = 'b8d2f4a6c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tasks', sa.Column('dependency_rank', sa.Integer(), nullable=True))
+    op.create_index('ix_tasks_owner_id_dependency_rank', 'tasks', ['owner_id', 'dependency_rank'], unique=False)
+
+    # Rank the tasks that already have edges in one topological order (Kahn's algorithm). The
+    # ranks are unique across all owners, so they are unique per owner as well.
+    connection = op.get_bind()
+    edges = connection.execute(sa.text("SELECT blocker_id, blocked_id FROM task_dependencies")).all()
+    dependents = defaultdict(list)
+    waiting_on = defaultdict(int)
+    for blocker_id, blocked_id in edges:
+        dependents[blocker_id].append(blocked_id)
+        waiting_on[blocked_id] += 1
+    ready = deque(sorted(node for node in dependents if not waiting_on[node]))
+    ranks = []
+    while ready:
+        node = ready.popleft()
+        ranks.append({"task_id": node, "rank": len(ranks) + 1})
+        for dependent in dependents[node]:
+            waiting_on[dependent] -= 1
+            if not waiting_on[dependent]:
+                ready.append(dependent)
+    if ranks:
+        connection.execute(sa.text("UPDATE tasks SET dependency_rank = :rank WHERE id = :task_id"), ranks)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tasks_owner_id_dependency_rank', table_name='tasks')
+    op.drop_column('tasks', 'dependency_rank')
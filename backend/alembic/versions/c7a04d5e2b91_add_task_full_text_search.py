@@ -0,0 +1,65 @@
+"""Add full-text search over task title and description
+
+Revision ID: c7a04d5e2b91
+Revises: b51e9c3f0a27
+Create Date: 2026-10-18 13:05:51.274416
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a04d5e2b91'
+down_revision: Union[str, Sequence[str], None] = 'b51e9c3f0a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5(title, description, content='tasks', content_rowid='rowid')",
+    # Default ranking: bm25 with title matches weighted 10x over description matches
+    "INSERT INTO tasks_fts(tasks_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END""",
+    """CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+    END""",
+    """CREATE TRIGGER tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END""",
+    # Index the rows that already exist
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+)
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS tasks_fts_au",
+    "DROP TRIGGER IF EXISTS tasks_fts_ad",
+    "DROP TRIGGER IF EXISTS tasks_fts_ai",
+    "DROP TABLE IF EXISTS tasks_fts",
+)
+POSTGRES_UPGRADE = (
+    "CREATE INDEX ix_tasks_search ON tasks USING gin "
+    "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')))",
+)
+POSTGRES_DOWNGRADE = (
+    "DROP INDEX IF EXISTS ix_tasks_search",
+)
+
+
+def _run(statements_by_dialect) -> None:
+    for statement in statements_by_dialect.get(op.get_context().dialect.name, ()):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _run({"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE})
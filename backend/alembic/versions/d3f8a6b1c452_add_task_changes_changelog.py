@@ -0,0 +1,45 @@
+"""Add task_changes changelog and index on tasks.updated_at
+
+Revision ID: d3f8a6b1c452
+Revises: c7a04d5e2b91
+Create Date: 2026-10-18 14:22:10.861305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f8a6b1c452'
+down_revision: Union[str, Sequence[str], None] = 'c7a04d5e2b91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('task_changes',
+    sa.Column('seq', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('task_id', sqlalchemy_utils.types.uuid.UUIDType(binary=False), nullable=False),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('seq'),
+    sqlite_autoincrement=True
+    )
+    op.create_index(op.f('ix_task_changes_task_id'), 'task_changes', ['task_id'], unique=False)
+    op.create_index(op.f('ix_tasks_updated_at'), 'tasks', ['updated_at'], unique=False)
+    # Seed the changelog with the existing tasks so a first sync from token 0 sees them
+    op.execute(
+        "INSERT INTO task_changes (task_id, deleted, changed_at) "
+        "SELECT id, false, coalesce(updated_at, created_at, CURRENT_TIMESTAMP) FROM tasks ORDER BY created_at"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tasks_updated_at'), table_name='tasks')
+    op.drop_index(op.f('ix_task_changes_task_id'), table_name='task_changes')
+    op.drop_table('task_changes')
@@ -0,0 +1,110 @@
+"""Add users table and task ownership
+
+Revision ID: e1a7c93d5f08
+Revises: d3f8a6b1c452
+Create Date: 2026-10-18 18:52:37.418205
+
+"""
+import os
+import secrets
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from passlib.hash import bcrypt
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7c93d5f08'
+down_revision: Union[str, Sequence[str], None] = 'd3f8a6b1c452'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Existing tasks are assigned to an account named after the one the mocked login used to accept.
+# It is only created when there are tasks to adopt, and its password is taken from TASKS_PASSWORD
+# (as in app.cli); without it the account gets a random password and can't be logged into until
+# one is set with `python -m app.cli set-password user`. Fresh databases start without users.
+DEFAULT_USERNAME = "user"
+
+# SQLite rebuilds a table to add a NOT NULL foreign key, which drops its triggers and renumbers
+# its rowids, so the full-text search triggers are recreated and the index rebuilt afterwards.
+SQLITE_SEARCH_TRIGGERS = (
+    """CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END""",
+    """CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+    END""",
+    """CREATE TRIGGER tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END""",
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+)
+
+
+def _restore_sqlite_search() -> None:
+    if op.get_context().dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    users = op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    has_tasks = op.get_bind().execute(sa.text("SELECT 1 FROM tasks LIMIT 1")).first() is not None
+    if has_tasks:
+        password = os.environ.get("TASKS_PASSWORD") or secrets.token_urlsafe(32)
+        op.bulk_insert(users, [{'id': 1, 'username': DEFAULT_USERNAME, 'hashed_password': bcrypt.hash(password)}])
+        if op.get_context().dialect.name == "postgresql":
+            op.execute("SELECT setval(pg_get_serial_sequence('users', 'id'), 1)")
+
+    # Superseded by the owner-scoped indexes below
+    op.drop_index(op.f('ix_tasks_updated_at'), table_name='tasks')
+    op.drop_index('ix_tasks_status', table_name='tasks')
+    op.drop_index('ix_tasks_created_at_id', table_name='tasks')
+
+    for table_name in ('tasks', 'task_changes'):
+        op.add_column(table_name, sa.Column('owner_id', sa.Integer(), nullable=True))
+        if has_tasks:
+            op.execute(f"UPDATE {table_name} SET owner_id = 1")
+        elif table_name == 'task_changes':
+            # Only tombstones of deleted tasks can be left, and there is no owner to give them to
+            op.execute("DELETE FROM task_changes")
+        table_kwargs = {'sqlite_autoincrement': True} if table_name == 'task_changes' else {}
+        with op.batch_alter_table(table_name, table_kwargs=table_kwargs) as batch_op:
+            batch_op.alter_column('owner_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.create_foreign_key(f'fk_{table_name}_owner_id_users', 'users', ['owner_id'], ['id'], ondelete='CASCADE')
+    _restore_sqlite_search()
+
+    op.create_index('ix_tasks_owner_id_status_created_at', 'tasks', ['owner_id', 'status', 'created_at'], unique=False)
+    op.create_index('ix_tasks_owner_id_created_at_id', 'tasks', ['owner_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_task_changes_owner_id_seq', 'task_changes', ['owner_id', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_changes_owner_id_seq', table_name='task_changes')
+    op.drop_index('ix_tasks_owner_id_created_at_id', table_name='tasks')
+    op.drop_index('ix_tasks_owner_id_status_created_at', table_name='tasks')
+
+    for table_name in ('task_changes', 'tasks'):
+        table_kwargs = {'sqlite_autoincrement': True} if table_name == 'task_changes' else {}
+        with op.batch_alter_table(table_name, table_kwargs=table_kwargs) as batch_op:
+            batch_op.drop_constraint(f'fk_{table_name}_owner_id_users', type_='foreignkey')
+            batch_op.drop_column('owner_id')
+    _restore_sqlite_search()
+
+    op.create_index('ix_tasks_created_at_id', 'tasks', ['created_at', 'id'], unique=False)
+    op.create_index('ix_tasks_status', 'tasks', ['status'], unique=False)
+    op.create_index(op.f('ix_tasks_updated_at'), 'tasks', ['updated_at'], unique=False)
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_table('users')
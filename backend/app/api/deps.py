@@ -1,28 +1,27 @@
-from typing import Generator
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, replica_router
 from app.core.security import verify_access_token
 
-# OAuth2PasswordBearer for dependency injection (even if mocked)
+# OAuth2PasswordBearer for dependency injection
 # Points to the login endpoint where the token would be obtained
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/login", auto_error=False)
 
-def get_db() -> Generator:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Dependency to get a database session.
+    Dependency to get an async database session.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
     """
-    Dependency to simulate current user authentication.
+    Dependency that authenticates the bearer token and returns the caller as {"id", "username"}.
+    The token is verified without a database round trip; its `uid` claim identifies the user.
     """
     user = verify_access_token(token)
     if not user:
@@ -31,4 +30,36 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
\ No newline at end of file
+    return user
+
+def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+):
+    """
+    Same as get_current_user, but also accepts the token as an `access_token` query parameter,
+    since the browser EventSource API cannot send an Authorization header.
+    """
+    return get_current_user(token or access_token or "")
+
+async def get_read_db(current_user: dict = Depends(get_current_user)) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get a read-only session on a replica (round-robin), or on the primary when no
+    replicas are configured or the caller wrote recently.
+    """
+    async with replica_router.session_factory(current_user["id"])() as db:
+        yield db
+
+async def get_write_db(
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get a session on the primary for requests that write. The caller's reads stick to
+    the primary from now until REPLICA_STICKY_SECONDS after the request finishes.
+    """
+    replica_router.mark_write(current_user["id"])
+    try:
+        yield db
+    finally:
+        replica_router.mark_write(current_user["id"])
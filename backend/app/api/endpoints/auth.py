@@ -1,25 +1,42 @@
+import math
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.user import UserOut, Token  # Assuming Token schema for response
-from app.core.security import authenticate_user_mocked, create_access_token
+from app.core.security import create_access_token, login_limiter
+from app.services import user_service
+from app.api.deps import get_db
 
 router = APIRouter()
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
     """
-    Mocked user login endpoint.
-    Authenticates a user with fixed credentials and returns a mocked token.
+    Authenticates a user against the users table and returns an access token.
+    The token carries the user's ID, which scopes every task request to that user's tasks.
+    After LOGIN_MAX_FAILURES failed attempts a username is locked out (429) until the window ends.
+    Attempts count from the start, so concurrent guesses are limited too.
     """
-    user = authenticate_user_mocked(form_data.username, form_data.password)
+    retry_after = login_limiter.reserve(form_data.username)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    user = await user_service.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    # In a real application, generate a JWT here
-    access_token = create_access_token(data={"sub": user["username"]})
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    login_limiter.reset(form_data.username)
+
+    access_token = create_access_token(data={"sub": user.username, "uid": user.id})
+    return {"access_token": access_token, "token_type": "bearer"}
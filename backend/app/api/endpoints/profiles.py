@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from app.api.deps import get_current_user
+from app.core.config import settings
+from app.core.profiling import profile_dump_path
+
+router = APIRouter()
+
+@router.get("/debug/profiles/{dump_name}", include_in_schema=False)
+async def download_profile(dump_name: str, current_user: dict = Depends(get_current_user)):
+    """
+    Downloads a pstats dump named by a profiled response's X-Profile-Dump header.
+    Only the user whose request was profiled can download it; others get 404.
+    """
+    path = profile_dump_path(settings.PROFILING_DUMP_DIR, dump_name, current_user["id"])
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=dump_name)
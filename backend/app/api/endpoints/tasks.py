@@ -1,79 +1,503 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 
+from app.core.config import settings
+from app.core.etag import etag_matches, make_etag
+from app.core.security import verify_access_token
+from app.core.serialization import csv_chunks, dump_rows, ndjson_chunks
+from app.core.pagination import InvalidCursorError
 from app.db.models import TaskStatusEnum
-from app.schemas.task import TaskCreate, TaskUpdate, TaskOut
-from app.services import task_service
-from app.api.deps import get_db, get_current_user # Using mocked auth for now
+from app.schemas.task import (
+    TaskBatchCreate,
+    TaskBatchDelete,
+    TaskBatchItemResult,
+    TaskBatchResult,
+    TaskBatchUpdate,
+    TaskChanges,
+    TaskCreate,
+    TaskExportFormat,
+    TaskOut,
+    TaskStats,
+    TaskUpdate,
+)
+from app.services import idempotency_service, task_service
+from app.services.events import Subscription, event_bus, with_keepalive
+from app.api.deps import get_current_user, get_read_db, get_stream_user, get_write_db
 
 router = APIRouter()
 
+def _cache_headers(etag: str) -> dict:
+    # no-cache: clients may store the response but must revalidate it with If-None-Match
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def _json_response(model: BaseModel, status_code: int) -> Response:
+    return Response(content=model.model_dump_json(), status_code=status_code, media_type="application/json")
+
+async def _idempotent(
+    request: Request,
+    payload: BaseModel,
+    idempotency_key: Optional[str],
+    db: AsyncSession,
+    owner_id: int,
+    write: Callable[[Optional[task_service.BeforeCommit]], Awaitable[Any]],
+    respond: Callable[[Any], Response],
+) -> Response:
+    """
+    Runs a task write once per Idempotency-Key and returns `respond(result)`. A retry with the same
+    key and payload gets the stored response back (marked `Idempotent-Replayed: true`) instead of
+    repeating the write. `409 Conflict` while the first request is still running, `422` if the key
+    is reused with a different payload. Without a key, the write simply runs.
+
+    `write` calls the service with a before_commit hook that stores the response in the write's
+    own transaction, so the response exists exactly when the write committed.
+    """
+    if idempotency_key is None:
+        return respond(await write(None))
+    fingerprint = idempotency_service.request_fingerprint(request.method, request.url.path, payload)
+    token = uuid.uuid4().hex
+    try:
+        stored = await idempotency_service.claim_key(db, owner_id, idempotency_key, fingerprint, token)
+    except idempotency_service.IdempotencyKeyInProgressError as exc:
+        raise HTTPException(status_code=409, detail=str(exc), headers={"Retry-After": "1"})
+    except idempotency_service.IdempotencyKeyReusedError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if stored is not None:
+        return Response(
+            content=stored.response_body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    responses = []
+
+    async def store_response(result) -> None:
+        response = respond(result)
+        await idempotency_service.store_response(db, owner_id, idempotency_key, token, response.status_code, response.body)
+        responses.append(response)
+
+    try:
+        async with idempotency_service.keep_claim(owner_id, idempotency_key, token):
+            await write(store_response)
+    except idempotency_service.IdempotencyKeyInProgressError as exc:
+        # The lease lapsed and a retry took the key over; this write was rolled back
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(exc), headers={"Retry-After": "1"})
+    except Exception:
+        # Frees the key only if the write rolled back; after a commit its response is stored
+        await idempotency_service.release_key(db, owner_id, idempotency_key, token)
+        raise
+    return responses[0]
+
 @router.post("/tasks", response_model=TaskOut, status_code=status.HTTP_201_CREATED)
-def create_task(
+async def create_task(
     task: TaskCreate,
-    db: Session = Depends(get_db),
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_write_db),
     current_user: dict = Depends(get_current_user) # Authenticated
 ):
     """
     Create a new task.
+    Send an `Idempotency-Key` header to make retries safe: they get the first response back.
     """
-    db_task = task_service.create_task(db=db, task=task)
-    return db_task
+    return await _idempotent(
+        request, task, idempotency_key, db, current_user["id"],
+        write=lambda before_commit: task_service.create_task(
+            db=db, owner_id=current_user["id"], task=task, before_commit=before_commit
+        ),
+        respond=lambda db_task: _json_response(TaskOut.model_validate(db_task), status.HTTP_201_CREATED),
+    )
 
 @router.get("/tasks", response_model=List[TaskOut])
-def read_tasks(
+async def read_tasks(
+    request: Request,
+    status: Optional[TaskStatusEnum] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Retrieve a page of the caller's tasks, ordered by creation time.
+    Can filter by status (pending, in_progress, completed, overdue).
+    When more tasks are available, the URL of the next page is returned in the `Link` header.
+    Supports conditional requests: a matching `If-None-Match` gets `304 Not Modified`.
+    """
+    version = await task_service.get_tasks_version(db=db, owner_id=current_user["id"], status=status)
+    etag = make_etag("tasks", current_user["id"], version, status, cursor, limit)
+    headers = _cache_headers(etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        rows, next_cursor = await task_service.get_task_rows(
+            db=db, owner_id=current_user["id"], status=status, cursor=cursor, limit=limit
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    # Fast path: Core rows are serialized directly, bypassing response_model validation
+    return Response(content=dump_rows(rows), media_type="application/json", headers=headers)
+
+@router.get("/tasks/export")
+async def export_tasks(
+    format: TaskExportFormat = TaskExportFormat.NDJSON,
     status: Optional[TaskStatusEnum] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Stream every task as NDJSON or CSV, optionally filtered by status.
+    Rows are read through a server-side cursor, so memory use does not grow with the table.
+    """
+    partitions = task_service.stream_task_rows(db=db, owner_id=current_user["id"], status=status)
+    if format == TaskExportFormat.CSV:
+        columns = [column.key for column in task_service.TASK_COLUMNS]
+        body, media_type = csv_chunks(columns, partitions), "text/csv"
+    else:
+        body, media_type = ndjson_chunks(partitions), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format.value}"'},
+    )
+
+@router.get("/tasks/search", response_model=List[TaskOut])
+async def search_tasks(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=255),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Full-text search over task titles and descriptions, best matches first.
+    When more results are available, the URL of the next page is returned in the `Link` header.
+    """
+    rows = await task_service.search_tasks(
+        db=db, owner_id=current_user["id"], q=q, limit=limit + 1, offset=offset
+    )
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_url = request.url.include_query_params(offset=offset + limit)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return Response(content=dump_rows(rows), media_type="application/json", headers=headers)
+
+@router.get("/tasks/next", response_model=List[TaskOut])
+async def read_next_tasks(
+    n: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user) # Authenticated
 ):
     """
-    Retrieve a list of tasks.
-    Can filter by status (pending, in_progress, completed).
+    The caller's n most pressing unfinished tasks (pending, in progress or overdue) that have a due
+    date: earliest due first, then by priority (0 is the most urgent).
     """
-    tasks = task_service.get_tasks(db=db, status=status)
-    return tasks
+    rows = await task_service.get_next_tasks(db=db, owner_id=current_user["id"], n=n)
+    return Response(content=dump_rows(rows), media_type="application/json")
+
+@router.get("/tasks/unblocked", response_model=List[TaskOut])
+async def read_unblocked_tasks(
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    The caller's unfinished tasks that are not waiting for any unfinished blocker, oldest first.
+    """
+    rows = await task_service.get_unblocked_tasks(db=db, owner_id=current_user["id"], limit=limit)
+    return Response(content=dump_rows(rows), media_type="application/json")
+
+async def _sse_stream(subscription: Subscription):
+    with subscription:
+        yield b"retry: 3000\n\n"
+        async for event in with_keepalive(subscription, settings.EVENTS_KEEPALIVE_SECONDS):
+            yield event.to_sse() if event is not None else b": keepalive\n\n"
+
+@router.get("/tasks/events")
+async def stream_task_events(
+    last_event_id: Optional[int] = Header(None),
+    current_user: dict = Depends(get_stream_user) # Authenticated (header or access_token query parameter)
+):
+    """
+    Server-Sent Events feed of task changes (task.created, task.updated, task.deleted).
+    Reconnecting clients send `Last-Event-ID` to replay the events they missed. If those are no
+    longer available (e.g. after a server restart), a `resync` event is sent instead: reload the
+    tasks, then keep following the stream.
+    """
+    return StreamingResponse(
+        _sse_stream(event_bus.subscribe(current_user["id"], last_event_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/tasks/events/ws")
+async def task_events_websocket(
+    websocket: WebSocket,
+    access_token: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+):
+    """
+    WebSocket variant of the task change feed; each event is sent as a JSON text message.
+    `last_event_id` works like the SSE feed's `Last-Event-ID`, including `resync` events.
+    """
+    user = verify_access_token(access_token) if access_token else None
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    with event_bus.subscribe(user["id"], last_event_id) as subscription:
+        await websocket.accept()
+
+        async def forward_events():
+            async for event in subscription:
+                await websocket.send_text(event.to_json().decode())
+
+        forwarder = asyncio.create_task(forward_events())
+        try:
+            # The client isn't expected to send anything; this just waits for it to go away
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            forwarder.cancel()
+
+@router.get("/tasks/changes", response_model=TaskChanges)
+async def read_task_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Delta sync: tasks created or updated after the change token `since`, and IDs of tasks deleted after it.
+    Start with since=0, then pass `next_token` back; keep going while `has_more` is true.
+    If `resync_required` is true, the token is older than the retained changes: reload the tasks
+    with GET /tasks, then continue from the returned `next_token`.
+    """
+    return await task_service.get_changes(db=db, owner_id=current_user["id"], since=since, limit=limit)
+
+@router.get("/tasks/stats", response_model=TaskStats)
+async def read_task_stats(
+    days: int = Query(30, ge=1, le=365),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Retrieve task counts per status, plus tasks created and completed per day over the last `days` days.
+    """
+    return await task_service.get_task_stats(db=db, owner_id=current_user["id"], days=days)
 
 @router.get("/tasks/{task_id}", response_model=TaskOut)
-def read_task(
+async def read_task(
     task_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user) # Authenticated
 ):
     """
     Retrieve a single task by its ID.
+    Supports conditional requests: a matching `If-None-Match` gets `304 Not Modified`.
     """
-    db_task = task_service.get_task(db=db, task_id=task_id)
+    version = await task_service.get_task_version(db=db, owner_id=current_user["id"], task_id=task_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    etag = make_etag("task", task_id, version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
+    db_task = await task_service.get_task(db=db, owner_id=current_user["id"], task_id=task_id)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
+    response.headers.update(_cache_headers(etag))
     return db_task
 
 @router.put("/tasks/{task_id}", response_model=TaskOut)
-def update_task(
+async def update_task(
     task_id: uuid.UUID,
     task: TaskUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     current_user: dict = Depends(get_current_user) # Authenticated
 ):
     """
     Update an existing task's status or other details.
     """
-    db_task = task_service.update_task(db=db, task_id=task_id, task=task)
+    db_task = await task_service.update_task(db=db, owner_id=current_user["id"], task_id=task_id, task=task)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return db_task
+
+@router.patch("/tasks/{task_id}", response_model=TaskOut)
+async def patch_task(
+    task_id: uuid.UUID,
+    task: TaskUpdate,
+    db: AsyncSession = Depends(get_write_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Partially update an existing task. Only the fields present in the payload are changed.
+    """
+    db_task = await task_service.update_task(db=db, owner_id=current_user["id"], task_id=task_id, task=task)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     return db_task
 
 @router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
+async def delete_task(
     task_id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     current_user: dict = Depends(get_current_user) # Authenticated
 ):
     """
     Delete a task by its ID.
     """
-    success = task_service.delete_task(db=db, task_id=task_id)
+    success = await task_service.delete_task(db=db, owner_id=current_user["id"], task_id=task_id)
     if not success:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"message": "Task deleted successfully"}
+
+@router.get("/tasks/{task_id}/dependencies", response_model=List[TaskOut])
+async def read_task_dependencies(
+    task_id: uuid.UUID,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Every task this task waits for, directly or transitively, in an order they can be done in:
+    each task comes after all of its own blockers.
+    """
+    rows = await task_service.get_dependency_order(db=db, owner_id=current_user["id"], task_id=task_id)
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return Response(content=dump_rows(rows), media_type="application/json")
+
+@router.put("/tasks/{task_id}/blockers/{blocker_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def add_task_blocker(
+    task_id: uuid.UUID,
+    blocker_id: uuid.UUID,
+    db: AsyncSession = Depends(get_write_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Mark the task as blocked by another of the caller's tasks. Idempotent; `409 Conflict` if the
+    blocker already waits for the task, directly or transitively.
+    """
+    try:
+        added = await task_service.add_dependency(
+            db=db, owner_id=current_user["id"], task_id=task_id, blocker_id=blocker_id
+        )
+    except task_service.DependencyCycleError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if not added:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.delete("/tasks/{task_id}/blockers/{blocker_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_task_blocker(
+    task_id: uuid.UUID,
+    blocker_id: uuid.UUID,
+    db: AsyncSession = Depends(get_write_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Remove a blocker from the task.
+    """
+    removed = await task_service.remove_dependency(
+        db=db, owner_id=current_user["id"], task_id=task_id, blocker_id=blocker_id
+    )
+    if not removed:
+        raise HTTPException(status_code=404, detail="Dependency not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/tasks:batch", response_model=TaskBatchResult, status_code=status.HTTP_201_CREATED)
+async def create_tasks_batch(
+    batch: TaskBatchCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_write_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Create many tasks in a single transaction. Accepts an `Idempotency-Key` header.
+    """
+    def respond(rows) -> Response:
+        return _json_response(TaskBatchResult(results=[
+            TaskBatchItemResult(id=row.id, status_code=status.HTTP_201_CREATED, task=TaskOut.model_validate(row))
+            for row in rows
+        ]), status.HTTP_201_CREATED)
+
+    return await _idempotent(
+        request, batch, idempotency_key, db, current_user["id"],
+        write=lambda before_commit: task_service.create_tasks(
+            db=db, owner_id=current_user["id"], tasks=batch.items, before_commit=before_commit
+        ),
+        respond=respond,
+    )
+
+@router.patch("/tasks:batch", response_model=TaskBatchResult)
+async def update_tasks_batch(
+    batch: TaskBatchUpdate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_write_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Partially update many tasks in a single transaction. Accepts an `Idempotency-Key` header.
+    Each item is reported separately; unknown IDs get a 404 result.
+    """
+    def respond(rows) -> Response:
+        results = []
+        for item in batch.items:
+            row = rows.get(item.id)
+            if row is None:
+                results.append(TaskBatchItemResult(id=item.id, status_code=404, detail="Task not found"))
+            else:
+                results.append(TaskBatchItemResult(id=item.id, status_code=200, task=TaskOut.model_validate(row)))
+        return _json_response(TaskBatchResult(results=results), status.HTTP_200_OK)
+
+    return await _idempotent(
+        request, batch, idempotency_key, db, current_user["id"],
+        write=lambda before_commit: task_service.update_tasks(
+            db=db, owner_id=current_user["id"], items=batch.items, before_commit=before_commit
+        ),
+        respond=respond,
+    )
+
+@router.delete("/tasks:batch", response_model=TaskBatchResult)
+async def delete_tasks_batch(
+    batch: TaskBatchDelete,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_write_db),
+    current_user: dict = Depends(get_current_user) # Authenticated
+):
+    """
+    Delete many tasks in a single transaction. Accepts an `Idempotency-Key` header.
+    Each ID is reported separately; unknown IDs get a 404 result.
+    """
+    def respond(deleted) -> Response:
+        deleted = set(deleted)
+        return _json_response(TaskBatchResult(results=[
+            TaskBatchItemResult(id=task_id, status_code=204)
+            if task_id in deleted
+            else TaskBatchItemResult(id=task_id, status_code=404, detail="Task not found")
+            for task_id in batch.ids
+        ]), status.HTTP_200_OK)
+
+    return await _idempotent(
+        request, batch, idempotency_key, db, current_user["id"],
+        write=lambda before_commit: task_service.delete_tasks(
+            db=db, owner_id=current_user["id"], task_ids=batch.ids, before_commit=before_commit
+        ),
+        respond=respond,
+    )
+
@@ -0,0 +1,70 @@
+"""
+Account management commands.
+
+    python -m app.cli create-user alice
+    python -m app.cli set-password alice
+
+Passwords are prompted for (or read from the TASKS_PASSWORD environment variable, for scripts).
+"""
+import argparse
+import asyncio
+import getpass
+import os
+import sys
+
+from sqlalchemy import update
+
+from app.core.security import hash_password
+from app.db.models import User
+from app.db.session import SessionLocal, engine
+from app.services import user_service
+
+
+def _read_password() -> str:
+    password = os.environ.get("TASKS_PASSWORD")
+    if password:
+        return password
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Repeat password: "):
+        sys.exit("Passwords do not match")
+    return password
+
+
+async def create_user(username: str, password: str) -> None:
+    async with SessionLocal() as db:
+        if await user_service.get_user_by_username(db, username) is not None:
+            sys.exit(f"User {username!r} already exists")
+        user = await user_service.create_user(db, username, password)
+        print(f"Created user {user.username!r} (id {user.id})")
+
+
+async def set_password(username: str, password: str) -> None:
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(User).where(User.username == username).values(hashed_password=hash_password(password))
+        )
+        await db.commit()
+        if result.rowcount == 0:
+            sys.exit(f"No such user: {username!r}")
+        print(f"Password of {username!r} updated")
+
+
+async def run(command, username: str) -> None:
+    try:
+        await command(username, _read_password())
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage API user accounts.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("create-user", help="Create a user").add_argument("username")
+    subcommands.add_parser("set-password", help="Change a user's password").add_argument("username")
+    args = parser.parse_args()
+    command = create_user if args.command == "create-user" else set_password
+    asyncio.run(run(command, args.username))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,103 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore") # Added extra="ignore" to allow unknown fields
 
     DATABASE_URL: str = "sqlite:///./sql_app.db"
+    # Comma-separated read replicas of DATABASE_URL; task reads are spread over them round-robin.
+    # A user's reads stay on the primary for REPLICA_STICKY_SECONDS after they write.
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_STICKY_SECONDS: float = 5.0
     SECRET_KEY: str = "your-super-secret-key-replace-me-in-production" # Used for mocking token
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_CACHE_SIZE: int = 4096  # Verified tokens kept in memory until they expire; 0 disables the cache
+    PASSWORD_BCRYPT_ROUNDS: int = 12  # Existing hashes with a different cost are rehashed on the next login
+    PASSWORD_HASH_WORKERS: int = 4  # Threads that run bcrypt off the event loop
+    LOGIN_MAX_FAILURES: int = 5  # Failed logins per username before it is locked out; 0 disables the limit
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 300
     ALLOWED_ORIGINS: str = "http://localhost:3000"  # Default value for development
 
+    # Connection pool. Used as-is for server databases; for file-backed SQLite only the
+    # size/overflow/timeout knobs apply, and in-memory SQLite always uses a single static connection.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced; -1 disables recycling
+    DB_POOL_PRE_PING: bool = True
+
+    # Maximum number of items accepted by the /tasks:batch endpoints
+    TASK_BATCH_MAX_ITEMS: int = 10000
+
+    # Seconds GET /tasks/stats results are reused within a worker; 0 disables the cache
+    TASK_STATS_CACHE_TTL_SECONDS: float = 5.0
+    # Seconds dependency-graph answers (unblocked tasks, dependency order) are reused within a worker.
+    # Writes in the same worker invalidate them at once; the TTL bounds staleness across workers.
+    TASK_GRAPH_CACHE_TTL_SECONDS: float = 30.0
+
+    # Task changelog behind GET /tasks/changes. Changes older than the retention are pruned by a job
+    # every TASK_CHANGES_PRUNE_INTERVAL_SECONDS; clients with older tokens are told to resync.
+    # A retention of 0 keeps the changelog forever.
+    TASK_CHANGES_RETENTION_SECONDS: float = 30 * 86400
+    TASK_CHANGES_PRUNE_INTERVAL_SECONDS: float = 3600
+
+    # Idempotency-Key support on the task write endpoints. Responses are replayed to retries for
+    # IDEMPOTENCY_KEY_TTL_SECONDS. The first request holds the key on a lease of IDEMPOTENCY_LOCK_SECONDS
+    # that it renews while it runs; a key whose lease lapsed (its request died) can be claimed again.
+    IDEMPOTENCY_KEY_TTL_SECONDS: float = 86400.0
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0
+
+    # Task change feed. "memory" keeps events per worker; "sqlite" shares them between the
+    # workers of one host through the EVENTS_BROKER_PATH file.
+    EVENTS_BACKEND: str = "memory"
+    EVENTS_BROKER_PATH: str = "./task_events.db"
+    EVENTS_HISTORY_SIZE: int = 1000  # Events retained for Last-Event-ID replay
+    EVENTS_SUBSCRIBER_QUEUE_SIZE: int = 1000
+    EVENTS_POLL_INTERVAL_SECONDS: float = 0.25
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0
+
+    # Response encoding. ORJSON_RESPONSES makes orjson the default JSON encoder; compression applies
+    # to responses of at least COMPRESSION_MINIMUM_SIZE bytes. Brotli is used only when the optional
+    # `brotli` package is installed and the client accepts it, gzip otherwise.
+    ORJSON_RESPONSES: bool = True
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESSLEVEL: int = 6
+    BROTLI_ENABLED: bool = True
+    BROTLI_QUALITY: int = 4  # 0-11; mid-range qualities keep per-request CPU low
+
+    # Prometheus metrics served at /metrics, plus per-request database statement counts.
+    # Statements slower than METRICS_SLOW_QUERY_SECONDS are counted and logged.
+    METRICS_ENABLED: bool = True
+    METRICS_SLOW_QUERY_SECONDS: float = 0.1
+
+    # On-demand request profiling: authenticated requests sent with `X-Profile: 1` run under
+    # cProfile and their stats are written to PROFILING_DUMP_DIR. Meant for staging.
+    PROFILING_ENABLED: bool = False
+    PROFILING_DUMP_DIR: str = "./profiles"
+
+    # Background jobs: deferred work (changelog pruning, idempotency key expiry) is queued in the jobs
+    # table, in the transaction that causes it, and run by JOBS_WORKERS workers in each app process. Failed jobs
+    # are retried after JOBS_RETRY_BACKOFF_SECONDS, doubling per attempt, up to JOBS_MAX_ATTEMPTS.
+    JOBS_ENABLED: bool = True
+    JOBS_WORKERS: int = 2
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0  # Idle workers also wake up as soon as this process enqueues
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BACKOFF_SECONDS: float = 2.0
+    JOBS_LEASE_SECONDS: float = 300.0  # A claimed job is handed to another worker if not finished by then
+    JOBS_DRAIN_TIMEOUT_SECONDS: float = 10.0  # On shutdown, time allowed for running jobs to finish
+
+    # Overdue scheduler: every SCHEDULER_INTERVAL_SECONDS, open tasks past their due_at move to
+    # "overdue". Due dates up to SCHEDULER_HORIZON_SECONDS ahead are kept in memory; tasks are
+    # updated SCHEDULER_BATCH_SIZE at a time.
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_INTERVAL_SECONDS: float = 1.0
+    SCHEDULER_HORIZON_SECONDS: float = 300.0
+    SCHEDULER_BATCH_SIZE: int = 500
+
+    # SQLite performance profile: WAL journaling so readers don't block on writers,
+    # plus the pragmas below, applied on every new connection.
+    SQLITE_PERFORMANCE_MODE: bool = True
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_CACHE_SIZE: int = -65536  # Negative values are KiB, i.e. 64 MiB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,273 @@
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "unmatched"  # Keeps label cardinality bounded for 404s and scanners
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # Per-bucket counts (+Inf last), sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return state[-1] if state else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, list(state)) for labels, state in self._values.items())
+        lines = []
+        names = self.labelnames + ("le",)
+        for labels, state in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), state):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{label_text} {state[-1]}")
+        return lines
+
+
+class CallbackMetric:
+    """A counter or gauge whose values are read from `collect` ({label values: value}) at scrape time."""
+
+    def __init__(self, name: str, documentation: str, type: str, labelnames: Sequence[str], collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in sorted(self.collect().items())]
+
+
+class MetricsRegistry:
+    """
+    Holds the application's metrics and renders them in the Prometheus text exposition format.
+    Values are per process: with several workers, scrape each one or aggregate downstream.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return ("\n".join(lines) + "\n").encode()
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by method, route template and status code.",
+    ("method", "route", "status"),
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route template.",
+    ("method", "route"),
+))
+http_request_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "Database statements executed per HTTP request; a high count hints at N+1 queries.",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS,
+))
+db_query_duration_seconds = registry.register(Histogram(
+    "db_query_duration_seconds", "Database statement latency by statement type.",
+    ("operation",),
+))
+db_slow_queries_total = registry.register(Counter(
+    "db_slow_queries_total", "Database statements slower than METRICS_SLOW_QUERY_SECONDS.",
+    ("operation",),
+))
+
+
+# In-process caches (TTLCache or anything with a compatible stats()) by name, see register_cache
+_caches: Dict[str, object] = {}
+
+def register_cache(name: str, cache) -> None:
+    """Exports a cache's hit and miss counters and its size, labelled cache=name."""
+    _caches[name] = cache
+
+def _cache_stat(key: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    return lambda: {(name,): cache.stats()[key] for name, cache in list(_caches.items())}
+
+cache_hits_total = registry.register(CallbackMetric(
+    "cache_hits_total", "Lookups answered from an in-process cache.", "counter", ("cache",), _cache_stat("hits"),
+))
+cache_misses_total = registry.register(CallbackMetric(
+    "cache_misses_total", "Lookups that missed an in-process cache (absent or expired).", "counter", ("cache",), _cache_stat("misses"),
+))
+cache_entries = registry.register(CallbackMetric(
+    "cache_entries", "Entries held by an in-process cache.", "gauge", ("cache",), _cache_stat("size"),
+))
+
+
+@dataclass
+class RequestQueryStats:
+    """Database activity of the request being handled, collected by the engine hooks."""
+    count: int = 0
+    seconds: float = 0.0
+    statements: Optional[List[Tuple[float, str]]] = None  # (seconds, SQL); only collected while profiling
+
+
+# Set by MetricsMiddleware for the duration of each HTTP request; the greenlets SQLAlchemy's
+# async engine runs the cursor hooks in inherit the request's context.
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+def instrument_engine(sync_engine: Engine, slow_query_seconds: float) -> None:
+    """
+    Registers cursor hooks that time every statement, attribute it to the current request and
+    log statements slower than slow_query_seconds.
+    """
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        operation = _operation(statement)
+        db_query_duration_seconds.observe(elapsed, operation)
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+            if stats.statements is not None:
+                stats.statements.append((elapsed, statement))
+        if elapsed >= slow_query_seconds:
+            db_slow_queries_total.inc(operation)
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split()))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _discard_timer(exception_context):
+        # after_cursor_execute doesn't run for failed statements
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start_time"):
+            connection.info["query_start_time"].pop()
+
+
+class MetricsMiddleware:
+    """
+    Records the status code, latency and database statement count of every HTTP request,
+    labelled by route template (e.g. /api/v1/tasks/{task_id}) rather than the raw path.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_query_stats.reset(token)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            http_requests_total.inc(method, route_path, str(status_code))
+            http_request_duration_seconds.observe(elapsed, method, route_path)
+            http_request_db_queries.observe(stats.count, method, route_path)
+
+
+def render_metrics() -> bytes:
+    return registry.render()
@@ -0,0 +1,30 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Tuple
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(created_at: datetime, task_id: uuid.UUID) -> str:
+    """
+    Encodes the (created_at, id) position of the last row of a page into an opaque cursor.
+    """
+    raw = json.dumps([created_at.isoformat(), str(task_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """
+    Decodes a cursor produced by encode_cursor back into its (created_at, id) position.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), uuid.UUID(task_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise InvalidCursorError("Invalid pagination cursor") from exc
@@ -0,0 +1,138 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import RequestQueryStats, current_query_stats
+from app.core.security import verify_access_token
+
+logger = logging.getLogger(__name__)
+
+PROFILE_REQUEST_HEADER = "x-profile"
+PROFILE_DUMP_HEADER = "X-Profile-Dump"
+
+
+def _authenticated_user(headers: Headers) -> Optional[dict]:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    return verify_access_token(token) if scheme.lower() == "bearer" else None
+
+
+def _dump_prefix(owner_id: int) -> str:
+    return f"user{owner_id}-"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles individual requests on demand. An authenticated request sent with `X-Profile: 1` runs
+    under cProfile; the stats are dumped to `dump_dir` (open them with `python -m pstats` or snakeviz)
+    and the response carries:
+
+    * X-Profile-Dump: the dump's file name, prefixed with the caller's user ID so that only they can
+      download it (see profile_dump_path),
+    * Server-Timing: time to the response headers, and the database time and statement count.
+
+    A report with the top functions and the slowest statements is logged as well.
+
+    cProfile hooks the whole event loop thread, so coroutines of concurrent requests show up in
+    the profile too, and work in the threadpool (sync dependencies) is not captured. Only one
+    request is profiled at a time; others asking for a profile while one runs are served normally.
+    """
+
+    def __init__(self, app: ASGIApp, dump_dir: str, top_functions: int = 25, top_queries: int = 10):
+        self.app = app
+        self.dump_dir = dump_dir
+        self.top_functions = top_functions
+        self.top_queries = top_queries
+        self._lock = threading.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        user = _authenticated_user(headers) if headers.get(PROFILE_REQUEST_HEADER) == "1" else None
+        if user is None:
+            await self.app(scope, receive, send)
+            return
+        if not self._lock.acquire(blocking=False):
+            logger.info("Another request is being profiled; serving %s %s without profiling", scope["method"], scope["path"])
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, user["id"])
+        finally:
+            self._lock.release()
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send, owner_id: int) -> None:
+        # Collect statements into the request's existing stats (see MetricsMiddleware), if any
+        stats = current_query_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestQueryStats()
+            token = current_query_stats.set(stats)
+        stats.statements = []
+        dump_name = "{}{}-{}-{}.prof".format(
+            _dump_prefix(owner_id), datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"), scope["method"].lower(),
+            uuid.uuid4().hex[:8],
+        )
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                response_headers = MutableHeaders(scope=message)
+                response_headers.append(PROFILE_DUMP_HEADER, dump_name)
+                response_headers.append(
+                    "Server-Timing",
+                    f'app;dur={elapsed_ms:.1f}, db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"',
+                )
+            await send(message)
+
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            if token is not None:
+                current_query_stats.reset(token)
+            self._report(scope, profiler, stats, dump_name, elapsed)
+            stats.statements = None
+
+    def _report(self, scope: Scope, profiler: cProfile.Profile, stats: RequestQueryStats, dump_name: str, elapsed: float) -> None:
+        os.makedirs(self.dump_dir, exist_ok=True)
+        dump_path = os.path.join(self.dump_dir, dump_name)
+        profiler.dump_stats(dump_path)
+
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(self.top_functions)
+        lines = [
+            f"Profiled {scope['method']} {scope['path']} in {elapsed * 1000:.1f} ms, dump: {dump_path}",
+            f"{stats.count} queries, {stats.seconds * 1000:.1f} ms total; slowest:",
+        ]
+        for seconds, statement in sorted(stats.statements or (), key=lambda item: item[0], reverse=True)[:self.top_queries]:
+            lines.append(f"  {seconds * 1000:8.2f} ms  {' '.join(statement.split())}")
+        lines.append(output.getvalue())
+        logger.info("\n".join(lines))
+
+
+def profile_dump_path(dump_dir: str, dump_name: str, owner_id: int) -> Optional[str]:
+    """
+    Resolves an X-Profile-Dump header value to its file, or None if it doesn't exist or was written
+    for another user's request (dumps hold their request paths and timings).
+    """
+    dump_name = os.path.basename(dump_name)
+    if not dump_name.startswith(_dump_prefix(owner_id)):
+        return None
+    path = os.path.join(dump_dir, dump_name)
+    return path if os.path.isfile(path) else None
@@ -1,27 +1,124 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.metrics import register_cache
 from jose import jwt
+from passlib.context import CryptContext
 
 
-# Mocked user and token generation for demonstration
-# In a real app, this would involve hashing passwords, JWT encoding/decoding
+# Password hashing; PASSWORD_BCRYPT_ROUNDS sets the cost of new hashes
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS)
 
-MOCKED_USER_DB = {
-    "user": {
-        "username": "user",
-        "password": "password"  # Plain text for mock. NEVER do this in production.
-    }
-}
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
 
-def authenticate_user_mocked(username: str, password: str) -> Optional[dict]:
+def verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
     """
-    Simulates user authentication against a mocked database.
+    Runs bcrypt on a bounded thread pool so hashing never blocks the event loop. bcrypt releases
+    the GIL while it works, so up to `max_workers` hashes run in parallel with request handling;
+    further calls queue for a free thread.
     """
-    user = MOCKED_USER_DB.get(username)
-    if user and user["password"] == password:
-        return user
-    return None
+
+    def __init__(self, context: CryptContext, max_workers: int):
+        self.context = context
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dummy_hash: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Checks password against hashed_password. Returns (valid, new_hash), where new_hash is set when
+        the stored hash uses outdated parameters (e.g. fewer bcrypt rounds) and should be replaced.
+        Without a stored hash (unknown user) a dummy hash is still checked, so the response time does
+        not reveal which usernames exist.
+        """
+        if hashed_password is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self.hash("dummy-password")
+            await self._run(self.context.verify, password, self._dummy_hash)
+            return False, None
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher(pwd_context, max_workers=settings.PASSWORD_HASH_WORKERS)
+
+
+class FailedLoginLimiter:
+    """
+    Limits login attempts per username in memory: at most `max_failures` attempts that did not
+    succeed within `window_seconds` of the first one. Tracking is bounded to `maxsize` usernames
+    (least recently tried are forgotten first) and is per process.
+
+    Attempts are reserved before the password is verified and only given back by a successful
+    login, so a burst of concurrent guesses can't all pass the check while the slow verifications
+    are still running:
+
+        retry_after = limiter.reserve(username)
+        if retry_after: ...  # Refused
+        if verified: limiter.reset(username)
+    """
+
+    def __init__(self, max_failures: int, window_seconds: float, maxsize: int = 10_000,
+                 timer=time.monotonic):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.timer = timer
+        self._attempts = TTLCache(maxsize=maxsize, timer=timer)
+        self._lock = threading.Lock()
+
+    def reserve(self, username: str) -> float:
+        """
+        Counts an attempt for username if it is still allowed and returns 0; otherwise returns the
+        seconds until username may try again, without counting the attempt.
+        """
+        if self.max_failures <= 0:
+            return 0
+        key = username.lower()
+        with self._lock:
+            now = self.timer()
+            count, expires_at = self._attempts.get(key) or (0, now + self.window_seconds)
+            if count >= self.max_failures:
+                return max(expires_at - now, 0)
+            self._attempts.set(key, (count + 1, expires_at), expires_at=expires_at)
+            return 0
+
+    def reset(self, username: str) -> None:
+        self._attempts.pop(username.lower())
+
+    def clear(self) -> None:
+        self._attempts.clear()
+
+
+login_limiter = FailedLoginLimiter(settings.LOGIN_MAX_FAILURES, settings.LOGIN_FAILURE_WINDOW_SECONDS)
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -37,15 +134,28 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+# Verified tokens, keyed by their SHA-256 digest and expiring at the token's own `exp` claim,
+# so repeat requests with the same bearer token skip JWT decoding and signature checks.
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, timer=time.time)
+register_cache("token", token_cache)
+
 def verify_access_token(token: str) -> Optional[dict]:
     """
-    Verifies an access token and returns the payload if valid.
+    Verifies an access token and returns the user it was issued to ({"id", "username"}) if valid.
     """
+    cache_key = hashlib.sha256(token.encode()).digest()
+    user = token_cache.get(cache_key)
+    if user is not None:
+        return dict(user)
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        user_id = payload.get("uid")
+        if username is None or user_id is None:
             return None
-        return {"username": username}
+        user = {"id": user_id, "username": username}
+        if payload.get("exp") is not None:
+            token_cache.set(cache_key, user, expires_at=payload["exp"])
+        return dict(user)
     except jwt.JWTError:
         return None
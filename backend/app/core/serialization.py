@@ -0,0 +1,49 @@
+import csv
+import io
+from typing import AsyncIterator, Iterable, Sequence
+
+import orjson
+from sqlalchemy import Row
+
+# OPT_UTC_Z renders UTC offsets as "Z", matching Pydantic's JSON output for TaskOut
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def dump_rows(rows: Iterable[Row]) -> bytes:
+    """
+    Serializes Core rows straight to a JSON array with orjson.
+    Produces the same JSON as List[TaskOut] for rows selected with task_service.TASK_COLUMNS,
+    without building ORM objects or Pydantic models.
+    """
+    return orjson.dumps([row._asdict() for row in rows], option=ORJSON_OPTIONS)
+
+
+async def ndjson_chunks(partitions: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    """
+    Encodes each partition of rows as newline-delimited JSON, one chunk per partition.
+    """
+    async for rows in partitions:
+        yield b"".join(orjson.dumps(row._asdict(), option=ORJSON_OPTIONS) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return getattr(value, "value", value)  # Enums are written by value
+
+
+async def csv_chunks(columns: Sequence[str], partitions: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    """
+    Encodes a header line and then each partition of rows as CSV, one chunk per partition.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
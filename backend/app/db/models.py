@@ -1,6 +1,9 @@
 import uuid
-from sqlalchemy import Column, String, Enum, DateTime
+from datetime import datetime, timezone
+from sqlalchemy import DDL, JSON, BigInteger, Boolean, Column, String, Enum, DateTime, ForeignKey, Index, Integer, LargeBinary, Text, event, text
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import FunctionElement
 import enum
 
 from sqlalchemy_utils import UUIDType 
@@ -11,16 +14,205 @@ class TaskStatusEnum(str, enum.Enum):
     PENDING = "pending"
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
+    OVERDUE = "overdue"  # Set by the scheduler when an open task passes its due_at
+
+# Statuses of tasks that are still open, and so can become overdue
+OPEN_STATUSES = (TaskStatusEnum.PENDING, TaskStatusEnum.IN_PROGRESS)
+
+class JobStatusEnum(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+class current_timestamp(FunctionElement):
+    """
+    Server-side default for timestamps. On SQLite, CURRENT_TIMESTAMP stores whole seconds in a
+    different text format from the datetimes SQLAlchemy writes ('YYYY-MM-DD HH:MM:SS.ffffff'), and
+    the two don't compare correctly as strings, so rows inserted without a value use that format too.
+    """
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+@compiles(current_timestamp)
+def _compile_current_timestamp(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(current_timestamp, "sqlite")
+def _compile_current_timestamp_sqlite(element, compiler, **kw):
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String, nullable=False, unique=True, index=True)
+    hashed_password = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+
+    def __repr__(self):
+        return f"<User(id={self.id}, username='{self.username}')>"
 
 class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String, index=True)
     description = Column(String, nullable=True)
     status = Column(Enum(TaskStatusEnum), default=TaskStatusEnum.PENDING, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    due_at = Column(DateTime(timezone=True), nullable=True)
+    priority = Column(Integer, nullable=False, default=2, server_default="2")  # 0 (most urgent) to 4
+    # Python-side timestamps keep sub-second precision (and a single storage format on SQLite),
+    # which keyset pagination and the list ETags rely on.
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=current_timestamp())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
+    # Position in a topological order of the owner's dependency graph: every blocker ranks below the
+    # tasks it blocks. Ranks are unique per owner and only given to tasks once they join an edge
+    # (see task_service.add_dependency).
+    dependency_rank = Column(Integer, nullable=True)
+
+    # Every task query is scoped to one owner, so owner_id leads the indexes and the cost of a
+    # user's listing follows their own task count rather than the size of the table.
+    __table_args__ = (
+        Index("ix_tasks_owner_id_status_created_at", "owner_id", "status", "created_at"),
+        Index("ix_tasks_owner_id_created_at_id", "owner_id", "created_at", "id"),  # Unfiltered keyset pages
+        Index("ix_tasks_owner_id_dependency_rank", "owner_id", "dependency_rank"),  # Lowest and highest rank
+        # Only tasks with a due date are scheduled: a user's "next up" list, and the scheduler's
+        # scan for open tasks coming due across all users
+        Index(
+            "ix_tasks_owner_id_status_due_at_priority", "owner_id", "status", "due_at", "priority",
+            sqlite_where=text("due_at IS NOT NULL"), postgresql_where=text("due_at IS NOT NULL"),
+        ),
+        Index(
+            "ix_tasks_status_due_at_priority", "status", "due_at", "priority",
+            sqlite_where=text("due_at IS NOT NULL"), postgresql_where=text("due_at IS NOT NULL"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<Task(id={self.id}, owner_id={self.owner_id}, title='{self.title}', status='{self.status}')>"
+
+class TaskChange(Base):
+    """
+    Append-only changelog of task writes. `seq` is the monotonic change token handed to sync clients;
+    rows with deleted=True are the tombstones of removed tasks. Rows older than
+    TASK_CHANGES_RETENTION_SECONDS are pruned by a job (see task_service.prune_changes).
+    """
+    __tablename__ = "task_changes"
+
+    # AUTOINCREMENT on SQLite so sequence numbers are never reused, even after pruning
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    task_id = Column(UUIDType(binary=False), nullable=False, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_task_changes_owner_id_seq", "owner_id", "seq"),
+        {"sqlite_autoincrement": True},
+    )
 
     def __repr__(self):
-        return f"<Task(id={self.id}, title='{self.title}', status='{self.status}')>"
+        return f"<TaskChange(seq={self.seq}, task_id={self.task_id}, deleted={self.deleted})>"
+
+class TaskDependency(Base):
+    """
+    Edge of the dependency graph: `blocked_id` cannot start until `blocker_id` is completed.
+    Both ends belong to the same user; the graph is kept acyclic by task_service.add_dependency.
+    """
+    __tablename__ = "task_dependencies"
+
+    # The primary key serves blocker -> blocked walks (what a task holds up); the index below
+    # serves blocked -> blocker walks (what a task waits for)
+    blocker_id = Column(UUIDType(binary=False), ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    blocked_id = Column(UUIDType(binary=False), ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+    __table_args__ = (Index("ix_task_dependencies_blocked_id_blocker_id", "blocked_id", "blocker_id"),)
+
+    def __repr__(self):
+        return f"<TaskDependency(blocker_id={self.blocker_id}, blocked_id={self.blocked_id})>"
+
+class Job(Base):
+    """
+    Persistent queue of deferred side effects (see app.services.jobs). Jobs are inserted in the
+    transaction of the write that causes them and deleted once they succeed; jobs that exhaust
+    their attempts stay behind as FAILED for inspection.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(JobStatusEnum), nullable=False, default=JobStatusEnum.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)  # Not before; pushed back on retry
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Lease of a RUNNING job; reclaimed after it lapses
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+    # Workers claim the oldest due job of a status
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}', attempts={self.attempts})>"
+
+class IdempotencyKey(Base):
+    """
+    A client's Idempotency-Key and the response of the write it was first sent with, replayed to
+    retries until expires_at (see app.services.idempotency_service). The primary key makes
+    concurrent requests with the same key race on the insert, so only one of them runs the write.
+    While that request runs it holds the claim (claim_token) and keeps renewing its lease
+    (locked_until); a claim whose lease lapsed belonged to a request that died and can be taken over.
+    """
+    __tablename__ = "idempotency_keys"
+
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of the method, path and payload
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    claim_token = Column(String(32), nullable=True)  # Identifies the request holding the claim
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Lease of an unfinished claim
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(owner_id={self.owner_id}, key='{self.key}', status_code={self.status_code})>"
+
+# Full-text search over title and description.
+# SQLite: an external-content FTS5 table keyed by the tasks rowid and kept in sync by triggers.
+# Implicit rowids can change on VACUUM, so rebuild the index afterwards:
+#     INSERT INTO tasks_fts(tasks_fts) VALUES('rebuild');
+# Postgres: a GIN index on the same tsvector expression the search query uses.
+# The same statements are applied to existing databases by the corresponding Alembic revision.
+SEARCH_TABLE = "tasks_fts"
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5(title, description, content='tasks', content_rowid='rowid')",
+    # Default ranking: bm25 with title matches weighted 10x over description matches
+    "INSERT INTO tasks_fts(tasks_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END""",
+    """CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+    END""",
+    """CREATE TRIGGER tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END""",
+)
+POSTGRES_SEARCH_DOCUMENT = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, ''))"
+POSTGRES_SEARCH_DDL = (
+    f"CREATE INDEX ix_tasks_search ON tasks USING gin ({POSTGRES_SEARCH_DOCUMENT})",
+)
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Task.__table__, "before_drop", DDL(f"DROP TABLE IF EXISTS {SEARCH_TABLE}").execute_if(dialect="sqlite"))
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
@@ -1,10 +1,145 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import itertools
+import time
+from typing import Any, Dict, Hashable, List, Optional, Sequence
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+
+from app.core.cache import TTLCache
 from app.core.config import settings
 
+# Async driver used for each sync driver name.
+# DATABASE_URL keeps its sync form so Alembic can keep using it as-is.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Translates a sync database URL into the equivalent URL for its async driver.
+    URLs that already name an async driver are returned unchanged.
+    """
+    url = make_url(database_url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url.render_as_string(hide_password=False)
+
+def is_sqlite_memory_url(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+def get_engine_options(database_url: str) -> Dict[str, Any]:
+    """
+    Builds the create_async_engine() keyword arguments for the backend behind database_url.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+
+    options: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}
+    if is_sqlite_memory_url(database_url):
+        # Every connection to an in-memory database sees a different database
+        options["poolclass"] = StaticPool
+    else:
+        # aiosqlite defaults to NullPool, which reopens the file (and re-runs the pragmas) per session
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
+
+def apply_sqlite_pragmas(sync_engine: Engine) -> None:
+    """
+    Registers a connect hook that applies the SQLite performance profile to every new connection.
+    """
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def create_engine_for_url(database_url: str):
+    """
+    Creates an async engine for database_url with the configured pooling and, for SQLite,
+    the performance profile.
+    """
+    async_url = get_async_database_url(database_url)
+    async_engine = create_async_engine(async_url, **get_engine_options(async_url))
+    if async_engine.dialect.name == "sqlite" and settings.SQLITE_PERFORMANCE_MODE:
+        apply_sqlite_pragmas(async_engine.sync_engine)
+    return async_engine
+
+class ReadOnlySession(Session):
+    """ORM session for replica connections; flushing changes through it is an error."""
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def _reject_replica_writes(session, flush_context, instances):
+    raise InvalidRequestError("Replica sessions are read-only; use the primary session to write")
+
+def parse_replica_urls(replica_urls: str) -> List[str]:
+    return [url.strip() for url in replica_urls.split(",") if url.strip()]
+
+class ReplicaRouter:
+    """
+    Picks the session factory for a read: replicas in round-robin order, or the primary when there
+    are no replicas or the reader wrote within the last `sticky_seconds` (read-your-writes, since
+    replicas may lag behind the primary). Sticky readers are tracked in memory, per process.
+    """
+
+    def __init__(self, primary: async_sessionmaker, replicas: Sequence[async_sessionmaker], sticky_seconds: float,
+                 maxsize: int = 10_000, timer=time.monotonic):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self._next_replica = itertools.cycle(self.replicas)
+        self._recent_writers = TTLCache(maxsize=maxsize, ttl=sticky_seconds, timer=timer)
+
+    def mark_write(self, reader: Hashable) -> None:
+        """Pins reader's reads to the primary for the next `sticky_seconds`."""
+        self._recent_writers.set(reader, True)
+
+    def session_factory(self, reader: Optional[Hashable] = None) -> async_sessionmaker:
+        if not self.replicas or (reader is not None and self._recent_writers.get(reader)):
+            return self.primary
+        return next(self._next_replica)
+
 # Create engine
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine_for_url(settings.DATABASE_URL)
+replica_engines = [create_engine_for_url(url) for url in parse_replica_urls(settings.DATABASE_REPLICA_URLS)]
 
 # Create a SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: async sessions cannot lazy-load attributes after a commit
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+replica_router = ReplicaRouter(
+    SessionLocal,
+    [
+        async_sessionmaker(bind=replica, autoflush=False, expire_on_commit=False, sync_session_class=ReadOnlySession)
+        for replica in replica_engines
+    ],
+    sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+)
@@ -1,12 +1,22 @@
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy.orm import Session
 from contextlib import asynccontextmanager
 
-from app.api.endpoints import tasks, auth
+from app.api.endpoints import tasks, auth, profiles
 from app.core.logging_config import setup_logging # New import for logging setup
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, instrument_engine, render_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.security import password_hasher
+from app.db.session import SessionLocal, engine, replica_engines
+from app.services import task_service
+from app.services.events import event_bus
+from app.services.jobs import job_queue
+from app.services.scheduler import scheduler
 
 # Configure logging at the start
 setup_logging()
@@ -18,8 +28,22 @@ async def lifespan(app: FastAPI):
     # On startup: No longer calling Base.metadata.create_all() here.
     # Alembic will manage database schema.
     logger.info("Application starting up. Database schema managed by Alembic.") # Updated log message
+    await event_bus.start()
+    await job_queue.start()
+    async with SessionLocal() as db:  # Starts the changelog pruning cycle, unless another process did
+        await task_service.schedule_changes_pruning(db)
+    if settings.SCHEDULER_ENABLED:
+        await scheduler.start()
     yield
-    # On shutdown: Perform any cleanup if necessary
+    await scheduler.close()
+    # Drain the job workers first: running jobs may still need the database
+    await job_queue.close(timeout=settings.JOBS_DRAIN_TIMEOUT_SECONDS)
+    await event_bus.close()
+    password_hasher.close()
+    # On shutdown: close pooled connections (aiosqlite keeps a thread per open connection)
+    await engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
     logger.info("Application shutdown completed.")
 
 
@@ -27,7 +51,8 @@ app = FastAPI(
     title="Task Management API",
     description="API for managing tasks, including creation, listing, filtering, updating, and deletion.",
     version="1.0.0",
-    lifespan=lifespan # Link the lifespan manager
+    lifespan=lifespan, # Link the lifespan manager
+    default_response_class=ORJSONResponse if settings.ORJSON_RESPONSES else JSONResponse,
 )
 
 # Configure CORS
@@ -44,14 +69,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link", "ETag", "Idempotent-Replayed"],  # Lets the browser read the pagination, caching and replay headers
 )
 
+# Compress large responses (task lists, exports); the change feed is left uncompressed
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.GZIP_COMPRESSLEVEL,
+        brotli_quality=settings.BROTLI_QUALITY,
+        brotli_enabled=settings.BROTLI_ENABLED,
+    )
+
+# Opt-in profiling of single requests (X-Profile: 1); runs inside the metrics middleware so both
+# share the request's query statistics
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, dump_dir=settings.PROFILING_DUMP_DIR)
+
+# Request metrics; added last so the measured latency includes the other middleware
+if settings.METRICS_ENABLED or settings.PROFILING_ENABLED:
+    for instrumented in (engine, *replica_engines):
+        instrument_engine(instrumented.sync_engine, settings.METRICS_SLOW_QUERY_SECONDS)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include API routers
 app.include_router(tasks.router, prefix="/api/v1", tags=["tasks"])
 app.include_router(auth.router, prefix="/api/v1", tags=["authentication"])
+if settings.PROFILING_ENABLED:
+    app.include_router(profiles.router, tags=["Monitoring"])
 
 @app.get("/health", tags=["Monitoring"])
 async def health_check():
     logger.info("Health check endpoint accessed.")
     return {"status": "ok"}
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["Monitoring"], include_in_schema=False)
+    async def metrics():
+        return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
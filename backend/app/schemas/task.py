@@ -1,26 +1,92 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import Dict, List, Optional
+from datetime import date, datetime, timezone
+import enum
 import uuid
 
+from app.core.config import settings
 from app.db.models import TaskStatusEnum
 
+def _due_at_as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Due dates are compared with the clock in SQL, and SQLite stores datetimes without an offset,
+    # so they are always stored in UTC; naive values are taken to be UTC already.
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc)
+
+def _not_null(value):
+    # Updates are partial, so a field may be left out, but an explicit null would reach a NOT NULL column
+    if value is None:
+        raise ValueError("may be omitted but not null")
+    return value
+
 class TaskBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=255)
     description: Optional[str] = Field(None, max_length=1000)
     status: TaskStatusEnum = Field(TaskStatusEnum.PENDING)
+    due_at: Optional[datetime] = None
+    priority: int = Field(2, ge=0, le=4)  # 0 is the most urgent
 
 class TaskCreate(TaskBase):
-    pass
+    _normalize_due_at = field_validator("due_at")(_due_at_as_utc)
 
 class TaskUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=255)
     description: Optional[str] = Field(None, max_length=1000)
     status: Optional[TaskStatusEnum] = None
+    due_at: Optional[datetime] = None
+    priority: Optional[int] = Field(None, ge=0, le=4)
+
+    _reject_null = field_validator("title", "status", "priority")(_not_null)
+    _normalize_due_at = field_validator("due_at")(_due_at_as_utc)
 
 class TaskOut(TaskBase):
     model_config = ConfigDict(from_attributes=True)
     
     id: uuid.UUID 
     created_at: datetime
-    updated_at: Optional[datetime]
\ No newline at end of file
+    updated_at: Optional[datetime]
+
+class TaskExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class TaskBatchCreate(BaseModel):
+    items: List[TaskCreate] = Field(..., min_length=1, max_length=settings.TASK_BATCH_MAX_ITEMS)
+
+class TaskBatchUpdateItem(TaskUpdate):
+    id: uuid.UUID
+
+class TaskBatchUpdate(BaseModel):
+    items: List[TaskBatchUpdateItem] = Field(..., min_length=1, max_length=settings.TASK_BATCH_MAX_ITEMS)
+
+class TaskBatchDelete(BaseModel):
+    ids: List[uuid.UUID] = Field(..., min_length=1, max_length=settings.TASK_BATCH_MAX_ITEMS)
+
+class TaskBatchItemResult(BaseModel):
+    id: uuid.UUID
+    status_code: int
+    task: Optional[TaskOut] = None
+    detail: Optional[str] = None
+
+class TaskBatchResult(BaseModel):
+    results: List[TaskBatchItemResult]
+
+class TaskDailyCount(BaseModel):
+    day: date
+    created: int
+    completed: int
+
+class TaskStats(BaseModel):
+    total: int
+    by_status: Dict[TaskStatusEnum, int]
+    days: int
+    daily: List[TaskDailyCount]
+
+class TaskChanges(BaseModel):
+    changes: List[TaskOut]
+    deleted: List[uuid.UUID]
+    next_token: int
+    has_more: bool
+    resync_required: bool = False  # `since` is older than the retained changelog: reload all tasks
+
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiosqlite
+import orjson
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TASK_CREATED = "task.created"
+TASK_UPDATED = "task.updated"
+TASK_DELETED = "task.deleted"
+# Sent instead of a replay when events after the client's Last-Event-ID may be lost (the server
+# restarted, or they are no longer retained): the client has to reload its tasks.
+RESYNC = "resync"
+
+
+@dataclass(frozen=True)
+class TaskEvent:
+    id: int
+    type: str
+    data: Dict[str, Any]
+    owner_id: Optional[int] = None  # Only subscribers of this user receive the event; not sent to clients
+
+    def to_json(self) -> bytes:
+        return orjson.dumps({"id": self.id, "type": self.type, "data": self.data})
+
+    def to_sse(self) -> bytes:
+        """
+        Encodes the event as a Server-Sent Events message.
+        """
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (self.id, self.type.encode(), orjson.dumps(self.data))
+
+
+class Subscription:
+    """
+    A subscriber's view of the bus: an async iterator over events, registered as soon as it is created.
+    Use it as a context manager so it is always unregistered:
+
+        with event_bus.subscribe(owner_id, last_event_id) as subscription:
+            async for event in subscription:
+                ...
+    """
+
+    def __init__(self, backend: "EventBackend", owner_id: Optional[int], last_event_id: Optional[int]):
+        self.backend = backend
+        self.owner_id = owner_id
+        self.last_event_id = last_event_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=backend.queue_size)
+        self.overflowed = False
+        backend._subscribers.add(self)
+
+    def accepts(self, event: TaskEvent) -> bool:
+        return self.owner_id is None or event.owner_id == self.owner_id
+
+    def offer(self, event: TaskEvent) -> None:
+        # Runs on the subscriber's own loop (see EventBackend._dispatch)
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: end the stream; the client resumes from its Last-Event-ID
+            self.overflowed = True
+
+    async def __aiter__(self) -> AsyncIterator[TaskEvent]:
+        last_seen = self.last_event_id
+        if last_seen is not None:
+            oldest, newest = await self.backend.retained_range()
+            if last_seen > newest or last_seen < oldest - 1:
+                # The ID is from another boot or older than the retained history. Its ID moves the
+                # client's Last-Event-ID past the gap, so the stream resumes normally from here.
+                last_seen = newest
+                yield TaskEvent(newest, RESYNC, {}, self.owner_id)
+            else:
+                for event in await self.backend.history(last_seen):
+                    last_seen = event.id
+                    if self.accepts(event):
+                        yield event
+        while True:
+            event = await self.queue.get()
+            if self.overflowed:
+                return
+            if last_seen is not None and event.id <= last_seen:
+                continue  # Already replayed from history
+            last_seen = event.id
+            yield event
+
+    def close(self) -> None:
+        self.backend._subscribers.discard(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class EventBackend(ABC):
+    """
+    Change-event bus for task mutations.
+    Backends decide where events are stored and how they reach other workers; fan-out to the
+    subscribers of this worker is shared. Event IDs are monotonically increasing integers, also
+    across restarts, so an ID from before a restart is recognized as out of range.
+    """
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers: set = set()
+
+    async def start(self) -> None:
+        """Called from the application lifespan before the first request."""
+
+    async def close(self) -> None:
+        """Called from the application lifespan on shutdown."""
+
+    @abstractmethod
+    async def publish(self, event_type: str, data: Dict[str, Any], owner_id: Optional[int] = None) -> None:
+        """Records an event and delivers it to every subscriber of owner_id (or to all, if None)."""
+
+    async def publish_many(self, event_type: str, items: List[Dict[str, Any]], owner_id: Optional[int] = None) -> None:
+        """Publishes one event per item, e.g. for batch writes."""
+        for data in items:
+            await self.publish(event_type, data, owner_id)
+
+    @abstractmethod
+    async def history(self, after_id: int) -> List[TaskEvent]:
+        """Returns the retained events with an ID greater than after_id, oldest first."""
+
+    @abstractmethod
+    async def retained_range(self) -> Tuple[int, int]:
+        """
+        Returns the IDs of the oldest retained event and of the newest event published; with nothing
+        retained, the oldest is newest + 1.
+        """
+
+    def _dispatch(self, event: TaskEvent) -> None:
+        # Subscribers may live on other event loops (e.g. one per test client request), so hand
+        # the event over through each subscriber's own loop.
+        for subscription in list(self._subscribers):
+            if subscription.accepts(event):
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+
+    def subscribe(self, owner_id: Optional[int] = None, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Starts receiving the events of owner_id's tasks (every event if None) right away.
+        When last_event_id is given, retained events published after it are replayed first,
+        so reconnecting clients don't miss changes; if some of them are gone, a RESYNC event is
+        sent instead. Must be called from a running event loop.
+        """
+        return Subscription(self, owner_id, last_event_id)
+
+
+class InMemoryEventBackend(EventBackend):
+    """
+    Keeps the last `history_size` events in process. Only subscribers of the same worker see them.
+    IDs count up from the boot time in microseconds, so they keep increasing across restarts.
+    """
+
+    def __init__(self, history_size: int = 1000, queue_size: int = 1000):
+        super().__init__(queue_size)
+        self._history: deque = deque(maxlen=history_size)
+        self._last_id = time.time_ns() // 1000
+
+    async def publish(self, event_type: str, data: Dict[str, Any], owner_id: Optional[int] = None) -> None:
+        self._last_id += 1
+        event = TaskEvent(self._last_id, event_type, data, owner_id)
+        self._history.append(event)
+        self._dispatch(event)
+
+    async def history(self, after_id: int) -> List[TaskEvent]:
+        return [event for event in self._history if event.id > after_id]
+
+    async def retained_range(self) -> Tuple[int, int]:
+        return (self._history[0].id if self._history else self._last_id + 1), self._last_id
+
+
+class SQLiteEventBackend(EventBackend):
+    """
+    Local stand-in broker that lets several uvicorn workers on one host share events.
+    Events are appended to a table in a shared SQLite file (which also assigns their IDs;
+    AUTOINCREMENT never reuses them while the file exists), and each worker runs one poller that
+    fans new rows out to its own subscribers.
+    """
+
+    def __init__(self, path: str, history_size: int = 1000, queue_size: int = 1000, poll_interval: float = 0.25):
+        super().__init__(queue_size)
+        self.path = path
+        self.history_size = history_size
+        self.poll_interval = poll_interval
+        self._connection: Optional[aiosqlite.Connection] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._last_id = 0
+
+    async def start(self) -> None:
+        self._connection = await aiosqlite.connect(self.path)
+        await self._connection.execute("PRAGMA journal_mode=WAL")
+        await self._connection.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        await self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS task_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT NOT NULL, data BLOB NOT NULL, owner_id INTEGER)"
+        )
+        async with self._connection.execute("PRAGMA table_info(task_events)") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if "owner_id" not in columns:  # Broker file created by an older version
+            await self._connection.execute("ALTER TABLE task_events ADD COLUMN owner_id INTEGER")
+        await self._connection.commit()
+        async with self._connection.execute("SELECT coalesce(max(id), 0) FROM task_events") as cursor:
+            self._last_id = (await cursor.fetchone())[0]
+        self._poller = asyncio.create_task(self._poll())
+
+    async def close(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def publish(self, event_type: str, data: Dict[str, Any], owner_id: Optional[int] = None) -> None:
+        await self.publish_many(event_type, [data], owner_id)
+
+    async def publish_many(self, event_type: str, items: List[Dict[str, Any]], owner_id: Optional[int] = None) -> None:
+        await self._connection.executemany(
+            "INSERT INTO task_events (type, data, owner_id) VALUES (?, ?, ?)",
+            [(event_type, orjson.dumps(data), owner_id) for data in items],
+        )
+        await self._connection.execute(
+            "DELETE FROM task_events WHERE id <= (SELECT max(id) FROM task_events) - ?", (self.history_size,)
+        )
+        await self._connection.commit()
+
+    async def history(self, after_id: int) -> List[TaskEvent]:
+        async with self._connection.execute(
+            "SELECT id, type, data, owner_id FROM task_events WHERE id > ? ORDER BY id", (after_id,)
+        ) as cursor:
+            return [TaskEvent(row[0], row[1], orjson.loads(row[2]), row[3]) for row in await cursor.fetchall()]
+
+    async def retained_range(self) -> Tuple[int, int]:
+        async with self._connection.execute(
+            "SELECT min(id), coalesce(max(id), (SELECT seq FROM sqlite_sequence WHERE name = 'task_events'), 0) "
+            "FROM task_events"
+        ) as cursor:
+            oldest, newest = await cursor.fetchone()
+        return (newest + 1 if oldest is None else oldest), newest
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                for event in await self.history(self._last_id):
+                    self._last_id = event.id
+                    self._dispatch(event)
+            except Exception:
+                logger.exception("Failed to poll the task event broker")
+            await asyncio.sleep(self.poll_interval)
+
+
+async def with_keepalive(subscription: Subscription, interval: float) -> AsyncIterator[Optional[TaskEvent]]:
+    """
+    Re-yields the subscription's events, yielding None whenever `interval` seconds pass without one,
+    so streaming endpoints can send keepalives through idle proxies.
+    """
+    events = subscription.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield None
+                continue
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield event
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait({pending})  # The generator must stop running before it can be closed
+        await events.aclose()
+
+
+def create_event_backend() -> EventBackend:
+    """
+    Builds the event backend selected by the EVENTS_BACKEND setting ("memory" or "sqlite").
+    """
+    if settings.EVENTS_BACKEND == "sqlite":
+        return SQLiteEventBackend(
+            settings.EVENTS_BROKER_PATH,
+            history_size=settings.EVENTS_HISTORY_SIZE,
+            queue_size=settings.EVENTS_SUBSCRIBER_QUEUE_SIZE,
+            poll_interval=settings.EVENTS_POLL_INTERVAL_SECONDS,
+        )
+    if settings.EVENTS_BACKEND != "memory":
+        raise ValueError(f"Unknown EVENTS_BACKEND: {settings.EVENTS_BACKEND!r}")
+    return InMemoryEventBackend(
+        history_size=settings.EVENTS_HISTORY_SIZE,
+        queue_size=settings.EVENTS_SUBSCRIBER_QUEUE_SIZE,
+    )
+
+
+event_bus = create_event_backend()
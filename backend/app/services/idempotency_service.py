@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import AsyncIterator, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Row, and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.models import IdempotencyKey, utcnow
+from app.db.session import SessionLocal
+from app.services.jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_EXPIRE_JOB = "idempotency.expire"
+
+
+class IdempotencyKeyInProgressError(Exception):
+    """Raised when the first request sent with a key has not finished yet."""
+
+class IdempotencyKeyReusedError(ValueError):
+    """Raised when a key is sent again with a different request."""
+
+def request_fingerprint(method: str, path: str, payload: BaseModel) -> str:
+    """
+    Identifies a request by its method, path and validated payload, so retries match even if the
+    client re-encodes the body differently.
+    """
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(payload.model_dump_json().encode())
+    return digest.hexdigest()
+
+def _reclaimable(owner_id: int, key: str, now):
+    # Expired keys, and claims whose request died (stopped renewing its lease) before storing a
+    # response, are free again
+    return and_(
+        IdempotencyKey.owner_id == owner_id,
+        IdempotencyKey.key == key,
+        or_(
+            IdempotencyKey.expires_at <= now,
+            and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_until <= now),
+        ),
+    )
+
+def _held_claim(owner_id: int, key: str, token: str):
+    return and_(
+        IdempotencyKey.owner_id == owner_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.claim_token == token,
+        IdempotencyKey.status_code.is_(None),
+    )
+
+async def claim_key(db: AsyncSession, owner_id: int, key: str, fingerprint: str, token: str) -> Optional[Row]:
+    """
+    Claims `key` for a request identified by `token` (unique per request). Returns None if the
+    caller now holds the key and should run the request under keep_claim(), storing its response
+    with store_response() in the request's write transaction, or call release_key() if that fails;
+    returns the stored (status_code, response_body) if an earlier request with the key already completed.
+    The claim is leased for IDEMPOTENCY_LOCK_SECONDS, and only taken over by a retry once its lease lapsed.
+
+    Concurrent requests are settled by the primary key of the insert, not by locks held here: the
+    loser gets an IntegrityError and reads the winner's row. Raises IdempotencyKeyInProgressError
+    if that request is still running and IdempotencyKeyReusedError if it had a different fingerprint.
+    """
+    now = utcnow()
+    for attempt in range(2):
+        try:
+            await db.execute(insert(IdempotencyKey).values(
+                owner_id=owner_id,
+                key=key,
+                fingerprint=fingerprint,
+                claim_token=token,
+                locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+                created_at=now,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            ))
+            await job_queue.enqueue(
+                db, IDEMPOTENCY_EXPIRE_JOB, {"owner_id": owner_id, "key": key},
+                delay=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+            )
+            await db.commit()
+            return None
+        except IntegrityError:
+            await db.rollback()
+        if attempt == 0:
+            reclaimed = (await db.execute(delete(IdempotencyKey).where(_reclaimable(owner_id, key, now)))).rowcount
+            if not reclaimed:
+                await db.rollback()  # Don't hold on to the write lock while the key is still taken
+                break
+            await db.commit()
+
+    stored = (await db.execute(
+        select(IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.response_body)
+        .where(IdempotencyKey.owner_id == owner_id, IdempotencyKey.key == key)
+    )).first()
+    if stored is not None and stored.fingerprint != fingerprint:
+        raise IdempotencyKeyReusedError("The Idempotency-Key was already used with a different request")
+    if stored is None or stored.status_code is None:
+        raise IdempotencyKeyInProgressError("A request with this Idempotency-Key is still in progress")
+    return stored
+
+@asynccontextmanager
+async def keep_claim(
+    owner_id: int, key: str, token: str, session_factory: async_sessionmaker = SessionLocal,
+) -> AsyncIterator[None]:
+    """
+    Renews the lease of the caller's claim every third of IDEMPOTENCY_LOCK_SECONDS while the block
+    runs, so a request that is slow but alive is never taken over by a retry. Renewals use their
+    own sessions: the request's transaction would only publish them when it commits.
+    """
+    interval = settings.IDEMPOTENCY_LOCK_SECONDS / 3
+
+    async def renew() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_factory() as db:
+                    result = await db.execute(
+                        update(IdempotencyKey)
+                        .where(_held_claim(owner_id, key, token))
+                        .values(locked_until=utcnow() + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS))
+                    )
+                    await db.commit()
+                if not result.rowcount:
+                    return  # Completed, released or taken over: nothing left to hold
+            except Exception:
+                # E.g. SQLite's write lock, held by the request's own write; a retry can't take
+                # the claim over while that lasts either
+                logger.warning("Could not renew the lease of Idempotency-Key %r", key, exc_info=True)
+
+    renewal = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        renewal.cancel()
+        try:
+            await renewal
+        except asyncio.CancelledError:
+            pass
+
+async def store_response(db: AsyncSession, owner_id: int, key: str, token: str, status_code: int, body: bytes) -> None:
+    """
+    Records the response of the request that claimed `key`, for replay to its retries. Runs inside
+    the request's write transaction and is committed with it, so a committed write always has its
+    response stored, and a retry can never repeat it.
+    Raises IdempotencyKeyInProgressError if the claim was taken over after its lease lapsed; the
+    caller's write must then roll back, as the request now holding the key runs it instead.
+    """
+    result = await db.execute(
+        update(IdempotencyKey)
+        .where(_held_claim(owner_id, key, token))
+        .values(status_code=status_code, response_body=body)
+    )
+    if not result.rowcount:
+        raise IdempotencyKeyInProgressError("Another request with this Idempotency-Key took over")
+
+async def release_key(db: AsyncSession, owner_id: int, key: str, token: str) -> None:
+    """
+    Gives up the caller's claim after its request failed, so a retry runs it again. Keys whose
+    write committed (and stored its response) are kept, even if the request failed afterwards,
+    and so are claims that another request took over.
+    """
+    await db.rollback()
+    await db.execute(delete(IdempotencyKey).where(_held_claim(owner_id, key, token)))
+    await db.commit()
+
+@job_queue.handler(IDEMPOTENCY_EXPIRE_JOB)
+async def _expire_key(payload: dict) -> None:
+    # Queued with each claim to run once its TTL is up. A key claimed again after expiring has a
+    # later expires_at (and its own job), so it is left alone.
+    async with job_queue.session_factory() as db:
+        await db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.owner_id == payload["owner_id"],
+            IdempotencyKey.key == payload["key"],
+            IdempotencyKey.expires_at <= utcnow(),
+        ))
+        await db.commit()
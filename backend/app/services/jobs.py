@@ -0,0 +1,202 @@
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import Row, and_, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.models import Job, JobStatusEnum, utcnow
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class JobQueue:
+    """
+    Persistent queue of deferred side effects, stored in the jobs table and run by a pool of
+    asyncio workers in each app process.
+
+    Producers enqueue inside the transaction of the write that causes the job, so a job exists
+    exactly when its write committed, then call notify() after the commit to wake idle workers.
+    Delivery is at-least-once (a job whose worker dies is re-run once its lease lapses), so
+    handlers must be idempotent:
+
+        @job_queue.handler("task_changes.prune")
+        async def prune_changes(payload: dict) -> None:
+            ...
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        retry_backoff: float = 2.0,
+        lease_seconds: float = 300.0,
+        enabled: bool = True,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self.enabled = enabled
+        self.handlers: Dict[str, JobHandler] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def handler(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+        """Registers the decorated coroutine function as the handler of `kind` jobs."""
+        def register(fn: JobHandler) -> JobHandler:
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    async def enqueue(self, db: AsyncSession, kind: str, payload: Dict[str, Any], delay: float = 0) -> None:
+        """
+        Adds a job inside the caller's transaction; it becomes visible to workers when the caller commits.
+        """
+        if not self.enabled:
+            return
+        await db.execute(
+            insert(Job).values(kind=kind, payload=payload, run_at=utcnow() + timedelta(seconds=delay))
+        )
+
+    def notify(self) -> None:
+        """Wakes this process's idle workers, e.g. right after committing new jobs. Thread-safe."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        """Starts the worker pool. Called from the application lifespan."""
+        if not self.enabled or self.workers <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """
+        Stops claiming jobs and waits up to `timeout` seconds for running jobs to finish. Jobs still
+        running after that are cancelled and put back in the queue for the next start.
+        """
+        if not self._worker_tasks:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        _, pending = await asyncio.wait(self._worker_tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Cancelled %d job(s) still running after %.1fs", len(pending), timeout)
+            await asyncio.wait(pending)
+        self._worker_tasks = []
+        self._loop = None
+
+    async def run_next(self) -> bool:
+        """Claims and runs the next due job. Returns False if there was none."""
+        job = await self._claim()
+        if job is None:
+            return False
+        try:
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                raise LookupError(f"No handler registered for {job.kind!r} jobs")
+            await handler(job.payload)
+        except asyncio.CancelledError:
+            await self._release(job)
+            raise
+        except Exception as exc:
+            await self._fail(job, exc)
+        else:
+            async with self.session_factory() as db:
+                await db.execute(delete(Job).where(Job.id == job.id))
+                await db.commit()
+        return True
+
+    async def _claim(self) -> Optional[Row]:
+        # One atomic UPDATE ... RETURNING, so two workers never claim the same job. SQLite serializes
+        # writers; on Postgres, SKIP LOCKED lets concurrent claims pass over each other's rows.
+        now = utcnow()
+        due = (
+            select(Job.id)
+            .where(or_(
+                and_(Job.status == JobStatusEnum.PENDING, Job.run_at <= now),
+                and_(Job.status == JobStatusEnum.RUNNING, Job.locked_until < now),  # Lease lapsed
+            ))
+            .order_by(Job.run_at, Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with self.session_factory() as db:
+            job = (await db.execute(
+                update(Job)
+                .where(Job.id == due)
+                .values(
+                    status=JobStatusEnum.RUNNING,
+                    attempts=Job.attempts + 1,
+                    locked_until=now + timedelta(seconds=self.lease_seconds),
+                )
+                .returning(Job.id, Job.kind, Job.payload, Job.attempts)
+                .execution_options(synchronize_session=False)
+            )).first()
+            await db.commit()
+        return job
+
+    async def _fail(self, job: Row, exc: Exception) -> None:
+        if job.attempts >= self.max_attempts:
+            logger.error("Job %s (%s) failed for good after %d attempts", job.id, job.kind, job.attempts, exc_info=exc)
+            values = {"status": JobStatusEnum.FAILED}
+        else:
+            delay = self.retry_backoff * 2 ** (job.attempts - 1)
+            logger.warning("Job %s (%s) failed, retrying in %.1fs", job.id, job.kind, delay, exc_info=exc)
+            values = {"status": JobStatusEnum.PENDING, "run_at": utcnow() + timedelta(seconds=delay)}
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Job).where(Job.id == job.id).values(locked_until=None, last_error=repr(exc)[:1000], **values)
+            )
+            await db.commit()
+
+    async def _release(self, job: Row) -> None:
+        # Interrupted by shutdown: hand the job back without using up one of its attempts
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id)
+                .values(status=JobStatusEnum.PENDING, attempts=Job.attempts - 1, locked_until=None)
+            )
+            await db.commit()
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                if await self.run_next():
+                    continue
+            except Exception:
+                logger.exception("Job worker failed to reach the jobs table")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+job_queue = JobQueue(
+    SessionLocal,
+    workers=settings.JOBS_WORKERS,
+    poll_interval=settings.JOBS_POLL_INTERVAL_SECONDS,
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    retry_backoff=settings.JOBS_RETRY_BACKOFF_SECONDS,
+    lease_seconds=settings.JOBS_LEASE_SECONDS,
+    enabled=settings.JOBS_ENABLED,
+)
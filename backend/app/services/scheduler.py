@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.db.models import OPEN_STATUSES, utcnow
+from app.db.session import SessionLocal
+from app.services import task_service
+from app.services.events import TASK_CREATED, TASK_UPDATED, EventBackend, TaskEvent, event_bus
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUS_VALUES = {status.value for status in OPEN_STATUSES}
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands datetimes back without an offset; they are stored in UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class OverdueScheduler:
+    """
+    Moves open tasks to OVERDUE once their due_at passes.
+
+    Upcoming due dates sit in a min-heap, so each tick only pops the tasks that came due, in
+    O(log n) each, instead of scanning the table. The heap holds the tasks due within `horizon`
+    seconds; it is reloaded from the (status, due_at) index when the horizon runs out, and kept
+    current in between by the task change events, which carry each task's due_at and status.
+    Entries are never removed early: a task that was finished or rescheduled is filtered out by
+    the UPDATE itself (see task_service.mark_overdue), and a rescheduled task is pushed again.
+
+    Every app process runs its own scheduler; the conditional UPDATE makes that safe, and the
+    horizon reloads pick up writes that reached other processes' event buses only.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        bus: EventBackend,
+        interval: float = 1.0,
+        horizon: float = 300.0,
+        batch_size: int = 500,
+    ):
+        self.session_factory = session_factory
+        self.bus = bus
+        self.interval = interval
+        self.horizon = timedelta(seconds=horizon)
+        self.batch_size = batch_size
+        self._heap: List[Tuple[datetime, uuid.UUID]] = []
+        self._loaded_until: Optional[datetime] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def schedule(self, task_id: uuid.UUID, due_at: datetime) -> None:
+        """Tracks a task coming due; tasks due after the loaded horizon are picked up by the next reload."""
+        due_at = _as_utc(due_at)
+        if self._loaded_until is None or due_at < self._loaded_until:
+            heapq.heappush(self._heap, (due_at, task_id))
+
+    def observe(self, event: TaskEvent) -> None:
+        if event.type in (TASK_CREATED, TASK_UPDATED) and event.data.get("due_at") is not None:
+            if event.data["status"] in OPEN_STATUS_VALUES:
+                self.schedule(uuid.UUID(event.data["id"]), datetime.fromisoformat(event.data["due_at"]))
+
+    async def reload(self, now: datetime) -> None:
+        loaded_until = now + self.horizon
+        async with self.session_factory() as db:
+            rows = await task_service.get_due_tasks(db, before=loaded_until)
+        # Keep what was pushed while the query ran; entries present twice collapse into one
+        self._heap = list({(_as_utc(row.due_at), row.id) for row in rows}.union(self._heap))
+        heapq.heapify(self._heap)
+        self._loaded_until = loaded_until
+
+    async def tick(self, now: Optional[datetime] = None) -> int:
+        """Marks the tasks that came due by `now` as overdue, in batches. Returns how many were moved."""
+        now = now or utcnow()
+        if self._loaded_until is None or now >= self._loaded_until:
+            await self.reload(now)
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+        moved = 0
+        for start in range(0, len(due), self.batch_size):
+            try:
+                async with self.session_factory() as db:
+                    moved += await task_service.mark_overdue(db, [task_id for _, task_id in due[start:start + self.batch_size]], now)
+            except Exception:
+                # Put back the batches that weren't committed so the next tick retries them
+                for entry in due[start:]:
+                    heapq.heappush(self._heap, entry)
+                raise
+        if moved:
+            logger.info("Marked %d task(s) overdue", moved)
+        return moved
+
+    async def start(self) -> None:
+        """Starts ticking and following task changes. Called from the application lifespan."""
+        self._tasks = [asyncio.create_task(self._follow_changes()), asyncio.create_task(self._run())]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.wait(self._tasks)
+        self._tasks = []
+
+    async def _follow_changes(self) -> None:
+        while True:
+            with self.bus.subscribe() as subscription:
+                async for event in subscription:
+                    self.observe(event)
+            # The subscription overflowed and some changes were missed: reload on the next tick
+            self._loaded_until = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Overdue scheduler tick failed")
+            await asyncio.sleep(self.interval)
+
+
+scheduler = OverdueScheduler(
+    SessionLocal,
+    event_bus,
+    interval=settings.SCHEDULER_INTERVAL_SECONDS,
+    horizon=settings.SCHEDULER_HORIZON_SECONDS,
+    batch_size=settings.SCHEDULER_BATCH_SIZE,
+)
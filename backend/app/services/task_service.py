@@ -1,54 +1,723 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from app.db.models import Task, TaskStatusEnum
-from app.schemas.task import TaskCreate, TaskUpdate
+import logging
+import re
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import Row, and_, bindparam, column, delete, func, insert, literal_column, or_, select, table, union, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import register_cache
+from app.core.pagination import decode_cursor, encode_cursor
+from app.db.models import (
+    OPEN_STATUSES, POSTGRES_SEARCH_DOCUMENT, SEARCH_TABLE, Job, JobStatusEnum, Task, TaskChange, TaskDependency,
+    TaskStatusEnum, utcnow,
+)
+from app.schemas.task import TaskBatchUpdateItem, TaskCreate, TaskOut, TaskUpdate
+from app.services.events import TASK_CREATED, TASK_DELETED, TASK_UPDATED, event_bus
+from app.services.jobs import job_queue
 
-def create_task(db: Session, task: TaskCreate):
+logger = logging.getLogger(__name__)
+
+TASK_CHANGES_PRUNE_JOB = "task_changes.prune"
+
+# Called by the write functions with their result inside the write's transaction, right before it
+# commits, e.g. to store the response of an idempotent request atomically with the write
+BeforeCommit = Callable[[Any], Awaitable[None]]
+
+# Columns returned by the Core (non-ORM) read paths; mirrors the TaskOut schema
+TASK_COLUMNS = (
+    Task.id, Task.title, Task.description, Task.status, Task.due_at, Task.priority, Task.created_at, Task.updated_at,
+)
+
+# Short-lived per-worker cache of get_task_stats() results keyed by (owner_id, days), so dashboard
+# polling doesn't rescan the table. Writes made through this module drop the owner's entries right away
+# (see _publish_changes); other workers catch up when entries expire.
+stats_cache = TTLCache(maxsize=1024, ttl=settings.TASK_STATS_CACHE_TTL_SECONDS)
+register_cache("task_stats", stats_cache)
+
+# Per-worker cache of dependency-graph answers keyed by (owner_id, query, *args). Only task IDs are
+# cached; rows are read fresh. Dropped for the owner on any write that can change the answers: edges
+# added or removed, tasks created or deleted, status changes (see _publish_changes).
+graph_cache = TTLCache(maxsize=1024, ttl=settings.TASK_GRAPH_CACHE_TTL_SECONDS)
+register_cache("task_graph", graph_cache)
+
+# Class of the per-owner Postgres advisory locks taken by _record_changes
+CHANGELOG_LOCK_ID = 0x7461736b
+# Class of the per-owner Postgres advisory locks that serialize dependency edge writes
+DEPENDENCY_LOCK_ID = 0x64657073
+
+# Statuses of tasks that still have to be done
+UNFINISHED_STATUSES = (TaskStatusEnum.OVERDUE, *OPEN_STATUSES)
+
+
+class DependencyCycleError(ValueError):
+    """Raised when a new dependency would make a task (indirectly) wait for itself."""
+
+async def _record_changes(db: AsyncSession, event_type: str, owner_id: int, task_ids: Sequence[uuid.UUID]) -> None:
     """
-    Creates a new task in the database.
+    Appends changelog rows for the given tasks inside the caller's transaction.
     """
-    db_task = Task(**task.model_dump()) # Use model_dump() for Pydantic v2
+    if not task_ids:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        # Serialize the owner's changelog writers until commit so seq order matches commit order
+        # within each owner's feed (the only order get_changes reads); otherwise a sync client could
+        # move its token past a change whose transaction commits later. Other owners' writes don't
+        # wait. (SQLite already allows a single writer at a time.)
+        await db.execute(select(func.pg_advisory_xact_lock(CHANGELOG_LOCK_ID, owner_id)))
+    await db.execute(
+        insert(TaskChange),
+        [{"task_id": task_id, "owner_id": owner_id, "deleted": event_type == TASK_DELETED} for task_id in task_ids],
+    )
+
+async def _publish_changes(
+    event_type: str, owner_id: int, tasks: Sequence = (), deleted_ids: Sequence[uuid.UUID] = (),
+    status_changed: bool = True,
+) -> None:
+    """
+    Runs after a successful commit: drops the owner's cached stats (and dependency-graph answers,
+    unless an update left every status as it was) and announces the change on the event bus, to
+    that owner's subscribers only.
+    `tasks` are ORM objects or TASK_COLUMNS rows.
+    """
+    stats_cache.pop_matching(lambda key: key[0] == owner_id)
+    if event_type != TASK_UPDATED or status_changed:
+        graph_cache.pop_matching(lambda key: key[0] == owner_id)
+    items = [TaskOut.model_validate(task).model_dump(mode="json") for task in tasks]
+    items += [{"id": str(task_id)} for task_id in deleted_ids]
+    if items:
+        await event_bus.publish_many(event_type, items, owner_id=owner_id)
+
+async def create_task(db: AsyncSession, owner_id: int, task: TaskCreate, before_commit: Optional[BeforeCommit] = None):
+    """
+    Creates a new task owned by owner_id.
+    """
+    db_task = Task(**task.model_dump(), owner_id=owner_id) # Use model_dump() for Pydantic v2
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.flush()
+    await _record_changes(db, TASK_CREATED, owner_id, [db_task.id])
+    if before_commit is not None:
+        await db.refresh(db_task)  # As stored, like the caller sees it after the commit
+        await before_commit(db_task)
+    await db.commit()
+    await db.refresh(db_task)
+    await _publish_changes(TASK_CREATED, owner_id, [db_task])
     return db_task
 
-def get_task(db: Session, task_id: int):
+async def get_task(db: AsyncSession, owner_id: int, task_id: int):
     """
-    Retrieves a single task by its ID.
+    Retrieves a single task by its ID, if it belongs to owner_id.
     """
-    return db.query(Task).filter(Task.id == task_id).first()
+    result = await db.execute(select(Task).where(Task.id == task_id, Task.owner_id == owner_id))
+    return result.scalars().first()
 
-def get_tasks(db: Session, status: Optional[TaskStatusEnum] = None, skip: int = 0, limit: int = 100) -> List[Task]:
+def _page_query(query, owner_id: int, status: Optional[TaskStatusEnum], cursor: Optional[str], limit: int):
     """
-    Retrieves a list of tasks, with optional filtering by status.
+    Applies the owner and status filters and the (created_at, id) keyset window to a task query.
+    One extra row is requested to find out whether there is a next page.
     """
-    query = db.query(Task)
+    query = query.where(Task.owner_id == owner_id)
     if status:
-        query = query.filter(Task.status == status)
-    return query.offset(skip).limit(limit).all()
+        query = query.where(Task.status == status)
+    if cursor:
+        created_at, task_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Task.created_at > created_at,
+                and_(Task.created_at == created_at, Task.id > task_id),
+            )
+        )
+    return query.order_by(Task.created_at, Task.id).limit(limit + 1)
 
-def update_task(db: Session, task_id: int, task: TaskUpdate):
+def _split_page(items: list, limit: int) -> Tuple[list, Optional[str]]:
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(last.created_at, last.id)
+
+async def get_task_rows(
+    db: AsyncSession,
+    owner_id: int,
+    status: Optional[TaskStatusEnum] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> Tuple[List[Row], Optional[str]]:
     """
-    Updates an existing task.
+    Retrieves a page of owner_id's tasks ordered by (created_at, id), with optional filtering by status.
+    Uses keyset pagination, so every page costs the same regardless of depth.
+    Selects TASK_COLUMNS as plain Core rows, skipping ORM hydration and the identity map, for
+    the list endpoint's fast serialization path.
+    Returns the page and the cursor of the next page (None on the last page).
+    Raises InvalidCursorError if the cursor is malformed.
     """
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if db_task:
-        update_data = task.model_dump(exclude_unset=True) # Use model_dump() for Pydantic v2
-        for key, value in update_data.items():
-            setattr(db_task, key, value)
-        db.add(db_task)
-        db.commit()
-        db.refresh(db_task)
+    query = _page_query(select(*TASK_COLUMNS), owner_id, status, cursor, limit)
+    return _split_page(list((await db.execute(query)).all()), limit)
+
+async def stream_task_rows(
+    db: AsyncSession,
+    owner_id: int,
+    status: Optional[TaskStatusEnum] = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Streams every task of owner_id (optionally filtered by status) as partitions of Core rows.
+    Uses a server-side cursor with yield_per, so memory stays flat regardless of table size.
+    """
+    query = (
+        select(*TASK_COLUMNS)
+        .where(Task.owner_id == owner_id)
+        .order_by(Task.created_at, Task.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if status:
+        query = query.where(Task.status == status)
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        yield partition
+
+def _search_terms(q: str) -> List[str]:
+    # Only word characters reach the search engine, so user input can't inject query syntax
+    return re.findall(r"\w+", q.lower())
+
+async def search_tasks(db: AsyncSession, owner_id: int, q: str, limit: int = 20, offset: int = 0) -> List[Row]:
+    """
+    Full-text search over the title and description of owner_id's tasks, best matches first.
+    Every term must match, and the last term also matches as a prefix ("deplo" finds "deploy").
+    Uses FTS5 on SQLite and the tsvector GIN index on Postgres; other backends fall back to LIKE.
+    """
+    terms = _search_terms(q)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        fts = table(SEARCH_TABLE, column("rowid"), column("rank"))
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        query = (
+            select(*TASK_COLUMNS)
+            .join(fts, fts.c.rowid == literal_column("tasks.rowid"))
+            .where(literal_column(SEARCH_TABLE).op("MATCH")(match))
+            .order_by(fts.c.rank, Task.id)  # rank is the weighted bm25() configured on the table; lower is better
+        )
+    elif dialect == "postgresql":
+        document = literal_column(POSTGRES_SEARCH_DOCUMENT)  # Must match the GIN index expression verbatim
+        ts_query = func.to_tsquery("simple", " & ".join(terms) + ":*")
+        query = (
+            select(*TASK_COLUMNS)
+            .where(document.op("@@")(ts_query))
+            .order_by(func.ts_rank(document, ts_query).desc(), Task.id)
+        )
+    else:
+        query = select(*TASK_COLUMNS).order_by(Task.created_at, Task.id)
+        for term in terms:
+            pattern = f"%{term}%"
+            query = query.where(or_(Task.title.ilike(pattern), Task.description.ilike(pattern)))
+
+    query = query.where(Task.owner_id == owner_id)
+    return list((await db.execute(query.limit(limit).offset(offset))).all())
+
+async def get_next_tasks(db: AsyncSession, owner_id: int, n: int = 10) -> List[Row]:
+    """
+    Returns owner_id's n most pressing unfinished tasks: those with a due date, earliest due first,
+    then by priority. Each status is read as its own range of ix_tasks_owner_id_status_due_at_priority,
+    already in order and stopped after n rows, so the cost follows n rather than the task count.
+    """
+    parts = [
+        select(*TASK_COLUMNS)
+        .where(Task.owner_id == owner_id, Task.status == status, Task.due_at.isnot(None))
+        .order_by(Task.due_at, Task.priority)
+        .limit(n)
+        .subquery()
+        for status in (TaskStatusEnum.OVERDUE, *OPEN_STATUSES)
+    ]
+    candidates = union_all(*(select(part) for part in parts)).subquery()
+    query = select(candidates).order_by(candidates.c.due_at, candidates.c.priority).limit(n)
+    return list((await db.execute(query)).all())
+
+async def get_due_tasks(db: AsyncSession, before: datetime) -> List[Row]:
+    """
+    Returns (id, due_at) of every user's open tasks due before `before`, in no particular order.
+    Reads a range of ix_tasks_status_due_at_priority per open status.
+    """
+    query = select(Task.id, Task.due_at).where(
+        Task.status.in_(OPEN_STATUSES), Task.due_at.isnot(None), Task.due_at < before
+    )
+    return list((await db.execute(query)).all())
+
+async def mark_overdue(db: AsyncSession, task_ids: Sequence[uuid.UUID], now: datetime) -> int:
+    """
+    Moves the given tasks to OVERDUE with a single UPDATE ... RETURNING, skipping any that were
+    finished or rescheduled in the meantime. Returns the number of tasks moved.
+    """
+    stmt = (
+        update(Task)
+        .where(Task.id.in_(set(task_ids)), Task.status.in_(OPEN_STATUSES), Task.due_at <= now)
+        .values(status=TaskStatusEnum.OVERDUE)
+        .returning(Task.owner_id, *TASK_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    by_owner = defaultdict(list)
+    for row in (await db.execute(stmt)).all():
+        by_owner[row.owner_id].append(row)
+    # In owner order, so concurrent schedulers take the per-owner changelog locks in the same order
+    for owner_id in sorted(by_owner):
+        await _record_changes(db, TASK_UPDATED, owner_id, [row.id for row in by_owner[owner_id]])
+    await db.commit()
+    for owner_id, rows in by_owner.items():
+        await _publish_changes(TASK_UPDATED, owner_id, rows)
+    return sum(len(rows) for rows in by_owner.values())
+
+async def get_tasks_version(db: AsyncSession, owner_id: int, status: Optional[TaskStatusEnum] = None) -> tuple:
+    """
+    Returns a cheap version marker for owner_id's task list: the seq of their latest changelog row,
+    found on the (owner_id, seq) index. Every task write appends to the changelog, so any insert,
+    update or delete changes it (for all status filters alike).
+    Owners with no changelog rows left (all pruned, or tasks older than the changelog) fall back to
+    the row count plus the latest created_at/updated_at, which scans their tasks once; their next
+    write puts them back on the cheap path.
+    """
+    seq = await db.scalar(select(func.max(TaskChange.seq)).where(TaskChange.owner_id == owner_id))
+    if seq is not None:
+        return ("seq", seq)
+    query = select(func.count(), func.max(Task.created_at), func.max(Task.updated_at)).where(Task.owner_id == owner_id)
+    if status:
+        query = query.where(Task.status == status)
+    return tuple((await db.execute(query)).one())
+
+async def get_task_version(db: AsyncSession, owner_id: int, task_id: uuid.UUID) -> Optional[tuple]:
+    """
+    Returns the (created_at, updated_at) version of a single task without loading it,
+    or None if it does not exist or belongs to another user.
+    """
+    query = select(Task.created_at, Task.updated_at).where(Task.id == task_id, Task.owner_id == owner_id)
+    row = (await db.execute(query)).first()
+    return tuple(row) if row else None
+
+async def update_task(db: AsyncSession, owner_id: int, task_id: int, task: TaskUpdate):
+    """
+    Updates an existing task with a single UPDATE ... RETURNING statement.
+    Only the fields set in the payload are written; updated_at is bumped by the column's onupdate.
+    Returns None if the task does not exist or belongs to another user.
+    """
+    update_data = task.model_dump(exclude_unset=True) # Use model_dump() for Pydantic v2
+    if not update_data:
+        return await get_task(db, owner_id, task_id)
+    stmt = update(Task).where(Task.id == task_id, Task.owner_id == owner_id).values(**update_data).returning(Task)
+    db_task = (await db.execute(stmt)).scalars().first()
+    if db_task is not None:
+        await _record_changes(db, TASK_UPDATED, owner_id, [db_task.id])
+    await db.commit()
+    if db_task is not None:
+        await _publish_changes(TASK_UPDATED, owner_id, [db_task], status_changed="status" in update_data)
     return db_task
 
-def delete_task(db: Session, task_id: int):
+async def delete_task(db: AsyncSession, owner_id: int, task_id: int):
     """
-    Deletes a task by its ID.
+    Deletes one of owner_id's tasks by its ID with a single DELETE ... RETURNING statement.
     """
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if db_task:
-        db.delete(db_task)
-        db.commit()
-        return True
-    return False
+    stmt = delete(Task).where(Task.id == task_id, Task.owner_id == owner_id).returning(Task.id)
+    deleted_id = (await db.execute(stmt)).scalar_one_or_none()
+    if deleted_id is not None:
+        await _delete_dependencies(db, [deleted_id])
+        await _record_changes(db, TASK_DELETED, owner_id, [deleted_id])
+    await db.commit()
+    if deleted_id is None:
+        return False
+    await _publish_changes(TASK_DELETED, owner_id, deleted_ids=[deleted_id])
+    return True
+
+async def create_tasks(
+    db: AsyncSession, owner_id: int, tasks: Sequence[TaskCreate], before_commit: Optional[BeforeCommit] = None
+) -> List[Row]:
+    """
+    Creates many tasks owned by owner_id with a single executemany INSERT ... RETURNING and one commit.
+    Returns the created rows in the same order as the input.
+    """
+    stmt = insert(Task).returning(*TASK_COLUMNS, sort_by_parameter_order=True)
+    result = await db.execute(stmt, [{**task.model_dump(), "owner_id": owner_id} for task in tasks])
+    rows = list(result.all())
+    await _record_changes(db, TASK_CREATED, owner_id, [row.id for row in rows])
+    if before_commit is not None:
+        await before_commit(rows)
+    await db.commit()
+    await _publish_changes(TASK_CREATED, owner_id, rows)
+    return rows
+
+async def update_tasks(
+    db: AsyncSession, owner_id: int, items: Sequence[TaskBatchUpdateItem], before_commit: Optional[BeforeCommit] = None
+) -> Dict[uuid.UUID, Row]:
+    """
+    Applies many partial updates to owner_id's tasks in one transaction.
+    Items that set the same fields share one executemany UPDATE; the updated rows are then read back
+    with a single SELECT. Returns the current row of every task that exists, keyed by ID.
+    """
+    table = Task.__table__
+    groups = defaultdict(list)
+    for item in items:
+        update_data = item.model_dump(exclude_unset=True, exclude={"id"})
+        if update_data:
+            params = {f"new_{key}": value for key, value in update_data.items()}
+            groups[tuple(sorted(update_data))].append({"task_id": item.id, **params})
+
+    for fields, params in groups.items():
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("task_id"), table.c.owner_id == owner_id)
+            .values({field: bindparam(f"new_{field}") for field in fields})
+        )
+        await db.execute(stmt, params)
+
+    ids = {item.id for item in items}
+    result = await db.execute(select(*TASK_COLUMNS).where(Task.id.in_(ids), Task.owner_id == owner_id))
+    rows = {row.id: row for row in result}
+    await _record_changes(db, TASK_UPDATED, owner_id, list(rows))
+    if before_commit is not None:
+        await before_commit(rows)
+    await db.commit()
+    await _publish_changes(
+        TASK_UPDATED, owner_id, list(rows.values()), status_changed=any("status" in fields for fields in groups)
+    )
+    return rows
+
+async def delete_tasks(
+    db: AsyncSession, owner_id: int, task_ids: Sequence[uuid.UUID], before_commit: Optional[BeforeCommit] = None
+) -> List[uuid.UUID]:
+    """
+    Deletes many of owner_id's tasks with a single DELETE ... RETURNING and one commit.
+    Returns the IDs that existed and were deleted.
+    """
+    table = Task.__table__
+    stmt = delete(table).where(table.c.id.in_(set(task_ids)), table.c.owner_id == owner_id).returning(table.c.id)
+    deleted = list((await db.execute(stmt)).scalars())
+    await _delete_dependencies(db, deleted)
+    await _record_changes(db, TASK_DELETED, owner_id, deleted)
+    if before_commit is not None:
+        await before_commit(deleted)
+    await db.commit()
+    await _publish_changes(TASK_DELETED, owner_id, deleted_ids=deleted)
+    return deleted
+
+async def _delete_dependencies(db: AsyncSession, task_ids: Sequence[uuid.UUID]) -> None:
+    # Foreign keys are not enforced on SQLite, so the ON DELETE CASCADE of the edges can't be relied on
+    if task_ids:
+        await db.execute(delete(TaskDependency).where(
+            or_(TaskDependency.blocker_id.in_(task_ids), TaskDependency.blocked_id.in_(task_ids))
+        ))
+
+async def _owned_task_ids(db: AsyncSession, owner_id: int, task_ids: Sequence[uuid.UUID]) -> set:
+    result = await db.execute(select(Task.id).where(Task.id.in_(set(task_ids)), Task.owner_id == owner_id))
+    return set(result.scalars())
+
+async def _rows_in_order(db: AsyncSession, task_ids: Sequence[uuid.UUID]) -> List[Row]:
+    if not task_ids:
+        return []
+    rows = {row.id: row for row in await db.execute(select(*TASK_COLUMNS).where(Task.id.in_(task_ids)))}
+    return [rows[task_id] for task_id in task_ids if task_id in rows]
+
+def _rank_window(start: uuid.UUID, bound, forward: bool, depth_first: bool = False):
+    """
+    Recursive CTE of the tasks reachable from `start` (itself included) through tasks whose rank
+    lies within `bound`: following what each task holds up (blocker -> blocked, through the primary
+    key) if `forward`, else what it waits for (blocked -> blocker, through the reverse index).
+    With `depth_first`, SQLite visits the highest ranks first (Postgres has no ORDER BY in recursion).
+    """
+    step_from, step_to = (
+        (TaskDependency.blocker_id, TaskDependency.blocked_id) if forward
+        else (TaskDependency.blocked_id, TaskDependency.blocker_id)
+    )
+    reached = table("reached", column("id"), column("dependency_rank"))
+    walk = union(
+        select(Task.id, Task.dependency_rank).where(Task.id == start),
+        select(Task.id, Task.dependency_rank)
+        .select_from(TaskDependency)
+        .join(reached, step_from == reached.c.id)
+        .join(Task, Task.id == step_to)
+        .where(bound(Task.dependency_rank)),
+    )
+    if depth_first:
+        walk = walk.order_by(column("dependency_rank").desc())
+    return walk.cte("reached", recursive=True)
+
+async def _reorder(db: AsyncSession, blocker: Row, blocked: Row) -> None:
+    """
+    Restores the topological order before the edge blocker -> blocked is added, where the blocker
+    currently ranks above the task it is to block (Pearce-Kelly). Only the tasks ranked between the
+    two are searched: those the blocked task holds up, up to the blocker's rank, and those the blocker
+    waits for, down to the blocked task's rank. The first group is moved after the second, reusing
+    their ranks. Raises DependencyCycleError if the blocked task already holds up the blocker.
+    """
+    # Heading for the highest ranks first reaches the blocker early if it is held up
+    reached = _rank_window(
+        blocked.id, lambda rank: rank <= blocker.dependency_rank, forward=True,
+        depth_first=db.get_bind().dialect.name == "sqlite",
+    )
+    if await db.scalar(select(reached.c.id).where(reached.c.id == blocker.id).limit(1)) is not None:
+        await db.rollback()
+        raise DependencyCycleError("The dependency would create a cycle")
+    held_up = _rank_window(blocked.id, lambda rank: rank <= blocker.dependency_rank, forward=True)
+    held_up = (await db.execute(select(held_up.c.id, held_up.c.dependency_rank))).all()
+    waited_for = _rank_window(blocker.id, lambda rank: rank >= blocked.dependency_rank, forward=False)
+    waited_for = (await db.execute(select(waited_for.c.id, waited_for.c.dependency_rank))).all()
+
+    moved = sorted(waited_for, key=lambda row: row.dependency_rank) + sorted(held_up, key=lambda row: row.dependency_rank)
+    ranks = sorted(row.dependency_rank for row in moved)
+    tasks = Task.__table__
+    await db.execute(
+        update(tasks).where(tasks.c.id == bindparam("task_id")).values(dependency_rank=bindparam("rank")),
+        [{"task_id": row.id, "rank": rank} for row, rank in zip(moved, ranks) if row.dependency_rank != rank],
+    )
+
+async def add_dependency(db: AsyncSession, owner_id: int, task_id: uuid.UUID, blocker_id: uuid.UUID) -> bool:
+    """
+    Records that task_id is blocked by blocker_id; adding an existing edge is a no-op.
+    Returns False if either task does not exist or belongs to another user, and raises
+    DependencyCycleError if blocker_id already (indirectly) waits for task_id.
+
+    Each task of the graph keeps a rank below those of the tasks it blocks, so an edge that agrees
+    with the ranks can't close a cycle and is added without walking the graph; otherwise only the
+    tasks ranked between the two ends are searched and reranked (see _reorder). Tasks outside the
+    graph have no rank yet and join it at the bottom (blockers) or the top (blocked tasks).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Two concurrent edges could close a cycle that neither check sees, or interleave their
+        # reranking; SQLite has a single writer
+        await db.execute(select(func.pg_advisory_xact_lock(DEPENDENCY_LOCK_ID, owner_id)))
+    tasks = {row.id: row for row in await db.execute(
+        select(Task.id, Task.dependency_rank).where(Task.id.in_([task_id, blocker_id]), Task.owner_id == owner_id)
+    )}
+    if set(tasks) != {task_id, blocker_id}:
+        await db.rollback()
+        return False
+    if task_id == blocker_id:
+        await db.rollback()
+        raise DependencyCycleError("The dependency would create a cycle")
+    blocker, blocked = tasks[blocker_id], tasks[task_id]
+
+    if blocker.dependency_rank is None or blocked.dependency_rank is None:
+        ranks = select(func.min(Task.dependency_rank), func.max(Task.dependency_rank)).where(Task.owner_id == owner_id)
+        lowest, highest = (await db.execute(ranks)).one()
+        if blocked.dependency_rank is None:
+            # Above everything, including the blocker if it is new as well
+            highest = (highest or 0) + 1 + (blocker.dependency_rank is None)
+            await db.execute(update(Task).where(Task.id == task_id).values(dependency_rank=highest))
+        if blocker.dependency_rank is None:
+            rank = highest - 1 if blocked.dependency_rank is None else (lowest or 0) - 1
+            await db.execute(update(Task).where(Task.id == blocker_id).values(dependency_rank=rank))
+    elif blocker.dependency_rank > blocked.dependency_rank:
+        await _reorder(db, blocker, blocked)
+
+    exists = await db.scalar(select(TaskDependency.blocked_id).where(
+        TaskDependency.blocker_id == blocker_id, TaskDependency.blocked_id == task_id
+    ))
+    if exists is None:
+        await db.execute(insert(TaskDependency).values(blocker_id=blocker_id, blocked_id=task_id))
+    await db.commit()
+    graph_cache.pop_matching(lambda key: key[0] == owner_id)
+    return True
+
+async def remove_dependency(db: AsyncSession, owner_id: int, task_id: uuid.UUID, blocker_id: uuid.UUID) -> bool:
+    """
+    Removes the edge "task_id is blocked by blocker_id". Returns False if there was no such edge
+    between two of owner_id's tasks.
+    """
+    owned = select(Task.id).where(Task.owner_id == owner_id)
+    stmt = delete(TaskDependency).where(
+        TaskDependency.blocker_id == blocker_id,
+        TaskDependency.blocked_id == task_id,
+        TaskDependency.blocked_id.in_(owned),
+    )
+    deleted = (await db.execute(stmt)).rowcount
+    await db.commit()
+    if deleted:
+        graph_cache.pop_matching(lambda key: key[0] == owner_id)
+    return bool(deleted)
+
+async def get_unblocked_tasks(db: AsyncSession, owner_id: int, limit: int = 100) -> List[Row]:
+    """
+    Returns up to `limit` of owner_id's unfinished tasks that can be worked on now, oldest first:
+    tasks none of whose direct blockers is still unfinished. (A completed blocker releases its
+    dependents even if its own blockers are not done, so only direct edges matter.)
+    """
+    key = (owner_id, "unblocked", limit)
+    task_ids = graph_cache.get(key)
+    if task_ids is None:
+        blocker = aliased(Task)
+        waiting = (
+            select(TaskDependency.blocker_id)
+            .join(blocker, blocker.id == TaskDependency.blocker_id)
+            .where(TaskDependency.blocked_id == Task.id, blocker.status != TaskStatusEnum.COMPLETED)
+            .exists()
+        )
+        query = (
+            select(Task.id)
+            .where(Task.owner_id == owner_id, Task.status.in_(UNFINISHED_STATUSES), ~waiting)
+            .order_by(Task.created_at, Task.id)
+            .limit(limit)
+        )
+        task_ids = list((await db.execute(query)).scalars())
+        graph_cache.set(key, task_ids)
+    return await _rows_in_order(db, task_ids)
+
+async def get_dependency_order(db: AsyncSession, owner_id: int, task_id: uuid.UUID) -> Optional[List[Row]]:
+    """
+    Returns every task that task_id waits for, directly or transitively, in an order they can be
+    done in (each task after all of its blockers). Returns None if the task does not exist.
+
+    A recursive CTE walks the blockers through the blocked -> blocker index, and they are returned
+    by their dependency rank, which add_dependency keeps in topological order; the cost follows the
+    number of blockers rather than the size of the whole graph.
+    """
+    key = (owner_id, "order", task_id)
+    task_ids = graph_cache.get(key)
+    if task_ids is None:
+        if not await _owned_task_ids(db, owner_id, [task_id]):
+            return None
+        blockers = select(TaskDependency.blocker_id.label("id")).where(TaskDependency.blocked_id == task_id)
+        blockers = blockers.cte("blockers", recursive=True)
+        blockers = blockers.union(
+            select(TaskDependency.blocker_id).join(blockers, TaskDependency.blocked_id == blockers.c.id)
+        )
+        task_ids = list((await db.execute(
+            select(Task.id).join(blockers, Task.id == blockers.c.id).order_by(Task.dependency_rank)
+        )).scalars())
+        graph_cache.set(key, task_ids)
+    return await _rows_in_order(db, task_ids)
+
+async def get_task_stats(db: AsyncSession, owner_id: int, days: int = 30) -> dict:
+    """
+    Aggregates owner_id's task counts in SQL: totals per status, plus tasks created and completed per day
+    over the last `days` days (UTC). Completion day is taken from the last update of completed tasks,
+    or from created_at for tasks created as completed (updated_at is only set on update).
+    """
+    cached = stats_cache.get((owner_id, days))
+    if cached is not None:
+        return cached
+
+    today = utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    since = datetime.combine(first_day, time.min, tzinfo=timezone.utc)
+
+    by_status = {status: 0 for status in TaskStatusEnum}
+    owned = Task.owner_id == owner_id
+    result = await db.execute(select(Task.status, func.count()).where(owned).group_by(Task.status))
+    by_status.update({status: count for status, count in result})
+
+    if db.get_bind().dialect.name == "postgresql":
+        # date(timestamptz) uses the session time zone; SQLite stores and compares UTC already
+        def utc_day(column):
+            return func.date(func.timezone("UTC", column))
+    else:
+        utc_day = func.date
+
+    created_day = utc_day(Task.created_at)
+    created = await db.execute(
+        select(created_day, func.count()).where(owned, Task.created_at >= since).group_by(created_day)
+    )
+    completed_at = func.coalesce(Task.updated_at, Task.created_at)
+    completed_day = utc_day(completed_at)
+    completed = await db.execute(
+        select(completed_day, func.count())
+        .where(owned, Task.status == TaskStatusEnum.COMPLETED, completed_at >= since)
+        .group_by(completed_day)
+    )
+
+    daily = {first_day + timedelta(days=offset): {"created": 0, "completed": 0} for offset in range(days)}
+    for key, rows in (("created", created), ("completed", completed)):
+        for day, count in rows:
+            day = day if isinstance(day, date) else date.fromisoformat(day)
+            if day in daily:
+                daily[day][key] = count
+
+    stats = {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "days": days,
+        "daily": [{"day": day, **counts} for day, counts in daily.items()],
+    }
+    stats_cache.set((owner_id, days), stats)
+    return stats
+
+async def get_changes(db: AsyncSession, owner_id: int, since: int = 0, limit: int = 500) -> dict:
+    """
+    Returns owner_id's tasks created or updated after change token `since`, plus tombstones (IDs) of
+    tasks deleted after it, and the token to resume from. Each task appears once, in the order
+    of its latest change. Cost depends on the number of changes, not on the size of the table.
+
+    Changes older than TASK_CHANGES_RETENTION_SECONDS are pruned. A token from before the retained
+    range gets `resync_required` and the current token instead: the client reloads its tasks in
+    full, then syncs from that token.
+    """
+    oldest, newest = (await db.execute(select(func.min(TaskChange.seq), func.max(TaskChange.seq)))).one()
+    if oldest is not None and since < oldest - 1:
+        return {"changes": [], "deleted": [], "next_token": newest, "has_more": False, "resync_required": True}
+
+    latest_seq = func.max(TaskChange.seq)
+    latest = (
+        select(TaskChange.task_id, latest_seq.label("seq"))
+        .where(TaskChange.owner_id == owner_id, TaskChange.seq > since)
+        .group_by(TaskChange.task_id)
+        .order_by(latest_seq)
+        .limit(limit + 1)
+        .subquery()
+    )
+    query = (
+        select(latest.c.task_id, latest.c.seq, *TASK_COLUMNS)
+        .outerjoin(Task, Task.id == latest.c.task_id)
+        .order_by(latest.c.seq)
+    )
+    rows = list((await db.execute(query)).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "changes": [row for row in rows if row.id is not None],
+        "deleted": [row.task_id for row in rows if row.id is None],
+        "next_token": rows[-1].seq if rows else since,
+        "has_more": has_more,
+        "resync_required": False,
+    }
+
+async def prune_changes(db: AsyncSession, before: datetime, batch_size: int = 1000) -> int:
+    """
+    Deletes changelog rows recorded before `before`, oldest first, in batches of `batch_size`
+    (one transaction each). Seq order follows time order, so each batch is a range at the start
+    of the primary key, and pruning stops at the first batch that holds a newer row. The newest
+    row is always kept, so get_changes can tell the retained range. Returns the number deleted.
+    """
+    first_batch = select(TaskChange.seq).order_by(TaskChange.seq).limit(batch_size).scalar_subquery()
+    newest = select(func.max(TaskChange.seq)).scalar_subquery()
+    deleted = 0
+    while True:
+        result = await db.execute(
+            delete(TaskChange).where(TaskChange.seq.in_(first_batch), TaskChange.changed_at < before, TaskChange.seq < newest)
+        )
+        await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+async def schedule_changes_pruning(db: AsyncSession, delay: float = 0) -> None:
+    """
+    Queues the next changelog pruning run unless one is already pending; each run queues the next.
+    Called from the application lifespan, so every process can start the cycle without duplicating it.
+    """
+    if settings.TASK_CHANGES_RETENTION_SECONDS <= 0:
+        return
+    pending = await db.scalar(
+        select(Job.id).where(Job.kind == TASK_CHANGES_PRUNE_JOB, Job.status == JobStatusEnum.PENDING).limit(1)
+    )
+    if pending is None:
+        await job_queue.enqueue(db, TASK_CHANGES_PRUNE_JOB, {}, delay=delay)
+        await db.commit()
+
+@job_queue.handler(TASK_CHANGES_PRUNE_JOB)
+async def _prune_changes(payload: dict) -> None:
+    async with job_queue.session_factory() as db:
+        deleted = await prune_changes(db, utcnow() - timedelta(seconds=settings.TASK_CHANGES_RETENTION_SECONDS))
+        await schedule_changes_pruning(db, delay=settings.TASK_CHANGES_PRUNE_INTERVAL_SECONDS)
+    if deleted:
+        logger.info("Pruned %d task change(s)", deleted)
+
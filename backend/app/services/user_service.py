@@ -0,0 +1,35 @@
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.security import password_hasher
+from app.db.models import User
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    """
+    Retrieves a user by username.
+    """
+    return (await db.execute(select(User).where(User.username == username))).scalars().first()
+
+async def create_user(db: AsyncSession, username: str, password: str) -> User:
+    """
+    Creates a user with a bcrypt hash of the given password.
+    """
+    user = User(username=username, hashed_password=await password_hasher.hash(password))
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    """
+    Returns the user if the username exists and the password matches its hash.
+    Hashes made with outdated parameters are replaced with a fresh hash of the same password.
+    """
+    user = await get_user_by_username(db, username)
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password if user else None)
+    if not valid:
+        return None
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
@@ -0,0 +1,84 @@
+"""
+Compares the cost of building a GET /api/v1/tasks response body:
+
+* orm:  ORM Task objects validated into List[TaskOut] and dumped with the stdlib json
+        encoder, the way FastAPI's response_model pipeline does it.
+* core: TASK_COLUMNS selected as Core rows and dumped with orjson (the current list path).
+
+Run from the backend directory:
+    python -m benchmarks.bench_list_serialization --rows 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.serialization import dump_rows
+from app.db.base import Base
+from app.db.models import Task, TaskStatusEnum, User
+from app.schemas.task import TaskOut
+from app.services.task_service import TASK_COLUMNS
+
+task_list_adapter = TypeAdapter(List[TaskOut])
+STATUSES = list(TaskStatusEnum)
+
+
+async def seed(session_factory, rows: int) -> None:
+    async with session_factory() as db:
+        await db.execute(insert(User), [{"id": 1, "username": "bench", "hashed_password": "-"}])
+        await db.execute(insert(Task), [
+            {"title": f"Task {i}", "description": "x" * 200, "status": STATUSES[i % len(STATUSES)], "owner_id": 1}
+            for i in range(rows)
+        ])
+        await db.commit()
+
+
+async def orm_path(session_factory, rows: int) -> bytes:
+    async with session_factory() as db:
+        tasks = (await db.execute(select(Task).limit(rows))).scalars().all()
+        validated = task_list_adapter.validate_python(tasks, from_attributes=True)
+        return json.dumps(task_list_adapter.dump_python(validated, mode="json")).encode()
+
+
+async def core_path(session_factory, rows: int) -> bytes:
+    async with session_factory() as db:
+        return dump_rows((await db.execute(select(*TASK_COLUMNS).limit(rows))).all())
+
+
+async def measure(fn, session_factory, rows: int, repeat: int) -> List[float]:
+    await fn(session_factory, rows)  # Warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn(session_factory, rows)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main(rows: int, repeat: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    await seed(session_factory, rows)
+
+    print(f"{rows} tasks, {repeat} runs each")
+    for name, fn in (("orm", orm_path), ("core", core_path)):
+        timings = await measure(fn, session_factory, rows, repeat)
+        median = statistics.median(timings)
+        print(f"{name:>5}: median {median * 1000:8.2f} ms  ({median * 1000 / rows * 1000:6.2f} ms per 1k tasks)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,94 @@
+"""
+Compares the cost and size of encoding a large List[TaskOut] response body:
+
+* json:   fastapi.responses.JSONResponse (stdlib json), the previous default response class.
+* orjson: fastapi.responses.ORJSONResponse, the default when ORJSON_RESPONSES is enabled.
+
+Reports the median render time and raw body size of each, then the size and cost of compressing
+the body with gzip and (when the optional brotli package is installed) Brotli at the configured levels.
+
+Run from the backend directory:
+    python -m benchmarks.bench_response_encoding --rows 1000 --repeat 50
+"""
+import argparse
+import random
+import statistics
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.core.compression import brotli
+from app.core.config import settings
+from app.db.models import TaskStatusEnum
+from app.schemas.task import TaskOut
+
+STATUSES = list(TaskStatusEnum)
+WORDS = "the task needs review before release update docs fix tests deploy api client server backlog sprint".split()
+
+
+def make_tasks(rows: int) -> List[dict]:
+    now = datetime.now(timezone.utc)
+    rng = random.Random(0)  # Varied but reproducible text, so compression ratios aren't flattered
+    tasks = [
+        TaskOut(
+            id=uuid.uuid4(),
+            title=f"Task {i}",
+            description=" ".join(rng.choice(WORDS) for _ in range(250))[:1000],
+            status=STATUSES[i % len(STATUSES)],
+            created_at=now - timedelta(minutes=i),
+            updated_at=now,
+        )
+        for i in range(rows)
+    ]
+    # What FastAPI hands to the response class after validating the response_model
+    return jsonable_encoder(tasks)
+
+
+def measure(response_class, content, repeat: int) -> List[float]:
+    response_class(content)  # Warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response_class(content)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def gzip_compress(body: bytes) -> bytes:
+    compressor = zlib.compressobj(settings.GZIP_COMPRESSLEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def brotli_compress(body: bytes) -> bytes:
+    return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+
+
+def timed(fn, body: bytes) -> str:
+    start = time.perf_counter()
+    size = len(fn(body))
+    return f"{size:>9,d} B in {(time.perf_counter() - start) * 1000:5.1f} ms"
+
+
+def main(rows: int, repeat: int) -> None:
+    content = make_tasks(rows)
+    print(f"{rows} tasks with 1000-character descriptions, {repeat} runs each")
+    for name, response_class in (("json", JSONResponse), ("orjson", ORJSONResponse)):
+        median = statistics.median(measure(response_class, content, repeat))
+        body = response_class(content).body
+        print(f"{name:>7}: render median {median * 1000:7.2f} ms, raw {len(body):,d} B")
+    print(f"   gzip: {timed(gzip_compress, body)} (level {settings.GZIP_COMPRESSLEVEL})")
+    if brotli is not None:
+        print(f"     br: {timed(brotli_compress, body)} (quality {settings.BROTLI_QUALITY})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,47 @@
+"""
+Micro-benchmarks for TaskOut serialization at 1, 100 and 10k rows: the response_model path
+(validation into List[TaskOut], then the default response class) against the list endpoint's
+fast path (Core rows dumped with orjson).
+
+    python -m pytest benchmarks/bench_serialization.py -q
+"""
+from typing import List
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from app.core.serialization import dump_rows
+from app.db.models import Task
+from app.schemas.task import TaskOut
+from app.services.task_service import TASK_COLUMNS
+
+task_list_adapter = TypeAdapter(List[TaskOut])
+
+
+@pytest.fixture
+def orm_tasks(seeded_session, bench_loop) -> List[Task]:
+    return list(bench_loop.run_until_complete(seeded_session.scalars(select(Task))))
+
+
+@pytest.fixture
+def core_rows(seeded_session, bench_loop) -> list:
+    return list(bench_loop.run_until_complete(seeded_session.execute(select(*TASK_COLUMNS))))
+
+
+def test_validate_task_out(benchmark, orm_tasks, rows):
+    validated = benchmark(task_list_adapter.validate_python, orm_tasks, from_attributes=True)
+    assert len(validated) == rows
+
+@pytest.mark.parametrize("response_class", [JSONResponse, ORJSONResponse], ids=["json", "orjson"])
+def test_render_response_model(benchmark, orm_tasks, response_class):
+    def render():
+        validated = task_list_adapter.validate_python(orm_tasks, from_attributes=True)
+        return response_class(jsonable_encoder(validated)).body
+
+    benchmark(render)
+
+def test_dump_rows(benchmark, core_rows):
+    benchmark(dump_rows, core_rows)
@@ -0,0 +1,96 @@
+"""
+Micro-benchmarks for app.services.task_service against in-memory SQLite databases holding
+1, 100 and 10k tasks (see the `rows` fixture). Reads fetch every seeded row; writes use a fresh
+database per benchmark, so the seeded tables stay the same size.
+
+    python -m pytest benchmarks/bench_task_service.py -q
+
+The dependency-graph benchmarks use their own database (see the `graph_database` fixture).
+"""
+import itertools
+
+from app.schemas.task import TaskCreate, TaskUpdate
+from app.services import task_service
+from app.services.task_service import DependencyCycleError, graph_cache, stats_cache
+
+
+def test_get_task_rows(benchmark, seeded_session, owner_id, rows):
+    page, _ = benchmark(task_service.get_task_rows, seeded_session, owner_id, limit=rows)
+    assert len(page) == rows
+
+def test_get_task(benchmark, seeded_session, owner_id, task_ids):
+    async def get_task():
+        task = await task_service.get_task(seeded_session, owner_id, task_ids[-1])
+        seeded_session.expunge_all()
+        return task
+
+    assert benchmark(get_task) is not None
+
+def test_get_tasks_version(benchmark, seeded_session, owner_id):
+    benchmark(task_service.get_tasks_version, seeded_session, owner_id)
+
+def test_search_tasks(benchmark, seeded_session, owner_id):
+    benchmark(task_service.search_tasks, seeded_session, owner_id, "release notes", limit=20)
+
+def test_get_task_stats_uncached(benchmark, seeded_session, owner_id, rows):
+    async def get_task_stats():
+        stats_cache.clear()
+        return await task_service.get_task_stats(seeded_session, owner_id, days=30)
+
+    assert benchmark(get_task_stats)["total"] == rows
+
+def test_create_task(benchmark, empty_session, owner_id):
+    benchmark(task_service.create_task, empty_session, owner_id, TaskCreate(title="New task", description="Benchmark"))
+
+def test_create_tasks_batch_of_100(benchmark, empty_session, owner_id):
+    batch = [TaskCreate(title=f"Task {i}", description="Benchmark") for i in range(100)]
+    assert len(benchmark(task_service.create_tasks, empty_session, owner_id, batch)) == 100
+
+def test_update_task(benchmark, seeded_session, owner_id, task_ids):
+    benchmark(task_service.update_task, seeded_session, owner_id, task_ids[0], TaskUpdate(description="Updated"))
+
+def test_get_unblocked_tasks_uncached(benchmark, graph_session, graph_database, owner_id):
+    async def get_unblocked_tasks():
+        graph_cache.clear()
+        return await task_service.get_unblocked_tasks(graph_session, owner_id, limit=100)
+
+    assert [row.id for row in benchmark(get_unblocked_tasks)] == graph_database[1][:1]
+
+def test_get_dependency_order_uncached(benchmark, graph_session, graph_database, owner_id):
+    task_id = graph_database[1][1000]
+
+    async def get_dependency_order():
+        graph_cache.clear()
+        return await task_service.get_dependency_order(graph_session, owner_id, task_id)
+
+    assert len(benchmark(get_dependency_order)) == 1000
+
+def test_add_dependency_cycle_check(benchmark, graph_session, graph_database, owner_id):
+    # The worst case: the would-be blocker holds up every other task in the graph
+    first, last = graph_database[1][0], graph_database[1][-1]
+
+    async def add_dependency():
+        try:
+            await task_service.add_dependency(graph_session, owner_id, first, last)
+        except DependencyCycleError:
+            return True
+        return False
+
+    assert benchmark(add_dependency)
+
+def test_add_dependency_consistent(benchmark, graph_session, graph_database, owner_id, bench_loop):
+    # New edges that agree with the ranks: the first task already holds up every later one, and
+    # blocks none of those past the first hundred directly
+    first, later = graph_database[1][0], itertools.cycle(graph_database[1][100:])
+    added = set()
+
+    async def add_dependency():
+        task_id = next(later)
+        added.add(task_id)
+        return await task_service.add_dependency(graph_session, owner_id, task_id, first)
+
+    try:
+        assert benchmark(add_dependency)
+    finally:
+        for task_id in added:
+            bench_loop.run_until_complete(task_service.remove_dependency(graph_session, owner_id, task_id, first))
@@ -0,0 +1,60 @@
+"""
+Compares two benchmark reports (see benchmarks/stats.py), e.g. from the parent commit and HEAD.
+Exits with status 1 when any shared result got slower than the threshold allows.
+
+Run from the backend directory:
+    python -m benchmarks.compare baseline.json current.json --metric p95 --threshold 0.10
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+
+def compare(baseline: Dict, current: Dict, metric: str, threshold: float) -> Tuple[List[str], List[str]]:
+    """
+    Returns the report lines and the names of the regressed results. A result regresses when
+    `metric` grew by more than `threshold` (a fraction); for "throughput", when it shrank.
+    """
+    lines = [f"{'name':<64} {'baseline':>12} {'current':>12} {'change':>8}"]
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            lines.append(f"{name:<64} {'-':>12} {result[metric]:>12.6g} {'new':>8}")
+            continue
+        if not before[metric]:
+            continue
+        change = result[metric] / before[metric] - 1
+        regressed = -change > threshold if metric == "throughput" else change > threshold
+        if regressed:
+            regressions.append(name)
+        marker = "  <-- regression" if regressed else ""
+        lines.append(f"{name:<64} {before[metric]:>12.6g} {result[metric]:>12.6g} {change:>+8.1%}{marker}")
+    return lines, regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--metric", default="p50", choices=["mean", "p50", "p95", "p99", "throughput"])
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (default: 0.10)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file, open(args.current) as current_file:
+        baseline, current = json.load(baseline_file), json.load(current_file)
+    if baseline.get("kind") != current.get("kind"):
+        parser.error(f"Cannot compare a {baseline.get('kind')!r} report with a {current.get('kind')!r} report")
+
+    print(f"{args.metric}: {baseline.get('commit')} -> {current.get('commit')}")
+    lines, regressions = compare(baseline, current, args.metric, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Micro-benchmark harness in the style of pytest-benchmark, without the extra dependency.
+
+Benchmarks live in benchmarks/bench_*.py and are only collected when the benchmarks directory
+(or one of its files) is named on the command line, so the regular test run never picks them up:
+
+    python -m pytest benchmarks -q --bench-json bench.json
+    python -m benchmarks.compare baseline.json bench.json
+
+A benchmark is a test function that takes the `benchmark` fixture and calls it with the function
+to measure (plain or async) and its arguments:
+
+    def test_get_task(benchmark, seeded_session, owner_id):
+        benchmark(task_service.get_task, seeded_session, owner_id, task_id)
+"""
+import asyncio
+import inspect
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.base import Base
+from app.db.models import Task, TaskChange, TaskDependency, TaskStatusEnum, User
+from app.db.session import create_engine_for_url
+
+from benchmarks.stats import build_report, format_table, summarize, write_report
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROW_COUNTS = (1, 100, 10_000)
+GRAPH_TASKS = 10_000
+GRAPH_FAN_IN = 10
+STATUSES = list(TaskStatusEnum)
+OWNER_ID = 1
+results_key = pytest.StashKey[Dict[str, Dict[str, float]]]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--bench-min-time", type=float, default=0.5, help="Seconds to spend measuring each benchmark")
+    group.addoption("--bench-min-rounds", type=int, default=5)
+    group.addoption("--bench-max-rounds", type=int, default=10_000)
+    group.addoption("--bench-json", metavar="PATH", help="Write the results as a JSON report")
+
+
+def pytest_configure(config):
+    config.stash[results_key] = {}
+
+
+def _requested(config) -> bool:
+    for arg in config.args:
+        path = Path(arg.split("::")[0]).resolve()
+        if path == BENCH_DIR or BENCH_DIR in path.parents:
+            return True
+    return False
+
+
+def pytest_collect_file(file_path: Path, parent):
+    if file_path.suffix == ".py" and file_path.name.startswith("bench_") and _requested(parent.config):
+        return pytest.Module.from_parent(parent, path=file_path)
+    return None
+
+
+class Benchmark:
+    def __init__(self, name: str, loop: asyncio.AbstractEventLoop, config):
+        self.name = name
+        self.loop = loop
+        self.min_time = config.getoption("--bench-min-time")
+        self.min_rounds = config.getoption("--bench-min-rounds")
+        self.max_rounds = config.getoption("--bench-max-rounds")
+        self.results = config.stash[results_key]
+
+    def _enough(self, timings: List[float], started: float) -> bool:
+        if len(timings) >= self.max_rounds:
+            return True
+        return len(timings) >= self.min_rounds and time.perf_counter() - started >= self.min_time
+
+    def _run_sync(self, fn, args, kwargs) -> List[float]:
+        fn(*args, **kwargs)  # Warm-up
+        timings = []
+        started = time.perf_counter()
+        while not self._enough(timings, started):
+            start = time.perf_counter()
+            fn(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    async def _run_async(self, fn, args, kwargs) -> List[float]:
+        await fn(*args, **kwargs)  # Warm-up
+        timings = []
+        started = time.perf_counter()
+        while not self._enough(timings, started):
+            start = time.perf_counter()
+            await fn(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def __call__(self, fn, *args, **kwargs):
+        """Measures fn(*args, **kwargs) over repeated rounds and returns the result of one more call."""
+        if inspect.iscoroutinefunction(fn):
+            timings = self.loop.run_until_complete(self._run_async(fn, args, kwargs))
+            result = self.loop.run_until_complete(fn(*args, **kwargs))
+        else:
+            timings = self._run_sync(fn, args, kwargs)
+            result = fn(*args, **kwargs)
+        self.results[self.name] = summarize(timings)
+        return result
+
+
+@pytest.fixture(scope="session")
+def bench_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def benchmark(request, bench_loop) -> Benchmark:
+    name = f"{Path(request.node.fspath).stem}::{request.node.name}"
+    return Benchmark(name, bench_loop, request.config)
+
+
+def make_task_rows(count: int) -> List[dict]:
+    return [
+        {
+            "id": uuid.uuid4(),
+            "title": f"Task {i} release notes",
+            "description": f"Prepare and review the documentation for item {i}. " * 10,
+            "status": STATUSES[i % len(STATUSES)],
+            "owner_id": OWNER_ID,
+        }
+        for i in range(count)
+    ]
+
+
+async def build_database(engine, rows: int) -> async_sessionmaker:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(User), [{"id": OWNER_ID, "username": "bench", "hashed_password": "-"}])
+        if rows:
+            tasks = make_task_rows(rows)
+            await connection.execute(insert(Task), tasks)
+            # The creation changelog the app would have written along with them
+            await connection.execute(insert(TaskChange), [{"task_id": task["id"], "owner_id": OWNER_ID} for task in tasks])
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture(scope="session")
+def seeded_databases(bench_loop):
+    """
+    One in-memory database per row count, built on first use with the app's engine configuration.
+    Returns a function mapping a row count to a session factory.
+    """
+    factories = {}
+    engines = []
+
+    def get(rows: int):
+        if rows not in factories:
+            engine = create_engine_for_url("sqlite://")
+            engines.append(engine)
+            factories[rows] = bench_loop.run_until_complete(build_database(engine, rows))
+        return factories[rows]
+
+    yield get
+    for engine in engines:
+        bench_loop.run_until_complete(engine.dispose())
+
+
+@pytest.fixture(params=ROW_COUNTS, ids=lambda rows: f"{rows}rows")
+def rows(request) -> int:
+    return request.param
+
+
+@pytest.fixture
+def seeded_session(rows, seeded_databases, bench_loop) -> AsyncSession:
+    session = seeded_databases(rows)()
+    yield session
+    bench_loop.run_until_complete(session.close())
+
+
+@pytest.fixture
+def empty_session(bench_loop) -> AsyncSession:
+    """A session on a fresh, empty database, for benchmarks that write."""
+    engine = create_engine_for_url("sqlite://")
+    session = bench_loop.run_until_complete(build_database(engine, 0))()
+    yield session
+    bench_loop.run_until_complete(session.close())
+    bench_loop.run_until_complete(engine.dispose())
+
+
+@pytest.fixture
+def owner_id() -> int:
+    """The user every seeded task belongs to."""
+    return OWNER_ID
+
+
+@pytest.fixture
+def task_ids(seeded_session, bench_loop) -> List[uuid.UUID]:
+    return list(bench_loop.run_until_complete(seeded_session.scalars(select(Task.id))))
+
+
+@pytest.fixture(scope="session")
+def graph_database(bench_loop):
+    """
+    10k pending tasks with ~100k dependency edges: every task is blocked by the ten created just
+    before it, and tasks are ranked in creation order. Returns a session factory and the task IDs
+    in creation order.
+    """
+    engine = create_engine_for_url("sqlite://")
+    tasks = make_task_rows(GRAPH_TASKS)
+    for rank, task in enumerate(tasks, start=1):
+        task["status"] = TaskStatusEnum.PENDING
+        task["dependency_rank"] = rank
+    edges = [
+        {"blocker_id": tasks[i - k]["id"], "blocked_id": task["id"]}
+        for i, task in enumerate(tasks)
+        for k in range(1, GRAPH_FAN_IN + 1)
+        if i >= k
+    ]
+
+    async def build():
+        factory = await build_database(engine, 0)
+        async with engine.begin() as connection:
+            await connection.execute(insert(Task), tasks)
+            await connection.execute(insert(TaskDependency), edges)
+        return factory
+
+    yield bench_loop.run_until_complete(build()), [task["id"] for task in tasks]
+    bench_loop.run_until_complete(engine.dispose())
+
+
+@pytest.fixture
+def graph_session(graph_database, bench_loop) -> AsyncSession:
+    session = graph_database[0]()
+    yield session
+    bench_loop.run_until_complete(session.close())
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(results_key, None)
+    if not results:
+        return
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(format_table(dict(sorted(results.items()))))
+    path = config.getoption("--bench-json", None)
+    if path:
+        write_report(path, build_report("micro", dict(sorted(results.items()))))
+        terminalreporter.write_line(f"Report written to {path}")
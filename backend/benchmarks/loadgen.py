@@ -0,0 +1,230 @@
+"""
+HTTP load generator for the task API, built on httpx's async client.
+
+Runs `--concurrency` virtual users for `--duration` seconds. Each one picks operations from a
+weighted CRUD mix and records per-operation latencies; the report has p50/p95/p99 and throughput
+per operation and overall, and can be saved with --json and compared with `python -m benchmarks.compare`.
+
+Against a running server:
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:8000 --duration 30 --concurrency 32
+
+Or let it start uvicorn on a fresh SQLite database (migrated with Alembic) and stop it afterwards:
+    python -m benchmarks.loadgen --serve --duration 30 --mix create=1,list=4,get=4,patch=2,delete=1 --json load.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from benchmarks.stats import build_report, format_table, summarize, write_report
+
+API = "/api/v1"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATUSES = ["pending", "in_progress", "completed"]
+DEFAULT_MIX = "create=1,list=4,get=4,patch=2,delete=1"
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, weights: Dict[str, int], seed: int):
+        self.client = client
+        self.operations = list(weights)
+        self.weights = list(weights.values())
+        self.random = random.Random(seed)
+        self.task_ids: List[str] = []
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def login(self, username: str, password: str) -> None:
+        response = await self.client.post(f"{API}/login", data={"username": username, "password": password})
+        response.raise_for_status()
+        self.client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    async def seed(self, count: int) -> None:
+        for start in range(0, count, 500):
+            items = [
+                {"title": f"Load task {i}", "description": "Seeded by the load generator. " * 10}
+                for i in range(start, min(count, start + 500))
+            ]
+            response = await self.client.post(f"{API}/tasks:batch", json={"items": items})
+            response.raise_for_status()
+            self.task_ids.extend(result["id"] for result in response.json()["results"])
+
+    def _pick_task(self) -> Optional[str]:
+        return self.random.choice(self.task_ids) if self.task_ids else None
+
+    async def op_create(self) -> httpx.Response:
+        response = await self.client.post(f"{API}/tasks", json={
+            "title": f"Task {self.random.randrange(10**6)}",
+            "description": "Created by the load generator. " * 10,
+        })
+        if response.status_code == 201:
+            self.task_ids.append(response.json()["id"])
+        return response
+
+    async def op_list(self) -> httpx.Response:
+        return await self.client.get(f"{API}/tasks", params={"limit": 50})
+
+    async def op_get(self) -> Optional[httpx.Response]:
+        task_id = self._pick_task()
+        return task_id and await self.client.get(f"{API}/tasks/{task_id}")
+
+    async def op_patch(self) -> Optional[httpx.Response]:
+        task_id = self._pick_task()
+        return task_id and await self.client.patch(f"{API}/tasks/{task_id}", json={"status": self.random.choice(STATUSES)})
+
+    async def op_delete(self) -> Optional[httpx.Response]:
+        if len(self.task_ids) < 10:
+            return None  # Keep something to read
+        task_id = self.task_ids.pop(self.random.randrange(len(self.task_ids)))
+        return await self.client.delete(f"{API}/tasks/{task_id}")
+
+    async def op_search(self) -> httpx.Response:
+        return await self.client.get(f"{API}/tasks/search", params={"q": "load task"})
+
+    async def op_stats(self) -> httpx.Response:
+        return await self.client.get(f"{API}/tasks/stats")
+
+    async def user(self, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            operation = self.random.choices(self.operations, self.weights)[0]
+            start = time.perf_counter()
+            response = await OPERATIONS[operation](self)
+            if response is None:
+                continue
+            self.latencies[operation].append(time.perf_counter() - start)
+            # 404s happen when another user deleted the task first; they are not server errors
+            if response.status_code >= 500 or response.status_code in (401, 422):
+                self.errors[operation] += 1
+
+    async def run(self, duration: float, concurrency: int) -> Dict[str, Dict[str, float]]:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(self.user(deadline) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        results = {}
+        for operation in sorted(self.latencies):
+            results[operation] = {**summarize(self.latencies[operation], elapsed), "errors": self.errors[operation]}
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        results["all"] = {**summarize(everything, elapsed), "errors": sum(self.errors.values())}
+        return results
+
+
+OPERATIONS = {
+    "create": LoadTest.op_create,
+    "list": LoadTest.op_list,
+    "get": LoadTest.op_get,
+    "patch": LoadTest.op_patch,
+    "delete": LoadTest.op_delete,
+    "search": LoadTest.op_search,
+    "stats": LoadTest.op_stats,
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_server(workers: int) -> Iterator[str]:
+    """
+    Starts uvicorn on a fresh SQLite database in a temporary directory and yields its base URL.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'load.db')}",
+            "EVENTS_BROKER_PATH": os.path.join(directory, "task_events.db"),
+            "EVENTS_BACKEND": "sqlite" if workers > 1 else "memory",
+        }
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=BACKEND_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(100):
+                try:
+                    if httpx.get(f"{base_url}/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            yield base_url
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+async def run(args, base_url: str) -> Dict[str, Dict[str, float]]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        load_test = LoadTest(client, args.mix, args.seed)
+        await load_test.login(args.username, args.password)
+        await load_test.seed(args.seed_tasks)
+        return await load_test.run(args.duration, args.concurrency)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--serve", action="store_true", help="Start a local uvicorn + SQLite server for the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --serve")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual users")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Weighted operations (default: {DEFAULT_MIX}); also: search, stats")
+    parser.add_argument("--seed-tasks", type=int, default=500, help="Tasks created before the run")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the operation sequence")
+    parser.add_argument("--username", default="user")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as a JSON report")
+    args = parser.parse_args()
+
+    if args.serve:
+        with local_server(args.workers) as base_url:
+            results = asyncio.run(run(args, base_url))
+    else:
+        results = asyncio.run(run(args, args.base_url))
+
+    print(f"{args.concurrency} users for {args.duration:g} s")
+    print(format_table(results))
+    errors = results["all"]["errors"]
+    if errors:
+        print(f"{errors} failed requests")
+    if args.json:
+        settings = {"duration": args.duration, "concurrency": args.concurrency, "mix": args.mix, "workers": args.workers}
+        write_report(args.json, build_report("load", results, settings=settings))
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Shared report format for the micro-benchmarks and the load generator.
+
+A report is a JSON document:
+
+    {"kind": "micro" | "load", "commit": "<git sha>", "created_at": "...", "python": "3.11.7",
+     "results": {"<name>": {"count": ..., "mean": ..., "p50": ..., "p95": ..., "p99": ...,
+                           "min": ..., "max": ..., "throughput": ...}}}
+
+Latencies are in seconds and throughput in operations per second, so two reports of the same
+kind can be compared with `python -m benchmarks.compare`.
+"""
+import json
+import math
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples: List[float], elapsed: Optional[float] = None) -> Dict[str, float]:
+    """
+    Summarizes latency samples. Throughput is the number of samples per second of `elapsed`
+    wall-clock time when given (concurrent load), otherwise per second of summed latency.
+    """
+    ordered = sorted(samples)
+    total = sum(ordered)
+    wall = elapsed if elapsed is not None else total
+    return {
+        "count": len(ordered),
+        "mean": total / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "min": ordered[0] if ordered else 0.0,
+        "max": ordered[-1] if ordered else 0.0,
+        "throughput": len(ordered) / wall if wall else 0.0,
+    }
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(kind: str, results: Dict[str, Dict[str, float]], **extra) -> Dict:
+    return {
+        "kind": kind,
+        "commit": current_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        **extra,
+        "results": results,
+    }
+
+
+def write_report(path: str, report: Dict) -> None:
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+        report_file.write("\n")
+
+
+def format_table(results: Dict[str, Dict[str, float]]) -> str:
+    header = f"{'name':<64} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10}"
+    lines = [header, "-" * len(header)]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<64} {result['count']:>7} {result['p50'] * 1000:>9.3f} {result['p95'] * 1000:>9.3f} "
+            f"{result['p99'] * 1000:>9.3f} {result['throughput']:>10.1f}"
+        )
+    return "\n".join(lines)
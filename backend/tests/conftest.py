@@ -1,53 +1,84 @@
+import asyncio
+import os
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Cheap password hashing for tests; must be set before the settings are loaded
+os.environ.setdefault("PASSWORD_BCRYPT_ROUNDS", "4")
 
 from app.main import app
 from app.db.base import Base
-from app.api.deps import get_db
-from app.db.models import Task
-import os
-from contextlib import contextmanager
+from app.db.session import create_engine_for_url
+from app.api.deps import get_db, get_read_db
+from app.services import user_service
+from app.core.security import login_limiter
+from app.services.task_service import graph_cache, stats_cache
 
-@contextmanager
-def temp_database():
+@pytest.fixture(scope="session")
+def test_engine():
     """
-    Context manager para criar e limpar banco temporário.
+    One in-memory database (a single StaticPool connection) per test process, so pytest-xdist
+    workers never share state. The schema is created once per session.
     """
-    test_db_path = "test_database.db"
-    SQLALCHEMY_DATABASE_URL = f"sqlite:///{test_db_path}"
-    
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
-    Base.metadata.create_all(bind=engine)
-    
-    db = TestingSessionLocal()
-    
-    try:
-        yield db, engine
-    finally:
-        db.close()
-        engine.dispose()
-        
-        if os.path.exists(test_db_path):
-            os.remove(test_db_path)
+    engine = create_engine_for_url("sqlite+aiosqlite://")
+
+    # pysqlite defers BEGIN until the first write and doesn't support SAVEPOINT properly with its
+    # default transaction handling; take over transaction control so tests can roll back.
+    @event.listens_for(engine.sync_engine, "connect")
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _emit_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    async def create_schema():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_schema())
+    yield engine
+    asyncio.run(engine.dispose())
 
 @pytest.fixture(scope="function")
-def db_session():
+def db_session(test_engine):
     """
-    Fixture usando context manager.
+    A session bound to an outer transaction that is rolled back after the test.
+    Commits made by the code under test only release SAVEPOINTs, so no test sees another's data.
     """
-    with temp_database() as (db, engine):
+    async def begin():
+        connection = await test_engine.connect()
+        transaction = await connection.begin()
+        return connection, transaction
+
+    connection, transaction = asyncio.run(begin())
+    db = AsyncSession(
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+        autoflush=False,
+        expire_on_commit=False,
+    )
+    stats_cache.clear()
+    graph_cache.clear()
+    login_limiter.clear()
+    try:
         yield db
+    finally:
+        async def rollback():
+            await db.close()
+            await transaction.rollback()
+            await connection.close()
+
+        asyncio.run(rollback())
 
 @pytest.fixture(name="client")
-def client_fixture(db_session: Session):
+def client_fixture(db_session: AsyncSession):
     """
     Fixture mais robusta para TestClient com override de dependência.
     """
-    def override_get_db():
+    async def override_get_db():
         try:
             yield db_session
         finally:
@@ -56,6 +87,7 @@ def client_fixture(db_session: Session):
     original_overrides = app.dependency_overrides.copy()
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     
     try:
         client = TestClient(app)
@@ -72,21 +104,40 @@ def test_user_credentials_fixture():
     """
     return {"username": "user", "password": "password"}
 
-@pytest.fixture(name="auth_token")
-def auth_token_fixture(client: TestClient, test_user_credentials: dict):
+@pytest.fixture(name="create_test_user")
+def create_test_user_fixture(db_session: AsyncSession, test_user_credentials: dict):
     """
-    Performs a login with the test user and returns the access token.
-    'create_test_user' ensures the user is already in the database.
+    Creates the test user in the database.
     """
+    return asyncio.run(user_service.create_user(db_session, **test_user_credentials))
+
+def login(client: TestClient, credentials: dict) -> str:
     response = client.post(
         "/api/v1/login",
         data={
-            "username": test_user_credentials["username"],
-            "password": test_user_credentials["password"]
+            "username": credentials["username"],
+            "password": credentials["password"]
         }
     )
     assert response.status_code == 200, f"Login failed for auth_token fixture: {response.json()}"
     
     token_data = response.json()
     assert "access_token" in token_data
-    return token_data["access_token"]
\ No newline at end of file
+    return token_data["access_token"]
+
+@pytest.fixture(name="auth_token")
+def auth_token_fixture(client: TestClient, test_user_credentials: dict, create_test_user):
+    """
+    Performs a login with the test user and returns the access token.
+    'create_test_user' ensures the user is already in the database.
+    """
+    return login(client, test_user_credentials)
+
+@pytest.fixture(name="other_auth_token")
+def other_auth_token_fixture(client: TestClient, db_session: AsyncSession):
+    """
+    Access token of a second user, for checking that users only see their own tasks.
+    """
+    credentials = {"username": "other", "password": "other-password"}
+    asyncio.run(user_service.create_user(db_session, **credentials))
+    return login(client, credentials)
\ No newline at end of file
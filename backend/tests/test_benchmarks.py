@@ -0,0 +1,19 @@
+from benchmarks.compare import compare
+from benchmarks.stats import percentile, summarize
+
+
+def test_summarize_percentiles():
+    samples = [i / 1000 for i in range(1, 101)]  # 1..100 ms
+    result = summarize(samples, elapsed=2.0)
+    assert result["count"] == 100
+    assert result["p50"] == 0.05
+    assert result["p95"] == 0.095
+    assert result["p99"] == 0.099
+    assert result["throughput"] == 50
+    assert percentile([], 0.5) == 0.0
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"fast": {"p50": 0.010}, "slow": {"p50": 0.010}}}
+    current = {"results": {"fast": {"p50": 0.0105}, "slow": {"p50": 0.020}, "new": {"p50": 0.001}}}
+    _, regressions = compare(baseline, current, "p50", threshold=0.10)
+    assert regressions == ["slow"]
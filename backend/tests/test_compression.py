@@ -0,0 +1,79 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, choose_encoding
+
+
+def make_app(minimum_size: int = 100) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse("x" * 1000)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("small")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a" * 500, b"b" * 500]), media_type="text/plain")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: x\n\n" * 50]), media_type="text/event-stream")
+
+    return app
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate", brotli_enabled=False) == "gzip"
+    assert choose_encoding("br;q=0, gzip", brotli_enabled=True) == "gzip"
+    assert choose_encoding("gzip;q=0", brotli_enabled=False) is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*", brotli_enabled=False) == "gzip"
+
+def test_gzip_above_minimum_size():
+    client = TestClient(make_app())
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < 1000
+    assert response.text == "x" * 1000
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "small"
+
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+def test_streaming_responses_are_compressed_except_sse():
+    client = TestClient(make_app())
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == "a" * 500 + "b" * 500
+
+    response = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_brotli_preferred_when_available():
+    pytest.importorskip("brotli")
+    client = TestClient(make_app())
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.text == "x" * 1000
+
+def test_task_list_is_compressed(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post("/api/v1/tasks:batch", headers=headers, json={
+        "items": [{"title": f"Task {i}", "description": "d" * 200} for i in range(20)]
+    })
+    response = client.get("/api/v1/tasks", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 20
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+
+from app.api import deps
+from app.core.security import create_access_token
+from app.db.base import Base
+from app.db.models import Task, User
+from app.db.session import ReadOnlySession, ReplicaRouter, create_engine_for_url, get_async_database_url
+from app.main import app
+
+def test_async_database_url_translation():
+    assert get_async_database_url("sqlite:///./sql_app.db") == "sqlite+aiosqlite:///./sql_app.db"
+    assert get_async_database_url("postgresql://u:p@db/tasks") == "postgresql+asyncpg://u:p@db/tasks"
+    assert get_async_database_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+def test_sqlite_performance_profile(tmp_path):
+    engine = create_engine_for_url(f"sqlite:///{tmp_path / 'perf.db'}")
+    assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+
+    async def read_pragmas():
+        async with engine.connect() as connection:
+            journal_mode = (await connection.execute(text("PRAGMA journal_mode"))).scalar()
+            synchronous = (await connection.execute(text("PRAGMA synchronous"))).scalar()
+            busy_timeout = (await connection.execute(text("PRAGMA busy_timeout"))).scalar()
+        await engine.dispose()
+        return journal_mode, synchronous, busy_timeout
+
+    journal_mode, synchronous, busy_timeout = asyncio.run(read_pragmas())
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+    assert busy_timeout == 5000
+
+def test_sqlite_memory_uses_static_pool():
+    engine = create_engine_for_url("sqlite://")
+    assert isinstance(engine.pool, StaticPool)
+
+def test_replica_router_round_robin_and_stickiness():
+    now = [0.0]
+    primary, replica_a, replica_b = object(), object(), object()
+    router = ReplicaRouter(primary, [replica_a, replica_b], sticky_seconds=5, timer=lambda: now[0])
+    assert [router.session_factory(1) for _ in range(3)] == [replica_a, replica_b, replica_a]
+
+    router.mark_write(1)
+    assert router.session_factory(1) is primary
+    assert router.session_factory(2) is replica_b  # Other users keep reading from replicas
+    now[0] = 6.0
+    assert router.session_factory(1) is replica_a
+    assert ReplicaRouter(primary, [], sticky_seconds=5).session_factory(1) is primary
+
+@pytest.fixture
+def primary_and_replica(tmp_path):
+    """Two SQLite files standing in for a primary and a (lagging) replica, both with user 1."""
+    engines = [create_engine_for_url(f"sqlite:///{tmp_path / name}") for name in ("primary.db", "replica.db")]
+
+    async def create_schema():
+        for engine in engines:
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+                await connection.execute(insert(User), [{"id": 1, "username": "user", "hashed_password": "-"}])
+
+    asyncio.run(create_schema())
+    yield engines
+    for engine in engines:
+        asyncio.run(engine.dispose())
+
+def test_reads_go_to_replicas_except_after_a_write(primary_and_replica, monkeypatch):
+    primary_engine, replica_engine = primary_and_replica
+    primary = async_sessionmaker(bind=primary_engine, expire_on_commit=False)
+    replica = async_sessionmaker(bind=replica_engine, expire_on_commit=False, sync_session_class=ReadOnlySession)
+    now = [0.0]
+    monkeypatch.setattr(deps, "SessionLocal", primary)
+    monkeypatch.setattr(deps, "replica_router", ReplicaRouter(primary, [replica], sticky_seconds=5, timer=lambda: now[0]))
+
+    async def seed_replica():
+        async with replica_engine.begin() as connection:
+            await connection.execute(insert(Task), [{"title": "Replicated", "owner_id": 1}])
+
+    asyncio.run(seed_replica())
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'user', 'uid': 1})}"}
+
+    def titles():
+        return [task["title"] for task in client.get("/api/v1/tasks", headers=headers).json()]
+
+    assert titles() == ["Replicated"]
+    assert client.post("/api/v1/tasks", headers=headers, json={"title": "Fresh"}).status_code == 201
+    assert titles() == ["Fresh"]  # Read-your-writes: served by the primary
+    now[0] = 10.0
+    assert titles() == ["Replicated"]  # Back on the replica, which has not caught up
+
+def test_replica_sessions_are_read_only(primary_and_replica):
+    replica = async_sessionmaker(bind=primary_and_replica[1], sync_session_class=ReadOnlySession)
+
+    async def write():
+        async with replica() as db:
+            db.add(Task(title="Nope", owner_id=1))
+            await db.commit()
+
+    with pytest.raises(InvalidRequestError):
+        asyncio.run(write())
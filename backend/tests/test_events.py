@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.endpoints.tasks import _sse_stream
+from app.services.events import RESYNC, InMemoryEventBackend, SQLiteEventBackend, TaskEvent, with_keepalive
+
+async def take(subscription, count):
+    events = []
+    async for event in subscription:
+        events.append(event)
+        if len(events) == count:
+            return events
+
+def test_in_memory_backend_delivers_and_replays():
+    async def scenario():
+        bus = InMemoryEventBackend(history_size=10)
+        _, boot_id = await bus.retained_range()
+        await bus.publish("task.created", {"id": "a"})
+
+        with bus.subscribe() as live, bus.subscribe(last_event_id=boot_id) as resumed:
+            await bus.publish_many("task.updated", [{"id": "a"}, {"id": "b"}])
+            live_events = await asyncio.wait_for(take(live, 2), 1)
+            resumed_events = await asyncio.wait_for(take(resumed, 3), 1)
+        assert not bus._subscribers
+        return boot_id, live_events, resumed_events
+
+    boot_id, live_events, resumed_events = asyncio.run(scenario())
+    assert [(e.id - boot_id, e.type, e.data["id"]) for e in live_events] == [
+        (2, "task.updated", "a"), (3, "task.updated", "b"),
+    ]
+    assert [e.id - boot_id for e in resumed_events] == [1, 2, 3]  # Replayed history, without duplicates
+
+def test_lost_events_require_a_resync():
+    async def scenario():
+        before_restart = InMemoryEventBackend()
+        await before_restart.publish("task.created", {"id": "a"})
+        _, last_seen = await before_restart.retained_range()
+
+        bus = InMemoryEventBackend(history_size=2)  # Restarted
+        with bus.subscribe(last_event_id=last_seen) as subscription:
+            events = subscription.__aiter__()
+            after_restart = [await asyncio.wait_for(events.__anext__(), 1)]
+            await bus.publish("task.created", {"id": "b"})
+            after_restart.append(await asyncio.wait_for(events.__anext__(), 1))
+            await events.aclose()
+
+        await bus.publish_many("task.updated", [{"id": "b"}, {"id": "c"}])  # Pushes "b" out of the history
+        with bus.subscribe(last_event_id=after_restart[-1].id - 1) as subscription:
+            pruned = await asyncio.wait_for(take(subscription, 1), 1)
+        return after_restart, pruned, await bus.retained_range()
+
+    after_restart, pruned, (_, newest) = asyncio.run(scenario())
+    assert [(e.type, e.data) for e in after_restart] == [(RESYNC, {}), ("task.created", {"id": "b"})]
+    assert after_restart[0].id < after_restart[1].id  # The client's Last-Event-ID moves to the new range
+    assert [(e.id, e.type) for e in pruned] == [(newest, RESYNC)]
+
+def test_sse_reconnect_after_restart():
+    async def scenario():
+        before_restart = InMemoryEventBackend()
+        await before_restart.publish("task.created", {"id": "a"})
+        _, last_seen = await before_restart.retained_range()
+
+        bus = InMemoryEventBackend()
+        await bus.publish("task.created", {"id": "b"})
+        stream = _sse_stream(bus.subscribe(owner_id=None, last_event_id=last_seen))
+        try:
+            return [await stream.__anext__() for _ in range(2)], await bus.retained_range()
+        finally:
+            await stream.aclose()
+
+    (retry, resync), (_, newest) = asyncio.run(scenario())
+    assert retry == b"retry: 3000\n\n"
+    assert resync == b"id: %d\nevent: resync\ndata: {}\n\n" % newest
+
+def test_sqlite_backend_shares_events_between_workers(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "events.db")
+        worker_a = SQLiteEventBackend(path, poll_interval=0.01)
+        worker_b = SQLiteEventBackend(path, poll_interval=0.01)
+        await worker_a.start()
+        await worker_b.start()
+        try:
+            with worker_b.subscribe() as subscription:
+                await worker_a.publish("task.deleted", {"id": "x"})
+                events = await asyncio.wait_for(take(subscription, 1), 2)
+            with worker_b.subscribe(last_event_id=0) as subscription:
+                replayed = await asyncio.wait_for(take(subscription, 1), 2)
+        finally:
+            await worker_a.close()
+            await worker_b.close()
+        return events, replayed
+
+    events, replayed = asyncio.run(scenario())
+    assert events == [TaskEvent(1, "task.deleted", {"id": "x"})]
+    assert replayed == events
+
+def test_keepalive_on_idle_subscription():
+    async def scenario():
+        bus = InMemoryEventBackend()
+        with bus.subscribe() as subscription:
+            stream = with_keepalive(subscription, interval=0.01)
+            first = await stream.__anext__()
+            await bus.publish("task.created", {"id": "a"})
+            second = await stream.__anext__()
+            await stream.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is None
+    assert second.data == {"id": "a"}
+
+def test_sse_encoding():
+    event = TaskEvent(7, "task.updated", {"id": "a", "status": "completed"})
+    assert event.to_sse() == b'id: 7\nevent: task.updated\ndata: {"id":"a","status":"completed"}\n\n'
+
+def test_websocket_feed_receives_task_changes(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    with client.websocket_connect(f"/api/v1/tasks/events/ws?access_token={auth_token}") as websocket:
+        task_id = client.post("/api/v1/tasks", headers=headers, json={"title": "Live"}).json()["id"]
+        client.delete(f"/api/v1/tasks/{task_id}", headers=headers)
+
+        created = websocket.receive_json()
+        deleted = websocket.receive_json()
+
+    assert created["type"] == "task.created"
+    assert created["data"]["id"] == task_id
+    assert created["data"]["title"] == "Live"
+    assert deleted["type"] == "task.deleted"
+    assert deleted["data"] == {"id": task_id}
+    assert deleted["id"] > created["id"]
+
+def test_subscriptions_only_receive_their_owners_events():
+    async def scenario():
+        bus = InMemoryEventBackend()
+        _, boot_id = await bus.retained_range()
+        await bus.publish("task.created", {"id": "old-b"}, owner_id=2)
+        with bus.subscribe(owner_id=1, last_event_id=boot_id) as subscription:
+            await bus.publish("task.created", {"id": "b"}, owner_id=2)
+            await bus.publish("task.created", {"id": "a"}, owner_id=1)
+            return await asyncio.wait_for(take(subscription, 1), 1)
+
+    assert [event.data["id"] for event in asyncio.run(scenario())] == ["a"]
+
+def test_websocket_feed_requires_token(client: TestClient):
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/v1/tasks/events/ws") as websocket:
+            websocket.receive_json()
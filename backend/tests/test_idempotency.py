@@ -0,0 +1,167 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.models import IdempotencyKey, Job, User, utcnow
+from app.db.session import create_engine_for_url
+from app.schemas.task import TaskCreate
+from app.services import idempotency_service, task_service
+from app.services.idempotency_service import IDEMPOTENCY_EXPIRE_JOB
+
+
+def titles(client: TestClient, headers: dict) -> list:
+    return sorted(task["title"] for task in client.get("/api/v1/tasks", headers=headers).json())
+
+def test_retries_replay_the_first_response(client: TestClient, auth_token: str, db_session: AsyncSession, create_test_user):
+    owner_id = create_test_user.id  # Read before the rollback of the retry's claim expires it
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "create-1"}
+    first = client.post("/api/v1/tasks", headers=headers, json={"title": "Once"})
+    retry = client.post("/api/v1/tasks", headers=headers, json={"title": "Once"})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert titles(client, headers) == ["Once"]
+
+    jobs = asyncio.run(db_session.scalars(select(Job).where(Job.kind == IDEMPOTENCY_EXPIRE_JOB))).all()
+    assert [job.payload for job in jobs] == [{"owner_id": owner_id, "key": "create-1"}]
+    assert jobs[0].run_at - jobs[0].created_at > timedelta(hours=23)
+
+def test_batch_writes_are_replayed(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "batch-1"}
+    body = {"items": [{"title": "A"}, {"title": "B"}]}
+    first = client.post("/api/v1/tasks:batch", headers=headers, json=body)
+    retry = client.post("/api/v1/tasks:batch", headers=headers, json=body)
+    assert retry.status_code == 201 and retry.json() == first.json()
+
+    ids = [result["id"] for result in first.json()["results"]]
+    headers["Idempotency-Key"] = "batch-2"
+    deleted = client.request("DELETE", "/api/v1/tasks:batch", headers=headers, json={"ids": ids})
+    retry = client.request("DELETE", "/api/v1/tasks:batch", headers=headers, json={"ids": ids})
+    assert [result["status_code"] for result in retry.json()["results"]] == [204, 204]  # Not 404
+    assert retry.json() == deleted.json()
+
+def test_keys_are_scoped_to_request_and_user(client: TestClient, auth_token: str, other_auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "shared"}
+    client.post("/api/v1/tasks", headers=headers, json={"title": "Mine"})
+
+    response = client.post("/api/v1/tasks", headers=headers, json={"title": "Something else"})
+    assert response.status_code == 422
+    other = {"Authorization": f"Bearer {other_auth_token}", "Idempotency-Key": "shared"}
+    assert client.post("/api/v1/tasks", headers=other, json={"title": "Theirs"}).status_code == 201
+    assert titles(client, headers) == ["Mine"]
+
+def test_concurrent_duplicates_are_refused(client: TestClient, auth_token: str, db_session: AsyncSession, create_test_user):
+    fingerprint = idempotency_service.request_fingerprint("POST", "/api/v1/tasks", TaskCreate(title="Racing"))
+    assert asyncio.run(idempotency_service.claim_key(db_session, create_test_user.id, "racing", fingerprint, "first")) is None
+    with pytest.raises(idempotency_service.IdempotencyKeyInProgressError):
+        asyncio.run(idempotency_service.claim_key(db_session, create_test_user.id, "racing", fingerprint, "second"))
+
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "racing"}
+    response = client.post("/api/v1/tasks", headers=headers, json={"title": "Racing"})
+    assert response.status_code == 409 and response.headers["Retry-After"] == "1"
+
+def test_expired_and_abandoned_keys_can_be_claimed_again(
+    client: TestClient, auth_token: str, db_session: AsyncSession, create_test_user
+):
+    owner_id = create_test_user.id
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "old"}
+    client.post("/api/v1/tasks", headers=headers, json={"title": "Daily"})
+    asyncio.run(db_session.execute(update(IdempotencyKey).values(expires_at=utcnow() - timedelta(seconds=1))))
+    asyncio.run(db_session.commit())
+    response = client.post("/api/v1/tasks", headers=headers, json={"title": "Daily"})
+    assert response.status_code == 201 and "Idempotent-Replayed" not in response.headers
+    assert titles(client, headers) == ["Daily", "Daily"]
+
+    # The first request with this key died before storing its response, and stopped renewing its lease
+    asyncio.run(idempotency_service.claim_key(db_session, owner_id, "crashed", "0" * 64, "dead"))
+    asyncio.run(db_session.execute(
+        update(IdempotencyKey).where(IdempotencyKey.key == "crashed").values(locked_until=utcnow() - timedelta(seconds=1))
+    ))
+    asyncio.run(db_session.commit())
+    headers["Idempotency-Key"] = "crashed"
+    assert client.post("/api/v1/tasks", headers=headers, json={"title": "Recovered"}).status_code == 201
+
+def test_failed_writes_release_the_key(client: TestClient, auth_token: str, db_session: AsyncSession, monkeypatch):
+    async def fail(**kwargs):
+        raise RuntimeError("database went away")
+
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "flaky"}
+    with monkeypatch.context() as patch:
+        patch.setattr(task_service, "create_task", fail)
+        with pytest.raises(RuntimeError):
+            client.post("/api/v1/tasks", headers=headers, json={"title": "Flaky"})
+    assert asyncio.run(db_session.scalars(select(IdempotencyKey))).all() == []
+    assert client.post("/api/v1/tasks", headers=headers, json={"title": "Flaky"}).status_code == 201
+
+def test_failures_after_the_write_committed_keep_the_response(client: TestClient, auth_token: str, monkeypatch):
+    async def fail(*args):
+        raise RuntimeError("event backend went away")
+
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "published"}
+    with monkeypatch.context() as patch:
+        patch.setattr(task_service, "_publish_changes", fail)
+        with pytest.raises(RuntimeError):
+            client.post("/api/v1/tasks", headers=headers, json={"title": "Stored"})
+    retry = client.post("/api/v1/tasks", headers=headers, json={"title": "Stored"})
+    assert retry.status_code == 201 and retry.headers["Idempotent-Replayed"] == "true"
+    assert titles(client, headers) == ["Stored"]
+
+@pytest.fixture
+def file_session_factory(tmp_path):
+    # Separate connections, like concurrent requests have
+    engine = create_engine_for_url(f"sqlite:///{tmp_path / 'idempotency.db'}")
+
+    async def create_schema():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(insert(User).values(id=1, username="user", hashed_password="-"))
+
+    asyncio.run(create_schema())
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+def test_running_claims_are_not_taken_over(file_session_factory, monkeypatch):
+    lease = 0.3
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_SECONDS", lease)
+    fingerprint = "0" * 64
+
+    async def scenario():
+        async with file_session_factory() as first, file_session_factory() as retry:
+            assert await idempotency_service.claim_key(first, 1, "slow", fingerprint, "first") is None
+            async with idempotency_service.keep_claim(1, "slow", "first", session_factory=file_session_factory):
+                await asyncio.sleep(lease * 3)  # A slow write, well past the first lease
+                with pytest.raises(idempotency_service.IdempotencyKeyInProgressError):
+                    await idempotency_service.claim_key(retry, 1, "slow", fingerprint, "retry")
+                await idempotency_service.store_response(first, 1, "slow", "first", 201, b"{}")
+                await first.commit()
+            await asyncio.sleep(lease * 2)
+            return await idempotency_service.claim_key(retry, 1, "slow", fingerprint, "retry")
+
+    stored = asyncio.run(scenario())
+    assert (stored.status_code, stored.response_body) == (201, b"{}")
+
+def test_taken_over_claims_cannot_store_a_response(file_session_factory, monkeypatch):
+    lease = 0.1
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_SECONDS", lease)
+    fingerprint = "0" * 64
+
+    async def scenario():
+        async with file_session_factory() as stalled, file_session_factory() as retry:
+            assert await idempotency_service.claim_key(stalled, 1, "stalled", fingerprint, "stalled") is None
+            await asyncio.sleep(lease * 2)  # Its process froze: the lease lapsed without renewal
+            assert await idempotency_service.claim_key(retry, 1, "stalled", fingerprint, "retry") is None
+            with pytest.raises(idempotency_service.IdempotencyKeyInProgressError):
+                await idempotency_service.store_response(stalled, 1, "stalled", "stalled", 201, b"{}")
+            await idempotency_service.release_key(stalled, 1, "stalled", "stalled")  # Leaves the retry's claim alone
+            await idempotency_service.store_response(retry, 1, "stalled", "retry", 201, b"{}")
+            await retry.commit()
+
+    asyncio.run(scenario())
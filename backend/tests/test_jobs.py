@@ -0,0 +1,143 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.base import Base
+from app.db.models import Job, JobStatusEnum, utcnow
+from app.db.session import create_engine_for_url
+from app.services.jobs import JobQueue
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine_for_url(f"sqlite:///{tmp_path / 'jobs.db'}")
+
+    async def create_schema():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_schema())
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+async def enqueue(queue: JobQueue, kind: str, payload: dict) -> None:
+    async with queue.session_factory() as db:
+        await queue.enqueue(db, kind, payload)
+        await db.commit()
+    queue.notify()
+
+async def all_jobs(queue: JobQueue):
+    async with queue.session_factory() as db:
+        return (await db.scalars(select(Job))).all()
+
+def test_jobs_run_once_and_are_removed(session_factory):
+    queue = JobQueue(session_factory)
+    handled = []
+
+    @queue.handler("note")
+    async def note(payload):
+        handled.append(payload)
+
+    async def scenario():
+        await enqueue(queue, "note", {"n": 1})
+        assert await queue.run_next()
+        assert not await queue.run_next()
+        return await all_jobs(queue)
+
+    assert asyncio.run(scenario()) == []
+    assert handled == [{"n": 1}]
+
+def test_failed_jobs_are_retried_with_backoff_then_given_up(session_factory):
+    queue = JobQueue(session_factory, max_attempts=2, retry_backoff=60)
+
+    @queue.handler("flaky")
+    async def flaky(payload):
+        raise RuntimeError("webhook unreachable")
+
+    async def scenario():
+        await enqueue(queue, "flaky", {})
+        assert await queue.run_next()
+        [job] = await all_jobs(queue)
+        assert job.status == JobStatusEnum.PENDING and job.attempts == 1
+        assert job.run_at - job.created_at > timedelta(seconds=55)
+        assert "webhook unreachable" in job.last_error
+        assert not await queue.run_next()  # Not due yet
+
+        async with session_factory() as db:
+            await db.execute(update(Job).values(run_at=utcnow()))
+            await db.commit()
+        assert await queue.run_next()
+        return await all_jobs(queue)
+
+    [job] = asyncio.run(scenario())
+    assert job.status == JobStatusEnum.FAILED and job.attempts == 2
+
+def test_jobs_with_a_lapsed_lease_are_reclaimed(session_factory):
+    queue = JobQueue(session_factory)
+    handled = []
+
+    @queue.handler("note")
+    async def note(payload):
+        handled.append(payload)
+
+    async def scenario():
+        await enqueue(queue, "note", {})
+        async with session_factory() as db:  # A worker claimed the job, then its process died
+            await db.execute(update(Job).values(status=JobStatusEnum.RUNNING, locked_until=utcnow() - timedelta(seconds=1)))
+            await db.commit()
+        assert await queue.run_next()
+
+    asyncio.run(scenario())
+    assert handled == [{}]
+
+def test_workers_run_jobs_and_drain_on_close(session_factory):
+    queue = JobQueue(session_factory, workers=2, poll_interval=30)
+    started, handled = asyncio.Event(), []
+
+    @queue.handler("slow")
+    async def slow(payload):
+        started.set()
+        await asyncio.sleep(0.05)
+        handled.append(payload)
+
+    async def scenario():
+        await queue.start()
+        await enqueue(queue, "slow", {"n": 1})
+        await asyncio.wait_for(started.wait(), 1)  # Woken by notify(), not the 30s poll
+        await queue.close(timeout=5)
+        return await all_jobs(queue)
+
+    assert asyncio.run(scenario()) == []
+    assert handled == [{"n": 1}]
+
+def test_jobs_cancelled_on_shutdown_go_back_to_the_queue(session_factory):
+    queue = JobQueue(session_factory, workers=1)
+    started = asyncio.Event()
+
+    @queue.handler("stuck")
+    async def stuck(payload):
+        started.set()
+        await asyncio.sleep(60)
+
+    async def scenario():
+        await queue.start()
+        await enqueue(queue, "stuck", {})
+        await asyncio.wait_for(started.wait(), 1)
+        await queue.close(timeout=0.01)
+        return await all_jobs(queue)
+
+    [job] = asyncio.run(scenario())
+    assert job.status == JobStatusEnum.PENDING and job.attempts == 0
+
+def test_task_writes_queue_no_jobs(client: TestClient, auth_token: str, db_session: AsyncSession):
+    # Writes without deferred side effects must not pay for job inserts
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task_id = client.post("/api/v1/tasks", headers=headers, json={"title": "Plain"}).json()["id"]
+    client.patch(f"/api/v1/tasks/{task_id}", headers=headers, json={"status": "completed"})
+    client.delete(f"/api/v1/tasks/{task_id}", headers=headers)
+
+    assert asyncio.run(db_session.scalars(select(Job))).all() == []
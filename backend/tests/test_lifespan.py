@@ -0,0 +1,45 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import main
+from app.db.base import Base
+from app.db.models import Job
+from app.db.session import create_engine_for_url
+from app.services.jobs import job_queue
+from app.services.scheduler import scheduler
+from app.services.task_service import TASK_CHANGES_PRUNE_JOB
+
+
+def test_lifespan_starts_and_stops_background_services(tmp_path, monkeypatch):
+    # The lifespan's own sessions go to a throwaway database with the full schema
+    engine = create_engine_for_url(f"sqlite:///{tmp_path / 'lifespan.db'}")
+
+    async def create_schema():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def queued_jobs():
+        async with session_factory() as db:
+            return (await db.scalars(select(Job.kind))).all()
+
+    try:
+        asyncio.run(create_schema())
+        monkeypatch.setattr(main, "SessionLocal", session_factory)
+        monkeypatch.setattr(job_queue, "session_factory", session_factory)
+        monkeypatch.setattr(scheduler, "session_factory", session_factory)
+
+        with TestClient(main.app) as client:
+            assert client.get("/health").json() == {"status": "ok"}
+            assert job_queue._worker_tasks and not any(task.done() for task in job_queue._worker_tasks)
+            assert scheduler._tasks and not any(task.done() for task in scheduler._tasks)
+
+        assert job_queue._worker_tasks == []
+        assert scheduler._tasks == []
+        assert asyncio.run(queued_jobs()) == [TASK_CHANGES_PRUNE_JOB]  # The pruning cycle was started
+    finally:
+        asyncio.run(engine.dispose())
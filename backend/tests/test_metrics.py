@@ -0,0 +1,82 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import metrics
+from app.core.metrics import Counter, Histogram, MetricsRegistry, RequestQueryStats, current_query_stats, instrument_engine
+from app.core.security import token_cache
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("requests_total", "Requests.", ("route",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    requests.inc('/a"b')
+    requests.inc('/a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    lines = registry.render().decode().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/a\\"b"} 2' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_sum 0.55" in lines
+    assert "latency_seconds_count 2" in lines
+
+def test_query_hooks_count_statements_per_request():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine.sync_engine, slow_query_seconds=0)
+    slow_before = metrics.db_slow_queries_total.value("SELECT")
+
+    async def run_queries():
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+        try:
+            async with engine.connect() as connection:
+                for _ in range(3):
+                    await connection.execute(text("SELECT 1"))
+        finally:
+            current_query_stats.reset(token)
+        await engine.dispose()
+        return stats
+
+    stats = asyncio.run(run_queries())
+    assert stats.count == 3
+    assert stats.seconds > 0
+    assert metrics.db_slow_queries_total.value("SELECT") == slow_before + 3
+
+def test_metrics_endpoint_reports_route_templates(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    route = "/api/v1/tasks/{task_id}"
+    before = metrics.http_requests_total.value("GET", route, "404")
+    client.get(f"/api/v1/tasks/{uuid.uuid4()}", headers=headers)
+    client.get(f"/api/v1/tasks/{uuid.uuid4()}", headers=headers)
+    assert metrics.http_requests_total.value("GET", route, "404") == before + 2
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert f'http_requests_total{{method="GET",route="{route}",status="404"}}' in body
+    assert f'http_request_duration_seconds_count{{method="GET",route="{route}"}}' in body
+    assert "http_request_db_queries_bucket" in body
+
+def test_metrics_endpoint_reports_token_cache_hit_rate(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    before = token_cache.stats()
+    client.get("/api/v1/tasks", headers=headers)
+    client.get("/api/v1/tasks", headers=headers)
+    after = token_cache.stats()
+    assert after["hits"] > before["hits"]
+
+    lines = client.get("/metrics").text.splitlines()
+    assert "# TYPE cache_hits_total counter" in lines
+    assert f'cache_hits_total{{cache="token"}} {after["hits"]}' in lines
+    assert f'cache_misses_total{{cache="token"}} {after["misses"]}' in lines
+    assert any(line.startswith('cache_entries{cache="token"} ') for line in lines)
@@ -0,0 +1,71 @@
+import logging
+import pstats
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.api.endpoints import profiles
+from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.profiling import PROFILE_DUMP_HEADER, ProfilingMiddleware
+from app.core.security import create_access_token
+
+
+def make_app(dump_dir) -> FastAPI:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine.sync_engine, slow_query_seconds=60)
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, dump_dir=str(dump_dir))
+    app.include_router(profiles.router)
+
+    @app.get("/work")
+    async def work():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+            await connection.execute(text("SELECT 2"))
+        await engine.dispose()
+        return {"ok": True}
+
+    return app
+
+
+def test_profiles_authenticated_requests(tmp_path, caplog):
+    client = TestClient(make_app(tmp_path))
+    token = create_access_token({"sub": "user", "uid": 1})
+    with caplog.at_level(logging.INFO, logger="app.core.profiling"):
+        response = client.get("/work", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert 'db;dur=' in response.headers["server-timing"]
+    assert '"2 queries"' in response.headers["server-timing"]
+    dump = tmp_path / response.headers[PROFILE_DUMP_HEADER]
+    assert pstats.Stats(str(dump)).total_calls > 0
+    assert "SELECT 2" in caplog.text
+
+def test_ignores_unauthenticated_or_unflagged_requests(tmp_path):
+    client = TestClient(make_app(tmp_path))
+    response = client.get("/work", headers={"X-Profile": "1"})
+    assert PROFILE_DUMP_HEADER.lower() not in response.headers
+
+    token = create_access_token({"sub": "user", "uid": 1})
+    response = client.get("/work", headers={"Authorization": f"Bearer {token}"})
+    assert PROFILE_DUMP_HEADER.lower() not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+def test_profile_dumps_are_only_served_to_their_requester(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_DUMP_DIR", str(tmp_path))
+    client = TestClient(make_app(tmp_path))
+    owner = {"Authorization": f"Bearer {create_access_token({'sub': 'user', 'uid': 1})}"}
+    other = {"Authorization": f"Bearer {create_access_token({'sub': 'other', 'uid': 2})}"}
+    dump_name = client.get("/work", headers={**owner, "X-Profile": "1"}).headers[PROFILE_DUMP_HEADER]
+
+    response = client.get(f"/debug/profiles/{dump_name}", headers=owner)
+    assert response.status_code == 200
+    assert response.content == (tmp_path / dump_name).read_bytes()
+
+    response = client.get(f"/debug/profiles/{dump_name}", headers=other)
+    assert response.status_code == 404
+    assert client.get(f"/debug/profiles/{dump_name}").status_code == 401
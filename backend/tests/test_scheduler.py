@@ -0,0 +1,84 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Task, TaskStatusEnum, utcnow
+from app.schemas.task import TaskCreate, TaskOut, TaskUpdate
+from app.services import task_service
+from app.services.events import TASK_CREATED, InMemoryEventBackend, TaskEvent
+from app.services.scheduler import OverdueScheduler
+
+
+@pytest.fixture
+def scheduler(db_session: AsyncSession) -> OverdueScheduler:
+    def session_factory():
+        # Sessions on the test's connection, so the scheduler sees (and rolls back with) its data
+        return AsyncSession(bind=db_session.bind, join_transaction_mode="create_savepoint", expire_on_commit=False)
+
+    return OverdueScheduler(session_factory, InMemoryEventBackend(), horizon=300, batch_size=2)
+
+def create_tasks(db_session: AsyncSession, owner_id: int, **due_in_seconds):
+    now = utcnow()
+    items = [
+        TaskCreate(title=title, due_at=None if seconds is None else now + timedelta(seconds=seconds))
+        for title, seconds in due_in_seconds.items()
+    ]
+    return {row.title: row.id for row in asyncio.run(task_service.create_tasks(db_session, owner_id, items))}
+
+def statuses(db_session: AsyncSession) -> dict:
+    rows = asyncio.run(db_session.execute(select(Task.title, Task.status).execution_options(populate_existing=True)))
+    return dict(rows.all())
+
+def test_tick_moves_due_open_tasks_to_overdue(scheduler, db_session, create_test_user):
+    ids = create_tasks(db_session, create_test_user.id, a=-30, b=-20, c=-10, d=-5, e=-1, later=60, never=None)
+    asyncio.run(task_service.update_task(db_session, create_test_user.id, ids["e"], TaskUpdate(status="completed")))
+
+    assert asyncio.run(scheduler.tick()) == 4  # In batches of two
+    assert statuses(db_session) == {
+        "a": TaskStatusEnum.OVERDUE, "b": TaskStatusEnum.OVERDUE, "c": TaskStatusEnum.OVERDUE,
+        "d": TaskStatusEnum.OVERDUE, "e": TaskStatusEnum.COMPLETED, "later": TaskStatusEnum.PENDING,
+        "never": TaskStatusEnum.PENDING,
+    }
+    assert asyncio.run(scheduler.tick()) == 0
+    assert asyncio.run(scheduler.tick(utcnow() + timedelta(seconds=120))) == 1
+
+def test_rescheduled_tasks_are_not_marked_overdue(scheduler, db_session, create_test_user):
+    ids = create_tasks(db_session, create_test_user.id, moved=10)
+    asyncio.run(scheduler.reload(utcnow()))
+    later = utcnow() + timedelta(seconds=100)
+    asyncio.run(task_service.update_task(db_session, create_test_user.id, ids["moved"], TaskUpdate(due_at=later)))
+    scheduler.schedule(ids["moved"], later)
+
+    assert asyncio.run(scheduler.tick(utcnow() + timedelta(seconds=20))) == 0  # Stale heap entry
+    assert asyncio.run(scheduler.tick(utcnow() + timedelta(seconds=120))) == 1
+
+def test_task_events_feed_the_heap(scheduler, db_session, create_test_user):
+    asyncio.run(scheduler.reload(utcnow()))
+    [row] = asyncio.run(task_service.create_tasks(
+        db_session, create_test_user.id, [TaskCreate(title="New", due_at=utcnow() + timedelta(seconds=5))]
+    ))
+    scheduler.observe(TaskEvent(1, TASK_CREATED, TaskOut.model_validate(row).model_dump(mode="json")))
+
+    assert [task_id for _, task_id in scheduler._heap] == [row.id]
+    assert asyncio.run(scheduler.tick(utcnow() + timedelta(seconds=10))) == 1
+
+def test_failed_batches_are_retried(scheduler, db_session, create_test_user, monkeypatch):
+    create_tasks(db_session, create_test_user.id, a=-30, b=-20, c=-10)
+    mark_overdue = task_service.mark_overdue
+    calls = []
+
+    async def flaky_mark_overdue(db, task_ids, now):
+        calls.append(task_ids)
+        if len(calls) == 2:
+            raise RuntimeError("database is locked")
+        return await mark_overdue(db, task_ids, now)
+
+    monkeypatch.setattr(task_service, "mark_overdue", flaky_mark_overdue)
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.tick())  # The first batch of two commits, the second fails
+
+    assert asyncio.run(scheduler.tick()) == 1
+    assert set(statuses(db_session).values()) == {TaskStatusEnum.OVERDUE}
@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from passlib.context import CryptContext
+
+from app.core.cache import TTLCache
+from app.core.security import (
+    FailedLoginLimiter, PasswordHasher, create_access_token, hash_password, token_cache, verify_access_token,
+    verify_password,
+)
+
+def test_verified_tokens_are_cached():
+    token_cache.clear()
+    token = create_access_token(data={"sub": "user", "uid": 1})
+    hits, misses = token_cache.hits, token_cache.misses
+
+    assert verify_access_token(token) == {"id": 1, "username": "user"}
+    assert verify_access_token(token) == {"id": 1, "username": "user"}
+    assert token_cache.misses == misses + 1
+    assert token_cache.hits == hits + 1
+
+def test_invalid_tokens_are_not_cached():
+    token_cache.clear()
+    assert verify_access_token("not-a-token") is None
+    assert len(token_cache) == 0
+
+def test_expired_tokens_are_rejected():
+    token = create_access_token(data={"sub": "user", "uid": 1}, expires_delta=timedelta(seconds=-1))
+    assert verify_access_token(token) is None
+
+def test_tokens_without_user_id_are_rejected():
+    assert verify_access_token(create_access_token(data={"sub": "user"})) is None
+
+def test_password_hashing():
+    hashed = hash_password("secret")
+    assert hashed != "secret"
+    assert verify_password("secret", hashed)
+    assert not verify_password("wrong", hashed)
+
+def test_password_hashing_runs_off_the_event_loop():
+    hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=10), max_workers=2)
+
+    async def scenario():
+        hashed = await hasher.hash("secret")
+        ticks = 0
+        verifying = asyncio.ensure_future(asyncio.gather(
+            hasher.verify_and_update("secret", hashed), hasher.verify_and_update("wrong", hashed),
+        ))
+        while not verifying.done():
+            ticks += 1
+            await asyncio.sleep(0.001)
+        return await verifying, ticks
+
+    try:
+        (valid, invalid), ticks = asyncio.run(scenario())
+    finally:
+        hasher.close()
+    assert valid == (True, None)
+    assert invalid == (False, None)
+    assert ticks > 1  # The loop kept running while bcrypt worked
+
+def test_unknown_users_are_checked_against_a_dummy_hash():
+    hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=4), max_workers=1)
+    try:
+        assert asyncio.run(hasher.verify_and_update("secret", None)) == (False, None)
+    finally:
+        hasher.close()
+
+def test_failed_login_limiter():
+    now = [0.0]
+    limiter = FailedLoginLimiter(max_failures=2, window_seconds=60, timer=lambda: now[0])
+    assert limiter.reserve("Alice") == 0
+    now[0] = 10.0
+    assert limiter.reserve("alice") == 0
+    assert limiter.reserve("ALICE") == 50.0  # The window starts at the first attempt
+    assert limiter.reserve("bob") == 0
+
+    now[0] = 61.0
+    assert limiter.reserve("alice") == 0
+    limiter.reset("alice")  # Logged in
+    assert limiter.reserve("alice") == 0
+    assert limiter.reserve("alice") == 0
+
+def test_failed_login_limiter_holds_against_concurrent_attempts():
+    limiter = FailedLoginLimiter(max_failures=5, window_seconds=60)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        # A burst of guesses, all checked before any of their verifications finished
+        results = list(pool.map(limiter.reserve, ["alice"] * 50))
+    assert results.count(0) == 5
+
+def test_ttl_cache_expiry_and_eviction():
+    now = [100.0]
+    cache = TTLCache(maxsize=2, timer=lambda: now[0])
+    cache.set("a", 1, expires_at=110.0)
+    cache.set("b", 2, expires_at=200.0)
+    cache.set("c", 3, expires_at=200.0)  # Evicts "a", the least recently used entry
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    now[0] = 250.0
+    assert cache.get("b") is None
+    assert len(cache) == 1  # "c" is only dropped when it is looked up
@@ -1,7 +1,18 @@
+import asyncio
+import csv
+import io
+import json
+import uuid
+from datetime import timedelta
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import Session
-from app.db.models import TaskStatusEnum 
+from passlib.context import CryptContext
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.security import pwd_context
+from app.db.models import Job, TaskChange, TaskStatusEnum, User, utcnow
+from app.services import task_service
 
 def test_login_failure(client: TestClient):
     response = client.post(
@@ -11,7 +22,7 @@ def test_login_failure(client: TestClient):
     assert response.status_code == 401
     assert response.json()["detail"] == "Incorrect username or password"
     
-def test_login_success(client: TestClient, test_user_credentials):
+def test_login_success(client: TestClient, test_user_credentials, create_test_user):
     response = client.post(
         "/api/v1/login",
         data={
@@ -24,6 +35,27 @@ def test_login_success(client: TestClient, test_user_credentials):
     assert "access_token" in data
     assert data["token_type"] == "bearer"
 
+def test_login_rehashes_outdated_hashes(client: TestClient, db_session, test_user_credentials):
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(test_user_credentials["password"])
+    user = User(username=test_user_credentials["username"], hashed_password=outdated)
+    db_session.add(user)
+    asyncio.run(db_session.commit())
+
+    assert client.post("/api/v1/login", data=test_user_credentials).status_code == 200
+    assert user.hashed_password != outdated
+    assert not pwd_context.needs_update(user.hashed_password)
+    assert client.post("/api/v1/login", data=test_user_credentials).status_code == 200
+
+def test_failed_logins_are_rate_limited(client: TestClient, test_user_credentials, create_test_user):
+    wrong = {"username": test_user_credentials["username"], "password": "wrong"}
+    for _ in range(settings.LOGIN_MAX_FAILURES):
+        assert client.post("/api/v1/login", data=wrong).status_code == 401
+
+    response = client.post("/api/v1/login", data=test_user_credentials)
+    assert response.status_code == 429
+    assert 0 < int(response.headers["retry-after"]) <= settings.LOGIN_FAILURE_WINDOW_SECONDS
+    assert client.post("/api/v1/login", data={"username": "someone-else", "password": "x"}).status_code == 401
+
 def test_create_task(client: TestClient, auth_token: str):
     response = client.post(
         "/api/v1/tasks",
@@ -38,7 +70,7 @@ def test_create_task(client: TestClient, auth_token: str):
     assert "created_at" in data
     assert "updated_at" in data
 
-def test_read_tasks(client: TestClient, auth_token: str, db_session: Session):
+def test_read_tasks(client: TestClient, auth_token: str, db_session: AsyncSession):
     client.post(
         "/api/v1/tasks",
         headers={"Authorization": f"Bearer {auth_token}"},
@@ -60,7 +92,7 @@ def test_read_tasks(client: TestClient, auth_token: str, db_session: Session):
     assert any(task["title"] == "Task 1" for task in data)
     assert any(task["title"] == "Task 2" for task in data)
 
-def test_read_tasks_filter_by_status(client: TestClient, auth_token: str, db_session: Session):
+def test_read_tasks_filter_by_status(client: TestClient, auth_token: str, db_session: AsyncSession):
     client.post(
         "/api/v1/tasks",
         headers={"Authorization": f"Bearer {auth_token}"},
@@ -82,7 +114,7 @@ def test_read_tasks_filter_by_status(client: TestClient, auth_token: str, db_ses
     assert data[0]["title"] == "Pending Task"
     assert data[0]["status"] == "pending"
 
-def test_read_single_task(client: TestClient, auth_token: str, db_session: Session):
+def test_read_single_task(client: TestClient, auth_token: str, db_session: AsyncSession):
     create_response = client.post(
         "/api/v1/tasks",
         headers={"Authorization": f"Bearer {auth_token}"},
@@ -108,7 +140,7 @@ def test_read_nonexistent_task(client: TestClient, auth_token: str):
     assert response.status_code == 404
     assert response.json()["detail"] == "Task not found"
 
-def test_update_task(client: TestClient, auth_token: str, db_session: Session):
+def test_update_task(client: TestClient, auth_token: str, db_session: AsyncSession):
     create_response = client.post(
         "/api/v1/tasks",
         headers={"Authorization": f"Bearer {auth_token}"},
@@ -138,7 +170,7 @@ def test_update_nonexistent_task(client: TestClient, auth_token: str):
     assert response.status_code == 404
     assert response.json()["detail"] == "Task not found"
 
-def test_delete_task(client: TestClient, auth_token: str, db_session: Session):
+def test_delete_task(client: TestClient, auth_token: str, db_session: AsyncSession):
     create_response = client.post(
         "/api/v1/tasks",
         headers={"Authorization": f"Bearer {auth_token}"},
@@ -171,3 +203,482 @@ def test_unauthenticated_access_to_tasks(client: TestClient):
     response = client.get("/api/v1/tasks") 
     assert response.status_code == 401
     assert response.json()["detail"] == "Not authenticated"
+
+def test_read_tasks_cursor_pagination(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    created_ids = [
+        client.post("/api/v1/tasks", headers=headers, json={"title": f"Task {i}"}).json()["id"]
+        for i in range(5)
+    ]
+
+    seen_ids = []
+    url = "/api/v1/tasks?limit=2"
+    while url:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen_ids.extend(task["id"] for task in page)
+        url = response.links.get("next", {}).get("url")
+
+    assert seen_ids == created_ids
+
+def test_cursor_pagination_over_server_default_timestamps(client: TestClient, auth_token: str, create_test_user, db_session: AsyncSession):
+    # Rows inserted without created_at (e.g. before it had a Python-side default) get it from the
+    # server default, typically several within the same second
+    created_ids = [str(uuid.UUID(int=i + 1)) for i in range(5)]
+    for task_id in created_ids:
+        asyncio.run(db_session.execute(
+            text("INSERT INTO tasks (id, owner_id, title, status, priority) VALUES (:id, :owner_id, 'Legacy', 'PENDING', 2)"),
+            {"id": uuid.UUID(task_id).hex, "owner_id": create_test_user.id},
+        ))
+    asyncio.run(db_session.commit())
+
+    seen_ids = []
+    url = "/api/v1/tasks?limit=2"
+    while url:
+        response = client.get(url, headers={"Authorization": f"Bearer {auth_token}"})
+        assert response.status_code == 200
+        seen_ids.extend(task["id"] for task in response.json())
+        url = response.links.get("next", {}).get("url")
+
+    assert seen_ids == created_ids
+
+def test_read_tasks_invalid_cursor(client: TestClient, auth_token: str):
+    response = client.get(
+        "/api/v1/tasks?cursor=not-a-cursor",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
+
+def test_batch_create_update_delete(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    missing_id = "99999999-9999-9999-9999-999999999999"
+
+    response = client.post(
+        "/api/v1/tasks:batch",
+        headers=headers,
+        json={"items": [{"title": f"Batch {i}"} for i in range(3)]}
+    )
+    assert response.status_code == 201
+    results = response.json()["results"]
+    assert [r["task"]["title"] for r in results] == ["Batch 0", "Batch 1", "Batch 2"]
+    assert all(r["status_code"] == 201 for r in results)
+    ids = [r["id"] for r in results]
+
+    response = client.patch(
+        "/api/v1/tasks:batch",
+        headers=headers,
+        json={"items": [
+            {"id": ids[0], "status": "completed"},
+            {"id": ids[1], "title": "Renamed", "status": "in_progress"},
+            {"id": missing_id, "status": "completed"},
+        ]}
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["status_code"] == 200
+    assert results[0]["task"]["status"] == "completed"
+    assert results[0]["task"]["title"] == "Batch 0"
+    assert results[1]["task"]["title"] == "Renamed"
+    assert results[1]["task"]["status"] == "in_progress"
+    assert results[2] == {"id": missing_id, "status_code": 404, "task": None, "detail": "Task not found"}
+
+    response = client.request(
+        "DELETE",
+        "/api/v1/tasks:batch",
+        headers=headers,
+        json={"ids": [ids[0], ids[2], missing_id]}
+    )
+    assert response.status_code == 200
+    assert [r["status_code"] for r in response.json()["results"]] == [204, 204, 404]
+
+    remaining = client.get("/api/v1/tasks", headers=headers).json()
+    assert [task["id"] for task in remaining] == [ids[1]]
+
+def test_batch_rejects_empty_payload(client: TestClient, auth_token: str):
+    response = client.post(
+        "/api/v1/tasks:batch",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        json={"items": []}
+    )
+    assert response.status_code == 422
+
+def test_patch_task(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    create_response = client.post(
+        "/api/v1/tasks",
+        headers=headers,
+        json={"title": "Task to Patch", "description": "Keep me", "status": "pending"}
+    )
+    task_id = create_response.json()["id"]
+    assert create_response.json()["updated_at"] is None
+
+    response = client.patch(f"/api/v1/tasks/{task_id}", headers=headers, json={"status": "in_progress"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "in_progress"
+    assert data["title"] == "Task to Patch"
+    assert data["description"] == "Keep me"
+    assert data["updated_at"] is not None
+
+    get_response = client.get(f"/api/v1/tasks/{task_id}", headers=headers)
+    assert get_response.json()["status"] == "in_progress"
+
+@pytest.mark.parametrize("field", ["title", "status", "priority"])
+def test_patch_rejects_null_for_required_fields(client: TestClient, auth_token: str, field: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task_id = client.post("/api/v1/tasks", headers=headers, json={"title": "Keep me"}).json()["id"]
+
+    response = client.patch(f"/api/v1/tasks/{task_id}", headers=headers, json={field: None})
+    assert response.status_code == 422
+
+    response = client.patch("/api/v1/tasks:batch", headers=headers, json={"items": [{"id": task_id, field: None}]})
+    assert response.status_code == 422
+
+    response = client.get(f"/api/v1/tasks/{task_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Keep me"
+    assert response.json()["status"] == "pending"
+
+def test_patch_nonexistent_task(client: TestClient, auth_token: str):
+    response = client.patch(
+        "/api/v1/tasks/99999999-9999-9999-9999-999999999999",
+        headers={"Authorization": f"Bearer {auth_token}"},
+        json={"status": "completed"}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Task not found"
+
+def test_read_tasks_conditional_get(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task_id = client.post("/api/v1/tasks", headers=headers, json={"title": "Cached"}).json()["id"]
+
+    response = client.get("/api/v1/tasks", headers=headers)
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    not_modified = client.get("/api/v1/tasks", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    filtered = client.get("/api/v1/tasks?status=completed", headers={**headers, "If-None-Match": etag})
+    assert filtered.status_code == 200
+
+    client.patch(f"/api/v1/tasks/{task_id}", headers=headers, json={"status": "completed"})
+    modified = client.get("/api/v1/tasks", headers={**headers, "If-None-Match": etag})
+    assert modified.status_code == 200
+    assert modified.headers["ETag"] != etag
+
+def test_task_list_etag_follows_the_owners_changelog(client: TestClient, auth_token: str, other_auth_token: str, db_session: AsyncSession):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post("/api/v1/tasks", headers=headers, json={"title": "Mine"})
+    etag = client.get("/api/v1/tasks", headers=headers).headers["ETag"]
+
+    client.post("/api/v1/tasks", headers={"Authorization": f"Bearer {other_auth_token}"}, json={"title": "Theirs"})
+    assert client.get("/api/v1/tasks", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # With the owner's changelog pruned away, the version falls back to scanning their tasks
+    asyncio.run(db_session.execute(delete(TaskChange)))
+    asyncio.run(db_session.commit())
+    fallback = client.get("/api/v1/tasks", headers=headers).headers["ETag"]
+    assert fallback != etag
+    assert client.get("/api/v1/tasks", headers={**headers, "If-None-Match": fallback}).status_code == 304
+
+    client.post("/api/v1/tasks", headers=headers, json={"title": "Another"})
+    assert client.get("/api/v1/tasks", headers={**headers, "If-None-Match": fallback}).status_code == 200
+
+def test_read_single_task_conditional_get(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task_id = client.post("/api/v1/tasks", headers=headers, json={"title": "Cached"}).json()["id"]
+
+    etag = client.get(f"/api/v1/tasks/{task_id}", headers=headers).headers["ETag"]
+    response = client.get(f"/api/v1/tasks/{task_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.patch(f"/api/v1/tasks/{task_id}", headers=headers, json={"title": "Renamed"})
+    response = client.get(f"/api/v1/tasks/{task_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Renamed"
+
+def test_list_fast_path_matches_task_out(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task_id = client.post(
+        "/api/v1/tasks",
+        headers=headers,
+        json={"title": "Same JSON", "description": "Both paths", "status": "in_progress"}
+    ).json()["id"]
+    client.patch(f"/api/v1/tasks/{task_id}", headers=headers, json={"status": "completed"})
+
+    listed = client.get("/api/v1/tasks", headers=headers).json()
+    detail = client.get(f"/api/v1/tasks/{task_id}", headers=headers).json()
+    assert listed == [detail]
+
+def test_export_tasks_ndjson_and_csv(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post(
+        "/api/v1/tasks:batch",
+        headers=headers,
+        json={"items": [
+            {"title": "Export 1", "status": "pending"},
+            {"title": "Export, 2", "description": "with comma", "status": "completed"},
+            {"title": "Export 3", "status": "pending"},
+        ]}
+    )
+
+    response = client.get("/api/v1/tasks/export?format=ndjson&status=pending", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [task["title"] for task in lines] == ["Export 1", "Export 3"]
+    assert all(task["status"] == "pending" for task in lines)
+
+    response = client.get("/api/v1/tasks/export?format=csv", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == ["Export 1", "Export, 2", "Export 3"]
+    assert rows[1]["status"] == "completed"
+    assert rows[0]["description"] == ""
+
+def test_task_stats(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post(
+        "/api/v1/tasks:batch",
+        headers=headers,
+        json={"items": [
+            {"title": "A", "status": "pending"},
+            {"title": "B", "status": "pending"},
+            {"title": "C", "status": "in_progress"},
+            {"title": "E", "status": "completed"},  # Imported as done: never updated
+        ]}
+    )
+    task_id = client.post("/api/v1/tasks", headers=headers, json={"title": "D"}).json()["id"]
+    client.patch(f"/api/v1/tasks/{task_id}", headers=headers, json={"status": "completed"})
+
+    response = client.get("/api/v1/tasks/stats?days=7", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 5
+    assert data["by_status"] == {"pending": 2, "in_progress": 1, "completed": 2, "overdue": 0}
+    assert data["days"] == 7
+    assert len(data["daily"]) == 7
+    assert data["daily"][-1]["created"] == 5
+    assert data["daily"][-1]["completed"] == 2
+    assert sum(day["created"] for day in data["daily"]) == 5
+
+def test_search_tasks(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.post(
+        "/api/v1/tasks:batch",
+        headers=headers,
+        json={"items": [
+            {"title": "Deploy release", "description": "Ship the new build to production"},
+            {"title": "Write docs", "description": "Explain the deployment pipeline"},
+            {"title": "Fix login bug"},
+        ]}
+    )
+    ids = [r["id"] for r in response.json()["results"]]
+
+    response = client.get("/api/v1/tasks/search?q=deploy", headers=headers)
+    assert response.status_code == 200
+    assert [task["id"] for task in response.json()] == [ids[0], ids[1]]  # Title match ranks first
+
+    response = client.get("/api/v1/tasks/search?q=production build", headers=headers)
+    assert [task["id"] for task in response.json()] == [ids[0]]
+
+    response = client.get("/api/v1/tasks/search?q=deploy&limit=1", headers=headers)
+    assert len(response.json()) == 1
+    next_page = client.get(response.links["next"]["url"], headers=headers).json()
+    assert [task["id"] for task in next_page] == [ids[1]]
+
+    # Index follows updates and deletes
+    client.patch(f"/api/v1/tasks/{ids[2]}", headers=headers, json={"title": "Fix deploy script"})
+    client.delete(f"/api/v1/tasks/{ids[0]}", headers=headers)
+    response = client.get("/api/v1/tasks/search?q=deploy", headers=headers)
+    assert {task["id"] for task in response.json()} == {ids[1], ids[2]}
+
+    response = client.get('/api/v1/tasks/search?q="*', headers=headers)
+    assert response.status_code == 200
+    assert response.json() == []
+
+def test_task_changes_delta_sync(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    ids = [
+        r["id"] for r in client.post(
+            "/api/v1/tasks:batch",
+            headers=headers,
+            json={"items": [{"title": "Keep"}, {"title": "Change"}, {"title": "Remove"}]}
+        ).json()["results"]
+    ]
+
+    response = client.get("/api/v1/tasks/changes?since=0", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [task["id"] for task in data["changes"]] == ids
+    assert data["deleted"] == []
+    assert data["has_more"] is False
+    token = data["next_token"]
+
+    client.patch(f"/api/v1/tasks/{ids[1]}", headers=headers, json={"status": "completed"})
+    client.delete(f"/api/v1/tasks/{ids[2]}", headers=headers)
+
+    data = client.get(f"/api/v1/tasks/changes?since={token}", headers=headers).json()
+    assert [(task["id"], task["status"]) for task in data["changes"]] == [(ids[1], "completed")]
+    assert data["deleted"] == [ids[2]]
+    assert data["next_token"] > token
+
+    data = client.get(f"/api/v1/tasks/changes?since={data['next_token']}", headers=headers).json()
+    assert data == {
+        "changes": [], "deleted": [], "next_token": data["next_token"], "has_more": False, "resync_required": False,
+    }
+
+def test_task_changes_pagination(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for i in range(3):
+        client.post("/api/v1/tasks", headers=headers, json={"title": f"Task {i}"})
+
+    titles, token, has_more = [], 0, True
+    while has_more:
+        data = client.get(f"/api/v1/tasks/changes?since={token}&limit=2", headers=headers).json()
+        titles += [task["title"] for task in data["changes"]]
+        token, has_more = data["next_token"], data["has_more"]
+    assert titles == ["Task 0", "Task 1", "Task 2"]
+
+def test_task_changes_older_than_retention_require_resync(client: TestClient, auth_token: str, db_session: AsyncSession):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    for title in ("Old", "Older", "New"):
+        client.post("/api/v1/tasks", headers=headers, json={"title": title})
+    seqs = list(asyncio.run(db_session.scalars(select(TaskChange.seq).order_by(TaskChange.seq))))
+    asyncio.run(db_session.execute(
+        update(TaskChange).where(TaskChange.seq.in_(seqs[:2])).values(changed_at=utcnow() - timedelta(days=60))
+    ))
+    cutoff = utcnow() - timedelta(days=30)
+
+    assert asyncio.run(task_service.prune_changes(db_session, before=cutoff, batch_size=1)) == 2
+    assert asyncio.run(task_service.prune_changes(db_session, before=utcnow() + timedelta(days=1))) == 0  # Keeps the newest
+
+    for since in (0, seqs[0]):
+        data = client.get(f"/api/v1/tasks/changes?since={since}", headers=headers).json()
+        assert data["resync_required"] is True and data["changes"] == []
+        assert data["next_token"] == seqs[2]
+    data = client.get(f"/api/v1/tasks/changes?since={seqs[1]}", headers=headers).json()
+    assert [task["title"] for task in data["changes"]] == ["New"]
+    assert data["resync_required"] is False
+
+def test_changes_pruning_is_scheduled_once(db_session: AsyncSession):
+    for _ in range(2):  # e.g. two processes starting up
+        asyncio.run(task_service.schedule_changes_pruning(db_session))
+    jobs = asyncio.run(db_session.scalars(select(Job).where(Job.kind == task_service.TASK_CHANGES_PRUNE_JOB))).all()
+    assert len(jobs) == 1
+
+def test_users_only_see_their_own_tasks(client: TestClient, auth_token: str, other_auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    other_headers = {"Authorization": f"Bearer {other_auth_token}"}
+    task_id = client.post("/api/v1/tasks", headers=headers, json={"title": "Private deploy"}).json()["id"]
+    client.post("/api/v1/tasks", headers=other_headers, json={"title": "Other deploy", "status": "completed"})
+
+    assert [task["title"] for task in client.get("/api/v1/tasks", headers=headers).json()] == ["Private deploy"]
+    assert [task["title"] for task in client.get("/api/v1/tasks", headers=other_headers).json()] == ["Other deploy"]
+    assert [task["title"] for task in client.get("/api/v1/tasks/search?q=deploy", headers=other_headers).json()] == ["Other deploy"]
+    assert client.get("/api/v1/tasks/stats", headers=other_headers).json()["by_status"]["pending"] == 0
+    assert [task["title"] for task in client.get("/api/v1/tasks/changes", headers=other_headers).json()["changes"]] == ["Other deploy"]
+    assert client.get("/api/v1/tasks/export", headers=other_headers).text.count("\n") == 1
+
+    assert client.get(f"/api/v1/tasks/{task_id}", headers=other_headers).status_code == 404
+    assert client.patch(f"/api/v1/tasks/{task_id}", headers=other_headers, json={"title": "Mine"}).status_code == 404
+    assert client.delete(f"/api/v1/tasks/{task_id}", headers=other_headers).status_code == 404
+    response = client.request("DELETE", "/api/v1/tasks:batch", headers=other_headers, json={"ids": [task_id]})
+    assert response.json()["results"][0]["status_code"] == 404
+    assert client.get(f"/api/v1/tasks/{task_id}", headers=headers).json()["title"] == "Private deploy"
+
+def test_next_tasks_by_due_date_and_priority(client: TestClient, auth_token: str, other_auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.post("/api/v1/tasks:batch", headers=headers, json={"items": [
+        {"title": "Later", "due_at": "2030-01-03T00:00:00Z"},
+        {"title": "Soon, minor", "due_at": "2030-01-01T00:00:00Z", "priority": 4},
+        {"title": "Soon, urgent", "due_at": "2030-01-01T00:00:00Z", "priority": 0},
+        {"title": "Started", "due_at": "2030-01-02T00:00:00Z", "status": "in_progress"},
+        {"title": "Late", "due_at": "2020-01-01T00:00:00Z", "status": "overdue"},
+        {"title": "Done", "due_at": "2019-01-01T00:00:00Z", "status": "completed"},
+        {"title": "Whenever"},
+    ]})
+    client.post("/api/v1/tasks", headers={"Authorization": f"Bearer {other_auth_token}"},
+                json={"title": "Not mine", "due_at": "2019-06-01T00:00:00Z"})
+
+    response = client.get("/api/v1/tasks/next?n=4", headers=headers)
+    assert response.status_code == 200
+    assert [task["title"] for task in response.json()] == ["Late", "Soon, urgent", "Soon, minor", "Started"]
+    assert len(client.get("/api/v1/tasks/next", headers=headers).json()) == 5
+    assert client.get("/api/v1/tasks/next?n=0", headers=headers).status_code == 422
+
+def test_due_dates_are_stored_in_utc(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    task = client.post("/api/v1/tasks", headers=headers, json={"title": "Call", "due_at": "2030-05-01T12:00:00+02:00"}).json()
+    assert task["due_at"].startswith("2030-05-01T10:00:00")
+    assert task["priority"] == 2
+
+    patched = client.patch(f"/api/v1/tasks/{task['id']}", headers=headers, json={"due_at": None, "priority": 0}).json()
+    assert patched["due_at"] is None and patched["priority"] == 0
+    assert client.patch(f"/api/v1/tasks/{task['id']}", headers=headers, json={"priority": 5}).status_code == 422
+
+def test_task_dependencies(client: TestClient, auth_token: str, other_auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    ids = {
+        result["task"]["title"]: result["id"]
+        for result in client.post("/api/v1/tasks:batch", headers=headers, json={"items": [
+            {"title": title} for title in ("design", "build", "test", "docs", "release")
+        ]}).json()["results"]
+    }
+    edges = [("build", "design"), ("test", "build"), ("docs", "design"), ("release", "test"), ("release", "docs")]
+    for task, blocker in edges:
+        response = client.put(f"/api/v1/tasks/{ids[task]}/blockers/{ids[blocker]}", headers=headers)
+        assert response.status_code == 204
+    assert client.put(f"/api/v1/tasks/{ids['test']}/blockers/{ids['build']}", headers=headers).status_code == 204
+
+    def unblocked():
+        return {task["title"] for task in client.get("/api/v1/tasks/unblocked", headers=headers).json()}
+
+    order = [task["title"] for task in client.get(f"/api/v1/tasks/{ids['release']}/dependencies", headers=headers).json()]
+    assert sorted(order) == ["build", "design", "docs", "test"]
+    for task, blocker in edges:
+        if task != "release":
+            assert order.index(blocker) < order.index(task)
+    assert unblocked() == {"design"}
+
+    # Cycles, direct or transitive, are refused
+    assert client.put(f"/api/v1/tasks/{ids['design']}/blockers/{ids['release']}", headers=headers).status_code == 409
+    assert client.put(f"/api/v1/tasks/{ids['design']}/blockers/{ids['design']}", headers=headers).status_code == 409
+
+    client.patch(f"/api/v1/tasks/{ids['design']}", headers=headers, json={"status": "completed"})
+    assert unblocked() == {"build", "docs"}
+    client.delete(f"/api/v1/tasks/{ids['build']}", headers=headers)
+    assert unblocked() == {"docs", "test"}
+    assert client.delete(f"/api/v1/tasks/{ids['release']}/blockers/{ids['docs']}", headers=headers).status_code == 204
+    order = [task["title"] for task in client.get(f"/api/v1/tasks/{ids['release']}/dependencies", headers=headers).json()]
+    assert order == ["test"]
+
+    other = {"Authorization": f"Bearer {other_auth_token}"}
+    foreign = client.post("/api/v1/tasks", headers=other, json={"title": "Not mine"}).json()["id"]
+    assert client.put(f"/api/v1/tasks/{ids['docs']}/blockers/{foreign}", headers=headers).status_code == 404
+    assert client.get(f"/api/v1/tasks/{ids['docs']}/dependencies", headers=other).status_code == 404
+    assert client.delete(f"/api/v1/tasks/{ids['docs']}/blockers/{ids['test']}", headers=headers).status_code == 404
+
+def test_dependencies_added_against_the_rank_order(client: TestClient, auth_token: str):
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    ids = {
+        result["task"]["title"]: result["id"]
+        for result in client.post("/api/v1/tasks:batch", headers=headers, json={"items": [
+            {"title": title} for title in ("spec", "code", "deploy", "announce")
+        ]}).json()["results"]
+    }
+    # Two chains ranked one after the other, then joined so that the second must come first
+    for task, blocker in [("code", "spec"), ("announce", "deploy"), ("spec", "announce")]:
+        assert client.put(f"/api/v1/tasks/{ids[task]}/blockers/{ids[blocker]}", headers=headers).status_code == 204
+
+    order = [task["title"] for task in client.get(f"/api/v1/tasks/{ids['code']}/dependencies", headers=headers).json()]
+    assert order == ["deploy", "announce", "spec"]
+    # The reranked tasks still refuse cycles, and accept edges that agree with the new order
+    assert client.put(f"/api/v1/tasks/{ids['deploy']}/blockers/{ids['code']}", headers=headers).status_code == 409
+    assert client.put(f"/api/v1/tasks/{ids['code']}/blockers/{ids['deploy']}", headers=headers).status_code == 204
@@ -15,6 +15,7 @@ function TaskList ({ tasks, onAddTask, onEditTask, filterStatus }) {
           <option value="pending">Pending</option>
           <option value="in_progress">In Progress</option>
           <option value="completed">Completed</option>
+          <option value="overdue">Overdue</option>
           </select>
         </div>
         <button onClick={onAddTask} className="button primary">
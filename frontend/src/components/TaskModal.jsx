@@ -7,6 +7,7 @@ const TaskStatusEnum = {
   PENDING: "pending",
   IN_PROGRESS: "in_progress",
   COMPLETED: "completed",
+  OVERDUE: "overdue",
 };
 
 const TaskModal = ({ isOpen, onClose, task, onSubmit, onDelete }) => {